@@ -0,0 +1,65 @@
+"""
+config.py
+
+Environment configuration loading for the pipeline.
+
+Reads one of:
+- config/config_dev.yaml
+- config/config_test.yaml
+- config/config_prod.yaml
+
+The environment is chosen explicitly or via the BANK_DOC_ENV environment
+variable (defaults to "dev"), so the same entry points can run against
+any environment without code changes.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import yaml
+
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+CONFIG_DIR = BASE_DIR / "config"
+
+ENV_VAR = "BANK_DOC_ENV"
+DEFAULT_ENV = "dev"
+
+
+def config_path_for(env: str) -> Path:
+    """
+    Return the path of the YAML config file for an environment name.
+    """
+    return CONFIG_DIR / f"config_{env}.yaml"
+
+
+def load_config(env: Optional[str] = None, path: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Load the YAML config for the given environment.
+
+    Resolution order:
+    - explicit `path`
+    - explicit `env`
+    - BANK_DOC_ENV environment variable
+    - "dev"
+    """
+    if path is None:
+        env = env or os.environ.get(ENV_VAR, DEFAULT_ENV)
+        path = config_path_for(env)
+
+    if not path.exists():
+        raise FileNotFoundError(f"Config file does not exist: {path}")
+
+    with path.open("r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def get_section(config: Dict[str, Any], name: str) -> Dict[str, Any]:
+    """
+    Return a top-level config section, or an empty dict if it is missing.
+    """
+    section = config.get(name)
+    return section if isinstance(section, dict) else {}
@@ -0,0 +1,430 @@
+"""
+curated_store.py
+
+Canonical entity materialization into a local curated store.
+
+schemas.py defines the curated / gold entities (CustomerRecord,
+LoanApplicationRecord, OnboardingRecord), but nothing built them from
+validated payloads. This module:
+
+- maps validated extraction batches to the canonical entities in bulk
+  (map_entities): onboarding forms give a CustomerRecord and an
+  OnboardingRecord, loan applications a LoanApplicationRecord; invalid
+  results and payloads missing a required field are left out
+- upserts them into a SQLite database standing in for the Synapse /
+  Delta curated zone: one table per entity, keyed on its business id,
+  one prepared INSERT ... ON CONFLICT DO UPDATE statement per table run
+  through executemany, `batch_rows` rows per write transaction
+- hands out connections from a small pool (WAL mode, so readers never
+  block the writer); each runner or ingestion daemon process keeps one
+  store open (get_store) and writes every batch through it
+
+Upserts are idempotent: re-running a batch leaves the same rows, with a
+newer updated_at.
+
+Benchmark (rows/sec, inserts vs updates vs row-at-a-time commits):
+    python -m data_pipelines.curated_store --rows 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from operator import attrgetter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .config import get_section
+from .schemas import (
+    CustomerRecord,
+    ExtractionResult,
+    LoanApplicationRecord,
+    OnboardingRecord,
+    ValidationResult,
+)
+
+
+# table -> (entity class, primary key column)
+ENTITY_TABLES: Dict[str, Tuple[type, str]] = {
+    "customers": (CustomerRecord, "customer_id"),
+    "loan_applications": (LoanApplicationRecord, "application_id"),
+    "onboarding": (OnboardingRecord, "customer_id"),
+}
+
+
+@dataclass
+class CuratedStoreConfig:
+    """
+    Settings for the `curated_store` config section.
+    """
+    enabled: bool = False
+    db_path: Path = Path("./curated/curated.sqlite")
+    pool_size: int = 4
+    batch_rows: int = 50_000
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "CuratedStoreConfig":
+        section = get_section(config, "curated_store")
+        return cls(
+            enabled=bool(section.get("enabled", cls.enabled)),
+            db_path=Path(section.get("db_path", cls.db_path)),
+            pool_size=int(section.get("pool_size", cls.pool_size)),
+            batch_rows=int(section.get("batch_rows", cls.batch_rows)),
+        )
+
+    def open_store(self) -> "CuratedStore":
+        return CuratedStore(self.db_path, self.pool_size, self.batch_rows)
+
+
+# === Mapping: validated payloads -> canonical entities ===
+
+_TRUE = {"true", "yes", "y", "1"}
+_FALSE = {"false", "no", "n", "0"}
+
+
+def _region(result: ExtractionResult) -> str:
+    return str(result.payload.get("region") or result.metadata.region)
+
+
+def _flag(value: Any, default: bool) -> bool:
+    """
+    Parse a yes/no payload field. Extraction may give strings ("false",
+    "No", "0"), so bool() is not enough; anything unrecognised is an error.
+    """
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"not a yes/no value: {value!r}")
+
+
+def to_customer(result: ExtractionResult) -> CustomerRecord:
+    p = result.payload
+    return CustomerRecord(
+        customer_id=str(p["customer_id"]),
+        full_name=str(p["full_name"]),
+        region=_region(result),
+        segment=p.get("segment"),
+        risk_band=p.get("risk_rating_initial"),
+    )
+
+
+def to_onboarding(result: ExtractionResult) -> OnboardingRecord:
+    p = result.payload
+    return OnboardingRecord(
+        customer_id=str(p["customer_id"]),
+        full_name=str(p["full_name"]),
+        dob=str(p.get("dob") or ""),
+        region=_region(result),
+        channel=str(p.get("account_opening_channel") or result.metadata.source_channel),
+        consent_provided=_flag(p.get("consent_data_sharing"), default=True),
+    )
+
+
+def to_loan_application(result: ExtractionResult) -> LoanApplicationRecord:
+    p = result.payload
+    return LoanApplicationRecord(
+        application_id=str(p["application_id"]),
+        customer_id=str(p.get("customer_id") or result.metadata.customer_id),
+        product_type=str(p.get("product_type") or "UNKNOWN"),
+        requested_amount=float(p["requested_amount"]),
+        tenor_months=int(p["tenor_months"]),
+        income=float(p["income"]),
+        liabilities=float(p.get("liabilities") or 0.0),
+        region=_region(result),
+        decision_status=p.get("decision_status"),
+    )
+
+
+# document type -> [(table, mapper)]
+ENTITY_MAPPERS: Dict[str, List[Tuple[str, Callable[[ExtractionResult], Any]]]] = {
+    "onboarding_form": [("customers", to_customer), ("onboarding", to_onboarding)],
+    "loan_application": [("loan_applications", to_loan_application)],
+}
+
+
+def map_entities(
+    validated: Iterable[Tuple[ExtractionResult, ValidationResult]],
+) -> Tuple[Dict[str, List[Any]], int]:
+    """
+    ({table: [entities]}, skipped) for the valid results of a batch.
+    Results that fail to map (missing or malformed field) are skipped.
+    """
+    entities: Dict[str, List[Any]] = {table: [] for table in ENTITY_TABLES}
+    skipped = 0
+    for result, vr in validated:
+        if not vr.is_valid:
+            continue
+        for table, mapper in ENTITY_MAPPERS.get(result.metadata.document_type.value, []):
+            try:
+                entities[table].append(mapper(result))
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+    return entities, skipped
+
+
+# === Store ===
+
+def _sql_type(annotation: Any) -> str:
+    name = str(annotation)
+    if "float" in name:
+        return "REAL"
+    if "int" in name or "bool" in name:
+        return "INTEGER"
+    return "TEXT"
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    # Autocommit; write transactions are opened explicitly (BEGIN IMMEDIATE).
+    # Connections move between threads through the pool, never concurrently.
+    conn = sqlite3.connect(
+        str(db_path), timeout=60.0, isolation_level=None, check_same_thread=False, cached_statements=64
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Up to `size` SQLite connections, opened on demand and reused.
+    """
+
+    def __init__(self, db_path: Path, size: int = 4):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = _connect(self.db_path)
+                self._all.append(conn)
+                return conn
+        return self._idle.get()   # all in use: wait for one to come back
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+
+class CuratedStore:
+    """
+    Curated entity tables with batched, idempotent upserts.
+
+    Usage:
+
+        with CuratedStore(Path("./curated/curated.sqlite")) as store:
+            entities, _ = map_entities(validated)
+            store.upsert_entities(entities)
+            print(store.counts())
+    """
+
+    def __init__(self, db_path: Path, pool_size: int = 4, batch_rows: int = 50_000):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.batch_rows = batch_rows
+        self.pool = ConnectionPool(db_path, pool_size)
+        self._columns: Dict[str, List[str]] = {}
+        self._upsert_sql: Dict[str, str] = {}
+        with self.pool.connection() as conn:
+            for table, (entity, key) in ENTITY_TABLES.items():
+                self._create_table(conn, table, entity, key)
+
+    def _create_table(self, conn: sqlite3.Connection, table: str, entity: type, key: str) -> None:
+        entity_fields = fields(entity)
+        columns = [f.name for f in entity_fields]
+        definitions = [
+            f"{f.name} {_sql_type(f.type)}" + (" PRIMARY KEY" if f.name == key else "") for f in entity_fields
+        ]
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(definitions)}, updated_at REAL NOT NULL)")
+
+        placeholders = ", ".join("?" * (len(columns) + 1))
+        updates = ", ".join(f"{c} = excluded.{c}" for c in [*columns, "updated_at"] if c != key)
+        self._columns[table] = columns
+        self._upsert_sql[table] = (
+            f"INSERT INTO {table} ({', '.join(columns)}, updated_at) VALUES ({placeholders}) "
+            f"ON CONFLICT({key}) DO UPDATE SET {updates}"
+        )
+
+    def upsert(self, table: str, records: Sequence[Any]) -> int:
+        """
+        Insert or update `records` (entities of the table's class), in
+        write transactions of batch_rows rows each.
+        """
+        if not records:
+            return 0
+        getter = attrgetter(*self._columns[table])
+        now = time.time()
+        sql = self._upsert_sql[table]
+        with self.pool.connection() as conn:
+            for start in range(0, len(records), self.batch_rows):
+                rows = [(*getter(r), now) for r in records[start:start + self.batch_rows]]
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(sql, rows)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        return len(records)
+
+    def upsert_entities(self, entities: Dict[str, Sequence[Any]]) -> Dict[str, int]:
+        return {table: self.upsert(table, records) for table, records in entities.items()}
+
+    def get(self, table: str, key: str) -> Optional[Dict[str, Any]]:
+        _, key_column = ENTITY_TABLES[table]
+        with self.pool.connection() as conn:
+            cursor = conn.execute(f"SELECT * FROM {table} WHERE {key_column} = ?", (key,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([d[0] for d in cursor.description], row))
+
+    def counts(self) -> Dict[str, int]:
+        with self.pool.connection() as conn:
+            return {table: int(conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]) for table in ENTITY_TABLES}
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def __enter__(self) -> "CuratedStore":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+# Stores opened by this process, one per database (see get_store)
+_STORES: Dict[Path, CuratedStore] = {}
+
+
+def get_store(cfg: CuratedStoreConfig) -> CuratedStore:
+    """
+    This process's store for cfg.db_path, opened on first use, so the
+    tables are checked and the pool's connections opened once instead of
+    per batch. Closed by close_stores().
+    """
+    store = _STORES.get(cfg.db_path)
+    if store is None:
+        store = _STORES[cfg.db_path] = cfg.open_store()
+    return store
+
+
+def close_stores() -> None:
+    while _STORES:
+        _, store = _STORES.popitem()
+        store.close()
+
+
+def materialize(
+    validated: Sequence[Tuple[ExtractionResult, ValidationResult]],
+    cfg: CuratedStoreConfig,
+) -> Dict[str, int]:
+    """
+    Map a validated batch to canonical entities and upsert them through
+    the process's store.
+    """
+    entities, skipped = map_entities(validated)
+    written = get_store(cfg).upsert_entities(entities)
+    print(f"[CURATED] Upserted {', '.join(f'{t}={n}' for t, n in written.items())} "
+          f"(skipped={skipped}) -> {cfg.db_path}")
+    return {**written, "skipped": skipped}
+
+
+def _synthetic_loans(rows: int, version: int = 0) -> List[LoanApplicationRecord]:
+    regions = ("APAC", "EMEA", "AMER")
+    products = ("PERSONAL_LOAN", "HOME_LOAN", "AUTO_LOAN")
+    return [
+        LoanApplicationRecord(
+            application_id=f"APP{i:010d}",
+            customer_id=f"CUST{i // 2:09d}",
+            product_type=products[i % 3],
+            requested_amount=50_000.0 + (i * 7919 + version * 1000) % 2_000_000,
+            tenor_months=(12, 24, 36, 60)[i % 4],
+            income=200_000.0 + (i * 104_729) % 5_000_000,
+            liabilities=float((i * 31) % 1_000_000),
+            region=regions[i % 3],
+            decision_status=("approved", "rejected", "pending")[(i + version) % 3],
+        )
+        for i in range(rows)
+    ]
+
+
+def benchmark(rows: int, db_path: Path, batch_rows: int, naive_rows: int) -> None:
+    db_path.unlink(missing_ok=True)
+    loans = _synthetic_loans(rows)
+    changed = _synthetic_loans(rows, version=1)
+
+    with CuratedStore(db_path, batch_rows=batch_rows) as store:
+        t0 = time.perf_counter()
+        store.upsert("loan_applications", loans)
+        insert_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        store.upsert("loan_applications", changed)
+        update_s = time.perf_counter() - t0
+
+        assert store.counts()["loan_applications"] == rows
+        last = changed[-1]
+        assert store.get("loan_applications", last.application_id)["decision_status"] == last.decision_status
+
+        # Row at a time, one transaction per row: the pattern upsert() replaces
+        naive = _synthetic_loans(naive_rows, version=2)
+        getter = attrgetter(*store._columns["loan_applications"])
+        sql = store._upsert_sql["loan_applications"]
+        with store.pool.connection() as conn:
+            t0 = time.perf_counter()
+            for record in naive:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(sql, (*getter(record), time.time()))
+                conn.execute("COMMIT")
+            naive_s = time.perf_counter() - t0
+
+    print(f"[CURATED] rows={rows:,} | batch_rows={batch_rows:,} | {db_path} "
+          f"({db_path.stat().st_size / 1e6:.0f} MB)")
+    print(f"[CURATED] insert      {insert_s:6.2f}s | {rows / insert_s:>10,.0f} rows/s")
+    print(f"[CURATED] update      {update_s:6.2f}s | {rows / update_s:>10,.0f} rows/s")
+    print(f"[CURATED] row-at-a-time commits ({naive_rows:,} updates) {naive_s:6.2f}s | "
+          f"{naive_rows / naive_s:>10,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bulk upserts into the curated store.")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--batch-rows", type=int, default=50_000)
+    parser.add_argument("--naive-rows", type=int, default=20_000, help="rows for the row-at-a-time baseline")
+    parser.add_argument("--db-path", type=Path, default=Path("./curated/benchmark.sqlite"))
+    args = parser.parse_args()
+
+    benchmark(args.rows, args.db_path, args.batch_rows, args.naive_rows)
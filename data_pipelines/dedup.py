@@ -0,0 +1,365 @@
+"""
+dedup.py
+
+Deduplication of repeated document submissions.
+
+Customers often re-upload the same bank statement or loan application.
+Without deduplication the copy is extracted, validated and aggregated
+again (e.g. inflating total_loans_amount in the churn features).
+
+Two persistent indexes are kept:
+- content index: SHA-256 of the raw file bytes (exact re-uploads),
+  checked right after ingestion, before extraction
+- business-key index: (document_type, business key) such as statement_id
+  or application_id, checked right after extraction, before validation
+
+`dedup.scope` sets what a key is checked against: "run" (only the current
+pipeline run) or "global" (also every committed key of earlier runs, the
+ingestion daemon and the shard workers, so a re-upload is caught whichever
+path ingested the original).
+
+Each index is an on-disk SQLite table with a Bloom filter in front of it.
+The Bloom filter answers "definitely new" for almost all first-time
+documents without touching disk; only "maybe seen" answers fall through
+to the SQLite lookup, which is authoritative. Memory use is bounded by
+the Bloom filter size, independent of how many documents were indexed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import get_section
+from .schemas import DocumentMetadata, DocumentType, ExtractionResult
+
+
+# Payload fields that identify the same business document across uploads.
+# Onboarding forms carry no form identifier (customer_id is shared by every
+# form a customer submits), so they are only deduplicated on content.
+BUSINESS_KEY_FIELDS: Dict[DocumentType, Tuple[str, ...]] = {
+    DocumentType.BANK_STATEMENT: ("statement_id",),
+    DocumentType.LOAN_APPLICATION: ("application_id",),
+}
+
+_CHUNK_SIZE = 1 << 20
+
+
+def file_content_hash(path: Path) -> bytes:
+    """
+    SHA-256 digest of a file's bytes, read in 1 MiB chunks.
+    """
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def business_key(result: ExtractionResult) -> Optional[str]:
+    """
+    Return the business key of an extraction, or None if the document type
+    has no key or any key field is missing.
+    """
+    fields = BUSINESS_KEY_FIELDS.get(result.metadata.document_type)
+    if not fields:
+        return None
+    values = [result.payload.get(f) for f in fields]
+    if any(v in (None, "") for v in values):
+        return None
+    return "|".join(str(v) for v in values)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter using double hashing over one blake2b digest.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: bytes) -> Iterable[int]:
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: bytes) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+@dataclass
+class DedupConfig:
+    """
+    Settings for the `dedup` config section.
+    """
+    enabled: bool = False
+    index_dir: Path = Path("./dedup_index")
+    bloom_capacity: int = 1_000_000
+    bloom_error_rate: float = 0.001
+    scope: str = "run"                 # "run" or "global"
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "DedupConfig":
+        section = get_section(config, "dedup")
+        return cls(
+            enabled=bool(section.get("enabled", cls.enabled)),
+            index_dir=Path(section.get("index_dir", cls.index_dir)),
+            bloom_capacity=int(section.get("bloom_capacity", cls.bloom_capacity)),
+            bloom_error_rate=float(section.get("bloom_error_rate", cls.bloom_error_rate)),
+            scope=str(section.get("scope", cls.scope)),
+        )
+
+    def open_index(self, run_id: str) -> "DedupIndex":
+        return DedupIndex(self.index_dir, run_id, self.bloom_capacity, self.bloom_error_rate, scope=self.scope)
+
+
+@dataclass
+class DedupStats:
+    seen: int = 0
+    duplicates: int = 0
+    bloom_negatives: int = 0  # answered "new" without a disk lookup
+
+
+class DedupIndex:
+    """
+    Persistent duplicate index (SQLite + Bloom filters) under index_dir.
+
+    Keys are stored per run_id. Within a run, keys are first written as
+    pending and only marked committed by `commit_run()` once the caller
+    has durably stored the stage output (e.g. the runner's checkpoint).
+    `discard_pending()` forgets keys of an interrupted attempt so a resumed
+    run re-processes those documents instead of losing them, and
+    `clear_run()` resets the run entirely.
+
+    A key is a duplicate if it was recorded for a different file name:
+    with scope "run" by this run, with scope "global" by this run or as a
+    committed key of any run. Features are rebuilt from each run's own
+    payloads, so the same file read again by a later run, a shard or the
+    daemon (same name, whatever its landing directory) is not a
+    duplicate; a copy of it under another name is.
+
+    Each index kind lives in its own SQLite file, so the content and
+    business-key checks can run in separate processes without contending
+    for one write lock. Bloom filters are per process and rebuilt from the
+    rows in scope on first use.
+    """
+
+    TABLES = ("content", "business")
+    SCOPES = ("run", "global")
+
+    def __init__(
+        self,
+        index_dir: Path,
+        run_id: str = "default",
+        bloom_capacity: int = 1_000_000,
+        bloom_error_rate: float = 0.001,
+        commit_every: int = 1000,
+        scope: str = "run",
+    ):
+        if scope not in self.SCOPES:
+            raise ValueError(f"dedup scope must be one of {self.SCOPES}, got {scope!r}")
+        self.index_dir = index_dir
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.run_id = run_id
+        self.scope = scope
+        # Rows a key is checked against (the same clause builds the Bloom filter)
+        self._in_scope = "run_id = ?" if scope == "run" else "(run_id = ? OR committed = 1)"
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.commit_every = commit_every
+        self.stats: Dict[str, DedupStats] = {name: DedupStats() for name in self.TABLES}
+
+        self._conns: Dict[str, sqlite3.Connection] = {}
+        self._blooms: Dict[str, BloomFilter] = {}
+        self._pending: Dict[str, int] = {}
+
+    def _conn(self, table: str) -> sqlite3.Connection:
+        conn = self._conns.get(table)
+        if conn is None:
+            conn = sqlite3.connect(str(self.index_dir / f"{table}.sqlite"), timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "run_id TEXT NOT NULL, key BLOB NOT NULL, path TEXT, committed INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (run_id, key)) WITHOUT ROWID"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_key ON {table} (key)")
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version < 1:
+                # `path` used to hold the full landing path; it is compared by file name now
+                conn.create_function("file_name", 1, lambda p: Path(p).name if p else p)
+                conn.execute(f"UPDATE {table} SET path = file_name(path) WHERE path != file_name(path)")
+                conn.execute("PRAGMA user_version = 1")
+            conn.commit()
+            self._conns[table] = conn
+            self._pending[table] = 0
+        return conn
+
+    def _bloom(self, table: str) -> BloomFilter:
+        bloom = self._blooms.get(table)
+        if bloom is not None:
+            return bloom
+
+        conn = self._conn(table)
+        where = f"FROM {table} WHERE {self._in_scope}"
+        (rows,) = conn.execute(f"SELECT count(*) {where}", (self.run_id,)).fetchone()
+        bloom = BloomFilter(max(self.bloom_capacity, rows), self.bloom_error_rate)
+        for (key,) in conn.execute(f"SELECT key {where}", (self.run_id,)):
+            bloom.add(key)
+        self._blooms[table] = bloom
+        return bloom
+
+    def check_and_add(self, table: str, key: bytes, name: str = "") -> bool:
+        """
+        Return True if `key` is new in scope or was only recorded for this
+        same file name (and record it as pending), False if it is a duplicate.
+        """
+        stats = self.stats[table]
+        stats.seen += 1
+        bloom = self._bloom(table)
+        conn = self._conn(table)
+
+        if key not in bloom:
+            stats.bloom_negatives += 1
+        elif conn.execute(
+            f"SELECT 1 FROM {table} WHERE key = ? AND path != ? AND {self._in_scope} LIMIT 1",
+            (key, name, self.run_id),
+        ).fetchone():
+            stats.duplicates += 1
+            return False
+
+        # OR IGNORE: this run may hold the key already (same name), or another
+        # process may have inserted it since our lookup
+        cur = conn.execute(
+            f"INSERT OR IGNORE INTO {table} (run_id, key, path) VALUES (?, ?, ?)",
+            (self.run_id, key, name),
+        )
+        if cur.rowcount == 0:
+            (recorded,) = conn.execute(
+                f"SELECT path FROM {table} WHERE run_id = ? AND key = ?", (self.run_id, key)
+            ).fetchone()
+            if recorded != name:
+                stats.duplicates += 1
+                return False
+            return True
+        bloom.add(key)
+
+        self._pending[table] += 1
+        if self._pending[table] >= self.commit_every:
+            self.flush()
+        return True
+
+    def is_new_document(self, meta: DocumentMetadata) -> bool:
+        return self.check_and_add("content", file_content_hash(meta.path), meta.path.name)
+
+    def is_new_extraction(self, result: ExtractionResult) -> bool:
+        key = business_key(result)
+        if key is None:
+            return True  # nothing to deduplicate on
+        composite = f"{result.metadata.document_type.value}|{key}".encode("utf-8")
+        return self.check_and_add("business", composite, result.metadata.path.name)
+
+    def _update_run(self, sql: str) -> None:
+        for table in self.TABLES:
+            conn = self._conn(table)
+            conn.execute(sql.format(table=table), (self.run_id,))
+            conn.commit()
+            self._pending[table] = 0
+        self._blooms.clear()  # rebuilt from the remaining rows on next use
+
+    def discard_pending(self) -> None:
+        """
+        Forget keys recorded by an attempt whose output was never committed.
+        """
+        self._update_run("DELETE FROM {table} WHERE run_id = ? AND committed = 0")
+
+    def commit_run(self) -> None:
+        """
+        Mark this run's pending keys as committed.
+        """
+        self._update_run("UPDATE {table} SET committed = 1 WHERE run_id = ? AND committed = 0")
+
+    def clear_run(self) -> None:
+        """
+        Drop every key recorded for this run.
+        """
+        self._update_run("DELETE FROM {table} WHERE run_id = ?")
+
+    def flush(self) -> None:
+        for table, conn in self._conns.items():
+            conn.commit()
+            self._pending[table] = 0
+
+    def close(self) -> None:
+        self.flush()
+        for conn in self._conns.values():
+            conn.close()
+        self._conns.clear()
+        self._blooms.clear()
+
+    def __enter__(self) -> "DedupIndex":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def drop_duplicate_documents(metadata_items: List[DocumentMetadata], index: DedupIndex) -> List[DocumentMetadata]:
+    """
+    Drop byte-identical re-uploads before extraction.
+    """
+    kept: List[DocumentMetadata] = []
+    for meta in metadata_items:
+        if index.is_new_document(meta):
+            kept.append(meta)
+        else:
+            print(f"[DEDUP] Duplicate content, skipping: {meta.path.name}")
+    return kept
+
+
+def drop_duplicate_extractions(results: List[ExtractionResult], index: DedupIndex) -> List[ExtractionResult]:
+    """
+    Drop extractions whose business key (statement_id, application_id, ...)
+    was already processed, before validation and feature building.
+    """
+    kept: List[ExtractionResult] = []
+    for result in results:
+        if index.is_new_extraction(result):
+            kept.append(result)
+        else:
+            print(f"[DEDUP] Duplicate business key, skipping: {result.metadata.path.name}")
+    return kept
+
+
+if __name__ == "__main__":
+    from .extraction import extract_from_metadata_items
+    from .ingestion import ingest_to_landing
+    from .validation import validate_batch
+
+    with DedupIndex(Path("./dedup_index"), run_id="demo") as index:
+        index.clear_run()
+        metas = ingest_to_landing(Path("./sample_data"), Path("./landing_zone"))
+        metas = drop_duplicate_documents(metas, index)
+        extracted = drop_duplicate_extractions(extract_from_metadata_items(metas), index)
+        validate_batch(extracted)
+        index.commit_run()
+
+        for table, stats in index.stats.items():
+            print(f"[DEDUP] {table}: seen={stats.seen} | duplicates={stats.duplicates} | "
+                  f"bloom_negatives={stats.bloom_negatives}")
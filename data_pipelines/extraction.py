@@ -17,7 +17,7 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from .schemas import DocumentMetadata, ExtractionResult
 
@@ -27,6 +27,38 @@ def _load_json(path: Path) -> dict:
         return json.load(f)
 
 
+def extract_document(meta: DocumentMetadata) -> Optional[ExtractionResult]:
+    """
+    Read the JSON file behind a single DocumentMetadata and build an
+    ExtractionResult. Returns None for non-JSON or unparsable files.
+    """
+    if meta.path.suffix.lower() != ".json":
+        print(f"[EXTRACT] Skipping non-JSON file: {meta.path.name}")
+        return None
+
+    try:
+        payload = _load_json(meta.path)
+    except json.JSONDecodeError as exc:
+        print(f"[EXTRACT] Failed to parse JSON for {meta.path.name}: {exc}")
+        return None
+
+    # Carry the ingestion-time customer key into the payload, unless the
+    # document disagrees with its filename about who the customer is
+    if meta.customer_key is not None and payload.get("customer_id") == meta.customer_id:
+        payload["customer_key"] = meta.customer_key
+
+    confidence = float(payload.get("confidence_score", 0.9))
+
+    print(f"[EXTRACT] Loaded payload for {meta.path.name} | "
+          f"type={meta.document_type.value} | confidence={confidence:.2f}")
+
+    return ExtractionResult(
+        metadata=meta,
+        payload=payload,
+        confidence=confidence,
+    )
+
+
 def extract_from_metadata_items(metadata_items: List[DocumentMetadata]) -> List[ExtractionResult]:
     """
     For each DocumentMetadata object, read its JSON file and
@@ -39,27 +71,9 @@ def extract_from_metadata_items(metadata_items: List[DocumentMetadata]) -> List[
     results: List[ExtractionResult] = []
 
     for meta in metadata_items:
-        if meta.path.suffix.lower() != ".json":
-            print(f"[EXTRACT] Skipping non-JSON file: {meta.path.name}")
-            continue
-
-        try:
-            payload = _load_json(meta.path)
-        except json.JSONDecodeError as exc:
-            print(f"[EXTRACT] Failed to parse JSON for {meta.path.name}: {exc}")
-            continue
-
-        confidence = float(payload.get("confidence_score", 0.9))
-
-        result = ExtractionResult(
-            metadata=meta,
-            payload=payload,
-            confidence=confidence,
-        )
-        results.append(result)
-
-        print(f"[EXTRACT] Loaded payload for {meta.path.name} | "
-              f"type={meta.document_type.value} | confidence={confidence:.2f}")
+        result = extract_document(meta)
+        if result is not None:
+            results.append(result)
 
     return results
 
@@ -68,10 +82,17 @@ if __name__ == "__main__":
     # Example usage:
     # Run ingestion first to populate landing_zone, then:
     from .ingestion import ingest_to_landing
+    from .profiling import StageProfiler
 
     source_dir = Path("./sample_data")
     landing_dir = Path("./landing_zone")
 
-    metas = ingest_to_landing(source_dir, landing_dir)
-    extracted = extract_from_metadata_items(metas)
+    profiler = StageProfiler.from_config()
+
+    with profiler.stage("ingestion"):
+        metas = ingest_to_landing(source_dir, landing_dir)
+    with profiler.stage("extraction"):
+        extracted = extract_from_metadata_items(metas)
     print(f"[EXTRACT] Total extracted: {len(extracted)}")
+
+    profiler.print_summary()
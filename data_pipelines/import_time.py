@@ -0,0 +1,130 @@
+"""
+import_time.py
+
+Cold-start (import time) benchmark for the package entry points.
+
+Each module is imported in a fresh interpreter under `python -X importtime`
+and the per-module timings written to stderr are parsed, so the numbers
+include everything a short-lived job pays before doing any work. Runs are
+repeated and the median is reported, with the heaviest top-level imports
+so regressions can be traced to the dependency that caused them.
+
+With --budget-ms the command exits non-zero when any module's median
+cold import exceeds the budget, so it can gate CI.
+
+Example:
+    python -m data_pipelines.import_time ml.score ml.churn_model_stub --runs 5
+    python -m data_pipelines.import_time ml.score --budget-ms 800
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+DEFAULT_MODULES = (
+    "ml.score",
+    "ml.churn_model_stub",
+    "ml.loan_risk_model_stub",
+    "ml.batch_scoring",
+    "data_pipelines.ingestion",
+    "data_pipelines.validation",
+    "data_pipelines.runner",
+)
+
+# "import time:       380 |    1830407 | ml.churn_model_stub"
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+@dataclass
+class ImportProfile:
+    """
+    Median cold-import cost of one module.
+    """
+    module: str
+    total_ms: float
+    # top-level dependencies (depth 1 under the module) by cumulative ms
+    heaviest: List[Tuple[str, float]] = field(default_factory=list)
+
+
+def parse_importtime(stderr: str, module: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Total cumulative ms of `module` and cumulative ms of every package
+    imported at the first nesting level (what the module itself pulled in).
+    """
+    total = 0.0
+    nested: Dict[str, float] = {}
+    children: Dict[str, float] = {}
+    # Children are printed before their parent, so collect the first
+    # nesting level until the top-level line that owns it.
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative_ms = int(match.group(2)) / 1000
+        depth = (len(match.group(3)) - 1) // 2
+        name = match.group(4)
+        if depth == 1:
+            children[name] = cumulative_ms
+        elif depth == 0:
+            if name == module:
+                total = cumulative_ms
+                nested = children
+            children = {}
+    return total, nested
+
+
+def profile_import(module: str, runs: int = 3, top: int = 5) -> ImportProfile:
+    totals: List[float] = []
+    nested_runs: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+        total, nested = parse_importtime(proc.stderr, module)
+        totals.append(total)
+        for name, ms in nested.items():
+            nested_runs.setdefault(name, []).append(ms)
+
+    heaviest = sorted(
+        ((name, statistics.median(values)) for name, values in nested_runs.items()),
+        key=lambda item: -item[1],
+    )[:top]
+    return ImportProfile(module, statistics.median(totals), heaviest)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure cold import time of package entry points.")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per module (median reported)")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest direct imports to list")
+    parser.add_argument("--budget-ms", type=float, help="Fail if any module's median exceeds this")
+    args = parser.parse_args(argv)
+
+    over_budget = []
+    for module in args.modules:
+        profile = profile_import(module, args.runs, args.top)
+        print(f"[IMPORT] {profile.module:<32} {profile.total_ms:8.1f} ms")
+        for name, ms in profile.heaviest:
+            print(f"[IMPORT]     {name:<28} {ms:8.1f} ms")
+        if args.budget_ms is not None and profile.total_ms > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"[IMPORT] Over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,13 +12,33 @@ and understood without any cloud credentials.
 
 from __future__ import annotations
 
+import os
+import queue
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional
+from typing import AbstractSet, Any, Iterator, List, Optional, Set, Tuple
 
 from .schemas import DocumentMetadata, DocumentType
 
 
+# Extensions accepted by discovery (OCR'd JSON plus typical scan formats)
+DEFAULT_EXTENSIONS: AbstractSet[str] = frozenset(
+    {".json", ".pdf", ".tif", ".tiff", ".png", ".jpg", ".jpeg"}
+)
+DEFAULT_DISCOVERY_WORKERS = 8
+
+# Discovery hands files over in batches of this size through a queue of at
+# most _SCAN_QUEUE_BATCHES messages, which bounds memory during the walk.
+_SCAN_BATCH_SIZE = 1000
+_SCAN_QUEUE_BATCHES = 64
+_SCAN_POLL_SECONDS = 0.1
+
+_DOCUMENT_TYPE_VALUES: Set[str] = {t.value for t in DocumentType}
+
+
 def infer_metadata_from_filename(path: Path, default_region: str = "APAC") -> Optional[DocumentMetadata]:
     """
     Infer basic metadata from a filename convention:
@@ -58,58 +78,280 @@ def infer_metadata_from_filename(path: Path, default_region: str = "APAC") -> Op
     )
 
 
-def discover_documents(input_dir: Path) -> List[Path]:
+@dataclass
+class DiscoveryStats:
+    """
+    Counters collected while walking a drop folder.
+    """
+    directories: int = 0
+    files_seen: int = 0
+    files_matched: int = 0
+
+    @property
+    def files_rejected(self) -> int:
+        return self.files_seen - self.files_matched
+
+
+class _ScanCancelled(Exception):
+    """Raised inside a directory scan once the consumer has stopped reading."""
+
+
+def matches_naming_convention(name: str, extensions: Optional[AbstractSet[str]] = DEFAULT_EXTENSIONS) -> bool:
+    """
+    Cheap string-only check that a filename follows
+
+        <customer_id>__<document_type>[__<region>].<ext>
+
+    with an allowed extension. Mirrors infer_metadata_from_filename without
+    building Path / DocumentMetadata objects, so it can run inside the walk.
     """
-    Recursively discover all files in the given directory.
+    stem, dot, ext = name.rpartition(".")
+    if not dot:
+        stem, ext = name, ""
+    if extensions is not None and f".{ext.lower()}" not in extensions:
+        return False
+
+    parts = stem.split("__", 2)
+    return len(parts) >= 2 and parts[1] in _DOCUMENT_TYPE_VALUES
+
+
+def _scan_directory(
+    path: str,
+    extensions: Optional[AbstractSet[str]],
+    prefilter: bool,
+    shard: Optional[Tuple[int, int]],
+    out: "queue.Queue[Tuple[str, Any]]",
+    stop: threading.Event,
+) -> None:
+    """
+    Scan one directory level with os.scandir, pushing results to `out`
+    while the directory is still being read:
+
+        ("dir", path)       a subdirectory, to be scanned next
+        ("files", [...])    up to _SCAN_BATCH_SIZE matching paths, sorted
+        ("done", (seen, error))
+
+    `out` is bounded, so a single huge directory is streamed in batches
+    instead of being listed in full. Gives up quietly once `stop` is set.
+
+    DirEntry.is_dir / is_file use the d_type returned by readdir on most
+    filesystems, so no extra stat() call is made per entry.
+    """
+    def emit(kind: str, value: Any) -> None:
+        while True:
+            try:
+                out.put((kind, value), timeout=_SCAN_POLL_SECONDS)
+                return
+            except queue.Full:
+                if stop.is_set():
+                    raise _ScanCancelled()
+
+    if shard is not None:
+        from .sharding import shard_for_customer  # sharding imports this module
+        shard_id, num_shards = shard
+
+    batch: List[str] = []
+    seen = 0
+    error: Optional[BaseException] = None
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if stop.is_set():
+                    return
+                if entry.is_dir(follow_symlinks=False):
+                    emit("dir", entry.path)
+                elif entry.is_file():
+                    seen += 1
+                    if prefilter and not matches_naming_convention(entry.name, extensions):
+                        continue
+                    if shard is not None:
+                        customer_id = entry.name.split("__", 1)[0]
+                        if shard_for_customer(customer_id, num_shards) != shard_id:
+                            continue
+                    batch.append(entry.path)
+                    if len(batch) >= _SCAN_BATCH_SIZE:
+                        emit("files", sorted(batch))
+                        batch = []
+        if batch:
+            emit("files", sorted(batch))
+    except _ScanCancelled:
+        return
+    except (PermissionError, FileNotFoundError) as exc:
+        # Directories can vanish or be locked while a drop is in progress
+        print(f"[INGEST] Cannot scan {path}: {exc}")
+    except Exception as exc:
+        error = exc
+
+    try:
+        emit("done", (seen, error))
+    except _ScanCancelled:
+        pass
+
+
+def iter_documents(
+    input_dir: Path,
+    extensions: Optional[AbstractSet[str]] = DEFAULT_EXTENSIONS,
+    prefilter: bool = True,
+    workers: int = DEFAULT_DISCOVERY_WORKERS,
+    stats: Optional[DiscoveryStats] = None,
+    shard: Optional[Tuple[int, int]] = None,
+) -> Iterator[Path]:
+    """
+    Stream document paths under input_dir.
+
+    Directories are scanned in parallel on a thread pool (scandir releases
+    the GIL while waiting on the filesystem). Scanners hand over matching
+    files in batches through a bounded queue while they are still reading,
+    so callers can start ingesting before the walk finishes and memory
+    stays bounded even for one flat directory with millions of entries.
 
-    In real life we'd filter by extension (.pdf, .tif, .png, etc).
+    Order: paths within a batch are sorted, but batches from different
+    directories interleave as scans complete, so the overall order is not
+    deterministic. Use discover_documents for a sorted list.
+
+    With prefilter=True, only files that follow the naming convention and
+    have an allowed extension are yielded. With shard=(shard_id, num_shards),
+    only files whose customer_id hashes to that shard are yielded; the check
+    uses the filename alone, so files of other shards are never opened.
     """
     if not input_dir.exists():
         raise FileNotFoundError(f"Input directory does not exist: {input_dir}")
 
-    return [p for p in input_dir.rglob("*") if p.is_file()]
+    out: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=_SCAN_QUEUE_BATCHES)
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="discover")
+    active = 0
+
+    def scan(path: str) -> None:
+        nonlocal active
+        active += 1
+        pool.submit(_scan_directory, path, extensions, prefilter, shard, out, stop)
+
+    try:
+        scan(str(input_dir))
+        while active:
+            kind, value = out.get()
+            if kind == "dir":
+                scan(value)
+            elif kind == "files":
+                if stats is not None:
+                    stats.files_matched += len(value)
+                for f in value:
+                    yield Path(f)
+            else:
+                active -= 1
+                seen, error = value
+                if error is not None:
+                    raise error
+                if stats is not None:
+                    stats.directories += 1
+                    stats.files_seen += seen
+    finally:
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_document_metadata(
+    input_dir: Path,
+    default_region: str = "APAC",
+    extensions: Optional[AbstractSet[str]] = DEFAULT_EXTENSIONS,
+    workers: int = DEFAULT_DISCOVERY_WORKERS,
+    stats: Optional[DiscoveryStats] = None,
+    shard: Optional[Tuple[int, int]] = None,
+) -> Iterator[DocumentMetadata]:
+    """
+    Stream DocumentMetadata for every conforming document under input_dir
+    (optionally only those of one shard, see iter_documents).
+    """
+    for path in iter_documents(input_dir, extensions=extensions, workers=workers, stats=stats, shard=shard):
+        meta = infer_metadata_from_filename(path, default_region=default_region)
+        if meta is not None:
+            yield meta
+
+
+def discover_documents(
+    input_dir: Path,
+    extensions: Optional[AbstractSet[str]] = DEFAULT_EXTENSIONS,
+    workers: int = DEFAULT_DISCOVERY_WORKERS,
+) -> List[Path]:
+    """
+    Recursively discover documents in the given directory.
+
+    Only files with an allowed extension that follow the filename
+    convention are returned, sorted by path; prefer iter_documents for
+    very large trees.
+    """
+    return sorted(iter_documents(input_dir, extensions=extensions, workers=workers))
+
+
+def ingest_file(
+    src: Path,
+    landing_dir: Path,
+    default_region: str = "APAC",
+) -> Optional[DocumentMetadata]:
+    """
+    Copy a single discovered file into landing_dir and return its
+    DocumentMetadata, or None if the filename does not follow the convention.
+    """
+    meta = infer_metadata_from_filename(src, default_region=default_region)
+    if meta is None:
+        print(f"[INGEST] Skipping file with unknown pattern: {src.name}")
+        return None
+
+    dest = landing_dir / src.name
+    shutil.copy2(src, dest)
+
+    # Update path in metadata to reflect landing location
+    meta.path = dest
+
+    print(f"[INGEST] {src.name} -> {dest} | "
+          f"{meta.document_type.value} | customer={meta.customer_id} | region={meta.region}")
+    return meta
 
 
 def ingest_to_landing(
     source_dir: Path,
     landing_dir: Path,
     default_region: str = "APAC",
+    shard: Optional[Tuple[int, int]] = None,
 ) -> List[DocumentMetadata]:
     """
     Discover documents in source_dir, copy them to landing_dir,
     and return a list of DocumentMetadata objects.
 
+    With shard=(shard_id, num_shards), only that shard's documents are
+    landed (see data_pipelines.sharding).
+
     This mimics landing into ADLS Gen2 / Blob Storage.
     """
     landing_dir.mkdir(parents=True, exist_ok=True)
 
-    docs = discover_documents(source_dir)
+    stats = DiscoveryStats()
     metadata_items: List[DocumentMetadata] = []
 
-    for src in docs:
-        meta = infer_metadata_from_filename(src, default_region=default_region)
-        if meta is None:
-            print(f"[INGEST] Skipping file with unknown pattern: {src.name}")
-            continue
-
-        dest = landing_dir / src.name
-        shutil.copy2(src, dest)
-
-        # Update path in metadata to reflect landing location
-        meta.path = dest
-        metadata_items.append(meta)
-
-        print(f"[INGEST] {src.name} -> {dest} | "
-              f"{meta.document_type.value} | customer={meta.customer_id} | region={meta.region}")
+    for src in iter_documents(source_dir, stats=stats, shard=shard):
+        meta = ingest_file(src, landing_dir, default_region=default_region)
+        if meta is not None:
+            metadata_items.append(meta)
 
+    print(f"[INGEST] Discovery: dirs={stats.directories} | files={stats.files_seen} | "
+          f"matched={stats.files_matched} | skipped={stats.files_rejected}"
+          + (f" | shard={shard[0]}/{shard[1]}" if shard is not None else ""))
     return metadata_items
 
 
 if __name__ == "__main__":
     # Example usage (local):
     # python -m data_pipeline.ingestion
+    from .profiling import StageProfiler
+
     src = Path("./sample_data")
     landing = Path("./landing_zone")
 
-    ingested = ingest_to_landing(src, landing)
+    profiler = StageProfiler.from_config()
+
+    with profiler.stage("ingestion"):
+        ingested = ingest_to_landing(src, landing)
     print(f"[INGEST] Total ingested: {len(ingested)}")
+
+    profiler.print_summary()
@@ -0,0 +1,610 @@
+"""
+ingestion_daemon.py
+
+Long-running, event-driven ingestion (the "Event Grid Trigger" of
+docs/architecture.mmd).
+
+ingest_to_landing() and the runner scan a whole directory once; new
+uploads wait for the next hourly batch. This daemon watches the source
+directory instead and pushes every new document through ingestion,
+extraction and validation within seconds:
+
+- watching: Linux inotify (through libc, no extra dependency) reports a
+  file once its writer closes it or it is renamed into place; elsewhere,
+  or when inotify is unavailable, the directory is polled and a file is
+  picked up once its size and mtime are stable between two polls
+- micro-batching: arrivals are coalesced into batches bounded by file
+  count (max_batch_files) and age of the oldest file (max_batch_seconds)
+- processing: a batch is landed and extracted on a thread pool (file
+  I/O), re-uploads are dropped by content and business key against the
+  dedup index shared with the runner (if `dedup.enabled`), its PII
+  fields are tokenized (if `security.enforce_pii_masking`, as in the
+  runner, so no raw PII reaches the output), then validated
+  (with confidence routing if `routing.enabled`; as partitioned batches,
+  one per route, if `validation_executor.enabled`), and its records
+  are written to one JSONL file, renamed into place; valid documents
+  are then upserted into the curated store (if `curated_store.enabled`,
+  through one store kept open for the daemon's lifetime)
+- restarts: a document is marked done in `<output_dir>/_processed.jsonl`
+  (by name and SHA-256 of its content) only after its batch output has
+  been renamed into place, so the daemon can be restarted at any time;
+  the backlog that arrived while it was down, and any batch that was
+  in flight, is picked up on startup (at-least-once: a crash between the
+  rename and the ledger append replays that batch). A corrected re-upload
+  under the same name has a new hash and is processed again
+- failures: a document that cannot be landed, extracted or validated is
+  written as an invalid record (a "_document" ERROR) and marked done; it
+  never stops the batch
+
+Every batch reports its end-to-end latency: from the upload (the file's
+mtime) to the validated record on disk.
+
+Example:
+    BANK_DOC_ENV=dev python -m data_pipelines.ingestion_daemon
+    python -m data_pipelines.ingestion_daemon --duration 60 --watcher poll
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import select
+import signal
+import statistics
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import get_section
+from .curated_store import CuratedStoreConfig, close_stores, materialize
+from .dedup import DedupConfig, DedupIndex, file_content_hash
+from .extraction import extract_document
+from .ingestion import iter_documents, ingest_file, matches_naming_convention
+from .masking import MaskingConfig, Tokenizer, mask_result
+from .routing import RoutedValidation, RoutingConfig
+from .schemas import ExtractionResult, ValidationResult
+from .validation import failed_validation, validate_result
+from .validation_executor import ValidationExecutor, ValidationExecutorConfig
+
+
+@dataclass
+class DaemonConfig:
+    """
+    Settings for the `ingestion_daemon` config section.
+    """
+    source_dir: Path = Path("./incoming")
+    landing_dir: Path = Path("./landing_zone")
+    output_dir: Path = Path("./stream_output")
+    default_region: str = "APAC"
+    watcher: str = "auto"              # "auto" (inotify if available), "inotify" or "poll"
+    poll_interval: float = 1.0         # seconds between polls / max wait for events
+    max_batch_files: int = 200
+    max_batch_seconds: float = 2.0
+    workers: int = 4                   # threads landing + extracting a batch
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "DaemonConfig":
+        section = get_section(config, "ingestion_daemon")
+        return cls(
+            source_dir=Path(section.get("source_dir", cls.source_dir)),
+            landing_dir=Path(section.get("landing_dir", cls.landing_dir)),
+            output_dir=Path(section.get("output_dir", cls.output_dir)),
+            default_region=str(section.get("default_region", cls.default_region)),
+            watcher=str(section.get("watcher", cls.watcher)),
+            poll_interval=float(section.get("poll_interval", cls.poll_interval)),
+            max_batch_files=int(section.get("max_batch_files", cls.max_batch_files)),
+            max_batch_seconds=float(section.get("max_batch_seconds", cls.max_batch_seconds)),
+            workers=int(section.get("workers", cls.workers)),
+        )
+
+
+# === Watchers: poll(timeout) -> paths of newly completed documents ===
+
+# <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_EVENT_HEADER = struct.Struct("iIII")   # wd, mask, cookie, name length
+
+
+class InotifyWatcher:
+    """
+    Recursive inotify watch of a directory tree (Linux).
+
+    Only IN_CLOSE_WRITE and IN_MOVED_TO are reported, so a document is
+    seen once it has been fully written. New subdirectories are watched as
+    they appear and scanned once, for files written before the watch.
+    """
+
+    _MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+
+    def __init__(self, root: Path):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.root = root
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+        self._rescan: List[Path] = []
+        self._watch_tree(root)
+
+    def _watch(self, directory: Path) -> None:
+        import ctypes
+
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self._MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self._dirs[wd] = directory
+
+    def _watch_tree(self, top: Path) -> None:
+        for dirpath, _, _ in os.walk(top):
+            self._watch(Path(dirpath))
+
+    def poll(self, timeout: float) -> List[Path]:
+        paths, self._rescan = self._rescan, []
+        ready, _, _ = select.select([self._fd], [], [], max(0.0, timeout) if not paths else 0.0)
+        if not ready:
+            return paths
+        data = os.read(self._fd, 1 << 16)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += _EVENT_HEADER.size + length
+            if mask & _IN_Q_OVERFLOW:
+                # Events were dropped: fall back to a full scan once
+                paths.extend(iter_documents(self.root))
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._watch_tree(path)
+                    self._rescan.extend(iter_documents(path))
+            elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                paths.append(path)
+        return paths
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """
+    Portable fallback: rescan the tree every poll and report files whose
+    (size, mtime) did not change since the previous poll, i.e. finished uploads.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._last: Dict[Path, Tuple[int, int]] = {}
+        self._reported: Dict[Path, Tuple[int, int]] = {}
+
+    def poll(self, timeout: float) -> List[Path]:
+        time.sleep(max(0.0, timeout))
+        current: Dict[Path, Tuple[int, int]] = {}
+        for path in iter_documents(self.root):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            current[path] = (stat.st_size, stat.st_mtime_ns)
+
+        ready = [
+            path for path, signature in current.items()
+            if self._last.get(path) == signature and self._reported.get(path) != signature
+        ]
+        for path in ready:
+            self._reported[path] = current[path]
+        self._reported = {p: s for p, s in self._reported.items() if p in current}
+        self._last = current
+        return ready
+
+    def close(self) -> None:
+        pass
+
+
+def make_watcher(root: Path, kind: str = "auto") -> Any:
+    if kind == "poll":
+        return PollingWatcher(root)
+    try:
+        return InotifyWatcher(root)
+    except (OSError, AttributeError) as exc:
+        if kind == "inotify":
+            raise
+        print(f"[DAEMON] inotify unavailable ({exc}); polling {root}")
+        return PollingWatcher(root)
+
+
+# === Micro-batching ===
+
+class MicroBatcher:
+    """
+    Coalesce arrivals into batches of at most `max_files` files, flushed
+    at the latest `max_seconds` after the oldest file arrived.
+    """
+
+    def __init__(self, max_files: int, max_seconds: float):
+        self.max_files = max_files
+        self.max_seconds = max_seconds
+        self._items: Dict[Path, float] = {}   # path -> arrival (insertion ordered)
+
+    def add(self, paths: List[Path], now: float) -> None:
+        for path in paths:
+            # A rewrite of a pending file keeps its place and arrival time
+            self._items.setdefault(path, now)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def time_left(self, now: float) -> Optional[float]:
+        if not self._items:
+            return None
+        return max(0.0, next(iter(self._items.values())) + self.max_seconds - now)
+
+    def due(self, now: float) -> bool:
+        return len(self._items) >= self.max_files or self.time_left(now) == 0.0
+
+    def take(self) -> List[Path]:
+        batch = list(self._items)[: self.max_files]
+        for path in batch:
+            del self._items[path]
+        return batch
+
+
+# === Processing ===
+
+@dataclass
+class BatchReport:
+    batch_id: int
+    files: int = 0
+    validated: int = 0
+    valid: int = 0
+    skipped: int = 0
+    duplicates: int = 0
+    seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list)   # upload -> record on disk
+
+    def summary(self) -> str:
+        if not self.latencies:
+            return (f"batch {self.batch_id}: files={self.files} skipped={self.skipped} "
+                    f"duplicates={self.duplicates}")
+        ordered = sorted(self.latencies)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        return (f"batch {self.batch_id}: files={self.files} validated={self.validated} valid={self.valid} "
+                f"skipped={self.skipped} duplicates={self.duplicates} in {self.seconds:.2f}s | "
+                f"latency p50={statistics.median(ordered):.2f}s p95={p95:.2f}s max={ordered[-1]:.2f}s")
+
+
+class ProcessedLedger:
+    """
+    Append-only record of the documents whose output is committed, one JSON
+    line {"name", "sha256", "batch"} per document. Loaded once at startup;
+    only the daemon thread appends, after the batch file is renamed into place.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._done: set = set()
+        if path.exists():
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue                     # torn last line after a crash
+                    self._done.add((entry["name"], entry["sha256"]))
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def done(self, name: str, digest: str) -> bool:
+        return (name, digest) in self._done
+
+    def add(self, entries: List[Tuple[str, str]], batch: str) -> None:
+        if not entries:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            for name, digest in entries:
+                f.write(json.dumps({"name": name, "sha256": digest, "batch": batch}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._done.update(entries)
+
+
+@dataclass
+class _Arrival:
+    path: Path
+    digest: str = ""
+    uploaded: float = 0.0
+    result: Optional[ExtractionResult] = None
+    error: Optional[BaseException] = None
+    skipped: bool = False                          # gone, or already processed
+
+
+def _land_and_extract(path: Path, cfg: DaemonConfig, ledger: ProcessedLedger) -> _Arrival:
+    """
+    Hash, ingest and extract one file. Never raises: a failure is returned
+    on the arrival and recorded as an invalid document.
+    """
+    arrival = _Arrival(path)
+    try:
+        arrival.uploaded = path.stat().st_mtime
+        arrival.digest = file_content_hash(path).hex()
+    except FileNotFoundError:
+        arrival.skipped = True
+        return arrival
+    if ledger.done(path.name, arrival.digest):
+        arrival.skipped = True
+        return arrival
+    try:
+        meta = ingest_file(path, cfg.landing_dir, default_region=cfg.default_region)
+        if meta is not None:
+            arrival.result = extract_document(meta)
+    except Exception as exc:
+        print(f"[DAEMON] {path.name} failed: {type(exc).__name__}: {exc}")
+        arrival.error = exc
+    return arrival
+
+
+# Dedup keys of the daemon are recorded under this run id
+DEDUP_RUN_ID = "ingestion_daemon"
+
+
+class IngestionDaemon:
+    """
+    Watch cfg.source_dir and process arrivals in micro-batches until stopped.
+
+    Usage:
+
+        daemon = IngestionDaemon(DaemonConfig.from_config(config), RoutingConfig.from_config(config),
+                                 masking=MaskingConfig.from_config(config), dedup=DedupConfig.from_config(config),
+                                 curated=CuratedStoreConfig.from_config(config))
+        daemon.run()                                      # until SIGINT / SIGTERM / daemon.stop()
+    """
+
+    def __init__(
+        self,
+        cfg: DaemonConfig,
+        routing: Optional[RoutingConfig] = None,
+        executor: Optional[ValidationExecutorConfig] = None,
+        masking: Optional[MaskingConfig] = None,
+        dedup: Optional[DedupConfig] = None,
+        curated: Optional[CuratedStoreConfig] = None,
+    ):
+        self.cfg = cfg
+        self.dedup = dedup if dedup is not None and dedup.enabled else None
+        self.curated = curated if curated is not None and curated.enabled else None
+        self.stop_event = threading.Event()
+        self.reports: List[BatchReport] = []
+        self._batch_id = 0
+        self.ledger = ProcessedLedger(cfg.output_dir / "_processed.jsonl")
+        # Loaded upfront so a missing key fails at startup, not per batch
+        self._tokenizer: Optional[Tokenizer] = masking.tokenizer() if masking is not None and masking.enabled else None
+        self._validate: Callable[[ExtractionResult], List[Tuple[ExtractionResult, ValidationResult]]]
+        self._executor: Optional[ValidationExecutor] = None
+        if routing is not None and routing.enabled:
+            # One review queue key space for the daemon: a corrected re-upload
+            # refreshes its pending item instead of adding another
+            self._validate = RoutedValidation(routing, run_id="ingestion_daemon")
+        else:
+            self._validate = lambda result: [(result, validate_result(result))]
+        if executor is not None and executor.enabled:
+            self._executor = ValidationExecutor(executor)
+        # Opened by run() on the daemon thread (SQLite connections stay on one thread)
+        self._index: Optional[DedupIndex] = None
+
+    def _validate_all(self, results: List[ExtractionResult]) -> List[Tuple[int, ExtractionResult, ValidationResult]]:
+        """
+        (index in `results`, routed result, validation) for every record kept.
+        """
+        if self._executor is not None and isinstance(self._validate, RoutedValidation):
+            return self._validate.validate_batch(results, self._executor)
+        if self._executor is not None:
+            validated, summary = self._executor.validate(results)
+            if summary.issues:
+                print(f"[DAEMON] batch {self._batch_id} validation: {summary.summary()}")
+            return [(i, result, vr) for i, (result, vr) in enumerate(zip(results, validated))]
+        return [(i, routed, vr) for i, result in enumerate(results) for routed, vr in self._validate(result)]
+
+    def _drop_duplicates(self, arrivals: List[_Arrival]) -> int:
+        """
+        Drop re-uploads by content and business key. Their keys stay pending
+        until the batch is committed; the arrivals are still marked done.
+        """
+        duplicates = 0
+        for arrival in arrivals:
+            result = arrival.result
+            if result is None:
+                continue
+            name = result.metadata.path.name
+            if (not self._index.check_and_add("content", bytes.fromhex(arrival.digest), name)
+                    or not self._index.is_new_extraction(result)):
+                print(f"[DEDUP] Duplicate, skipping: {arrival.path.name}")
+                arrival.result = None
+                duplicates += 1
+        return duplicates
+
+    def _processed(self, path: Path) -> bool:
+        try:
+            return self.ledger.done(path.name, file_content_hash(path).hex())
+        except FileNotFoundError:
+            return True
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def process_batch(self, paths: List[Path], pool: ThreadPoolExecutor) -> BatchReport:
+        self._batch_id += 1
+        report = BatchReport(self._batch_id, files=len(paths))
+        started = time.perf_counter()
+
+        arrivals = list(pool.map(lambda p: _land_and_extract(p, self.cfg, self.ledger), paths))
+        todo = [a for a in arrivals if not a.skipped]
+        report.skipped = len(arrivals) - len(todo)
+        if self._index is not None:
+            report.duplicates = self._drop_duplicates(todo)
+
+        if self._tokenizer is not None:
+            for arrival in todo:
+                if arrival.result is not None:
+                    try:
+                        mask_result(arrival.result, self._tokenizer)
+                    except Exception as exc:
+                        arrival.result, arrival.error = None, exc
+        kept = [a for a in todo if a.result is not None]
+        records: List[Dict[str, Any]] = []
+        uploads: List[float] = []
+        validated: List[Tuple[ExtractionResult, ValidationResult]] = []
+        for i, routed, vr in self._validate_all([a.result for a in kept]):
+            validated.append((routed, vr))
+            records.append({
+                "path": str(routed.metadata.path),
+                "document_type": routed.metadata.document_type.value,
+                "customer_id": routed.metadata.customer_id,
+                "confidence": routed.confidence,
+                "validation": vr.to_dict(),
+                "payload": routed.payload,
+            })
+            uploads.append(kept[i].uploaded)
+            report.valid += int(vr.is_valid)
+        for arrival in todo:
+            if arrival.error is not None:
+                records.append({
+                    "path": str(arrival.path),
+                    "document_type": None,
+                    "customer_id": None,
+                    "confidence": None,
+                    "validation": failed_validation(arrival.error).to_dict(),
+                    "payload": None,
+                })
+                uploads.append(arrival.uploaded)
+
+        batch_name = f"batch-{time.strftime('%H%M%S')}-{os.getpid()}-{self._batch_id:06d}"
+        if records:
+            out_dir = self.cfg.output_dir / time.strftime("%Y-%m-%d")
+            out_dir.mkdir(parents=True, exist_ok=True)
+            out_path = out_dir / f"{batch_name}.jsonl"
+            tmp = out_path.with_suffix(".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, out_path)
+            done = time.time()
+            report.latencies = [done - uploaded for uploaded in uploads]
+        if self.curated is not None and validated:
+            # Upserts are idempotent, so a batch replayed after a crash is harmless
+            materialize(validated, self.curated)
+        # Only now are the documents done (including those routed to review
+        # or with an unknown name pattern, which produce no record)
+        self.ledger.add([(a.path.name, a.digest) for a in todo], batch_name)
+        if self._index is not None:
+            self._index.commit_run()
+        report.validated = len(records)
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def run(self, duration: Optional[float] = None) -> List[BatchReport]:
+        cfg = self.cfg
+        cfg.source_dir.mkdir(parents=True, exist_ok=True)
+        cfg.landing_dir.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + duration if duration is not None else None
+
+        if self.dedup is not None:
+            self._index = self.dedup.open_index(DEDUP_RUN_ID)
+            # Keys of a batch that was in flight when the daemon stopped
+            self._index.discard_pending()
+        watcher = make_watcher(cfg.source_dir, cfg.watcher)
+        batcher = MicroBatcher(cfg.max_batch_files, cfg.max_batch_seconds)
+        # Backlog that arrived while the daemon was down (after the watch is
+        # set up, so nothing falls between the scan and the first event)
+        backlog = [p for p in iter_documents(cfg.source_dir) if not self._processed(p)]
+        batcher.add(backlog, time.monotonic())
+        print(f"[DAEMON] Watching {cfg.source_dir} with {type(watcher).__name__} | backlog={len(backlog)} | "
+              f"batches of <= {cfg.max_batch_files} files / {cfg.max_batch_seconds}s")
+
+        try:
+            with ThreadPoolExecutor(max_workers=cfg.workers, thread_name_prefix="daemon") as pool:
+                while not self.stop_event.is_set():
+                    now = time.monotonic()
+                    if deadline is not None and now >= deadline:
+                        break
+                    wait = batcher.time_left(now)
+                    timeout = cfg.poll_interval if wait is None else min(wait, cfg.poll_interval)
+                    arrived = [p for p in watcher.poll(timeout) if matches_naming_convention(p.name)]
+                    now = time.monotonic()
+                    batcher.add(arrived, now)
+                    while batcher.due(now):
+                        self._record(self.process_batch(batcher.take(), pool))
+                        now = time.monotonic()
+
+                # Drain what already arrived before exiting
+                while len(batcher):
+                    self._record(self.process_batch(batcher.take(), pool))
+        finally:
+            watcher.close()
+            close = getattr(self._validate, "close", None)
+            if close is not None:
+                close()
+            if self._executor is not None:
+                self._executor.close()
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+            if self.curated is not None:
+                close_stores()
+
+        latencies = [latency for r in self.reports for latency in r.latencies]
+        if latencies:
+            print(f"[DAEMON] Stopped after {len(self.reports)} batches | validated={len(latencies)} | "
+                  f"latency p50={statistics.median(latencies):.2f}s max={max(latencies):.2f}s")
+        return self.reports
+
+    def _record(self, report: BatchReport) -> None:
+        self.reports.append(report)
+        print(f"[DAEMON] {report.summary()}")
+
+
+if __name__ == "__main__":
+    from .config import load_config
+
+    parser = argparse.ArgumentParser(description="Watch a drop folder and ingest documents as they arrive.")
+    parser.add_argument("--env", default=None, help="dev / test / prod (default: $BANK_DOC_ENV or dev)")
+    parser.add_argument("--source-dir", type=Path, help="Override ingestion_daemon.source_dir")
+    parser.add_argument("--watcher", choices=["auto", "inotify", "poll"], help="Override ingestion_daemon.watcher")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds (default: run until signalled)")
+    args = parser.parse_args()
+
+    config = load_config(args.env)
+    cfg = DaemonConfig.from_config(config)
+    if args.source_dir:
+        cfg.source_dir = args.source_dir
+    if args.watcher:
+        cfg.watcher = args.watcher
+
+    daemon = IngestionDaemon(
+        cfg,
+        RoutingConfig.from_config(config),
+        ValidationExecutorConfig.from_config(config),
+        MaskingConfig.from_config(config),
+        DedupConfig.from_config(config),
+        CuratedStoreConfig.from_config(config),
+    )
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: daemon.stop())
+    daemon.run(duration=args.duration)
@@ -0,0 +1,302 @@
+"""
+masking.py
+
+PII masking between extraction and validation.
+
+When `security.enforce_pii_masking` is set, PII fields of extracted
+payloads (names, national IDs, dates of birth, account numbers, contact
+details) are replaced by deterministic keyed tokens:
+
+    token = "tok_" + HMAC-SHA256(field_key, value)[:16 bytes, hex]
+
+- deterministic: the same value always maps to the same token, so joins,
+  dedup and counts on masked columns keep working
+- keyed: without the key, tokens cannot be reversed or recomputed from
+  guessed values (unlike a plain hash of a date of birth)
+- per-field keys (derived from the master key), so a national_id and an
+  account_number with the same digits do not share a token
+
+The master key is read from a local key file standing in for the Key
+Vault secret (`security.pii_key_file`).
+
+Whether data is already masked is tracked as state, never guessed from
+a value: ExtractionResult.pii_masked for payloads and
+DataFrame.attrs["pii_masked"] for frames. A raw value that happens to
+start with "tok_" is tokenized like any other.
+
+Throughput: the HMAC inner/outer SHA-256 states are keyed once per field
+and copied per value (RFC 2104, without the hmac module's per-call
+overhead), and tokens go through a bounded LRU cache (customers
+re-submit documents, so hit rates are high).
+
+Columnar data (pandas frames, e.g. bulk exports or feature backfills) is
+masked with mask_frame: one HMAC per distinct value, mapped over the
+column by pandas. For the pipeline's dict payloads a plain per-payload
+loop is faster than transposing into columns and back, so mask_batch
+masks payload by payload.
+
+Benchmark (synthetic onboarding payloads):
+    python -m data_pipelines.masking --records 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from .config import get_section
+from .schemas import DocumentType, ExtractionResult
+
+
+# Payload fields masked per document type
+PII_FIELDS: Dict[DocumentType, Tuple[str, ...]] = {
+    DocumentType.BANK_STATEMENT: ("account_number",),
+    DocumentType.LOAN_APPLICATION: (),
+    DocumentType.ONBOARDING_FORM: ("full_name", "national_id", "dob", "mobile_number", "email"),
+}
+
+TOKEN_PREFIX = "tok_"
+_TOKEN_HEX_CHARS = 32
+_MIN_KEY_BYTES = 32
+_SHA256_BLOCK = 64
+_IPAD = bytes(b ^ 0x36 for b in range(256))
+_OPAD = bytes(b ^ 0x5C for b in range(256))
+
+
+def load_key(path: Path, create_if_missing: bool = False) -> bytes:
+    """
+    Read the hex-encoded master key from `path`.
+
+    With create_if_missing, a new random key is written (mode 0600) when
+    the file does not exist; meant for dev/test, never for prod.
+    """
+    if not path.exists():
+        if not create_if_missing:
+            raise FileNotFoundError(
+                f"PII tokenization key file does not exist: {path} "
+                "(provision it, or set security.pii_key_create_if_missing outside prod)"
+            )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(secrets.token_hex(_MIN_KEY_BYTES))
+        print(f"[MASK] Created new tokenization key: {path}")
+
+    key = bytes.fromhex(path.read_text(encoding="utf-8").strip())
+    if len(key) < _MIN_KEY_BYTES:
+        raise ValueError(f"PII tokenization key must be at least {_MIN_KEY_BYTES} bytes")
+    return key
+
+
+@dataclass
+class MaskingConfig:
+    """
+    Masking settings from the `security` config section.
+
+    Every environment has its own key file (default
+    ./secrets/pii_tokenization_<environment>.key), so prod can never pick
+    up a key that a dev or test run created; prod refuses to create one.
+    """
+    enabled: bool = False
+    key_file: Path = Path("./secrets/pii_tokenization_dev.key")
+    create_key_if_missing: bool = False
+    cache_size: int = 100_000
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "MaskingConfig":
+        section = get_section(config, "security")
+        env = str(config.get("environment", "dev"))
+        create_key_if_missing = bool(section.get("pii_key_create_if_missing", cls.create_key_if_missing))
+        if env == "prod" and create_key_if_missing:
+            raise ValueError("security.pii_key_create_if_missing must be false in prod")
+        return cls(
+            enabled=bool(section.get("enforce_pii_masking", cls.enabled)),
+            key_file=Path(section.get("pii_key_file", f"./secrets/pii_tokenization_{env}.key")),
+            create_key_if_missing=create_key_if_missing,
+            cache_size=int(section.get("pii_token_cache_size", cls.cache_size)),
+        )
+
+    def tokenizer(self) -> "Tokenizer":
+        return Tokenizer(load_key(self.key_file, self.create_key_if_missing), self.cache_size)
+
+
+class Tokenizer:
+    """
+    Deterministic keyed tokenizer with a bounded LRU cache.
+    """
+
+    def __init__(self, key: bytes, cache_size: int = 100_000):
+        self._key = key
+        self._states: Dict[str, Tuple[Any, Any]] = {}
+        self.token: Callable[[str, str], str] = lru_cache(maxsize=cache_size)(self._compute)
+
+    def _field_states(self, field: str) -> Tuple[Any, Any]:
+        """
+        SHA-256 states after absorbing (field_key ^ ipad) and (field_key ^ opad).
+        """
+        states = self._states.get(field)
+        if states is None:
+            field_key = hmac.new(self._key, f"field:{field}".encode("utf-8"), hashlib.sha256).digest()
+            block = field_key.ljust(_SHA256_BLOCK, b"\0")
+            states = (hashlib.sha256(block.translate(_IPAD)), hashlib.sha256(block.translate(_OPAD)))
+            self._states[field] = states
+        return states
+
+    def _compute(self, field: str, value: str) -> str:
+        inner_state, outer_state = self._field_states(field)
+        inner = inner_state.copy()
+        inner.update(value.encode("utf-8"))
+        outer = outer_state.copy()
+        outer.update(inner.digest())
+        return TOKEN_PREFIX + outer.hexdigest()[:_TOKEN_HEX_CHARS]
+
+    def mask_value(self, field: str, value: Any) -> Any:
+        """
+        Token for one raw value; None and empty strings pass through.
+        """
+        if value is None or value == "":
+            return value
+        return self.token(field, str(value))
+
+    def cache_info(self) -> Any:
+        return self.token.cache_info()  # type: ignore[attr-defined]
+
+
+def mask_payload(payload: Dict[str, Any], document_type: DocumentType, tokenizer: Tokenizer) -> Dict[str, Any]:
+    """
+    Mask the PII fields of one raw payload in place and return it.
+    """
+    for field in PII_FIELDS.get(document_type, ()):
+        if field in payload:
+            payload[field] = tokenizer.mask_value(field, payload[field])
+    return payload
+
+
+def mask_result(result: ExtractionResult, tokenizer: Tokenizer) -> ExtractionResult:
+    """
+    Mask a result in place, once: a result already marked pii_masked is returned as is.
+    """
+    if not result.pii_masked:
+        mask_payload(result.payload, result.metadata.document_type, tokenizer)
+        result.pii_masked = True
+    return result
+
+
+def mask_batch(results: Iterable[ExtractionResult], tokenizer: Tokenizer) -> List[ExtractionResult]:
+    """
+    Mask a batch of extraction results in place.
+    """
+    return [mask_result(r, tokenizer) for r in results]
+
+
+def mask_frame(df: Any, document_type: DocumentType, tokenizer: Tokenizer) -> Any:
+    """
+    Return a copy of a pandas DataFrame with the PII columns of
+    `document_type` masked, tokenizing each distinct value once. The copy
+    is marked with attrs["pii_masked"]; a marked frame is returned as is.
+    """
+    if df.attrs.get("pii_masked"):
+        return df
+    df = df.copy()
+    df.attrs["pii_masked"] = True
+    for field in PII_FIELDS.get(document_type, ()):
+        if field in df.columns:
+            uniques = df[field].dropna().unique()
+            tokens = {v: tokenizer.mask_value(field, v) for v in uniques}
+            df[field] = df[field].map(tokens).where(df[field].notna(), df[field])
+    return df
+
+
+def _synthetic_results(n: int, distinct: int) -> List[ExtractionResult]:
+    from .schemas import DocumentMetadata
+
+    meta = DocumentMetadata(
+        path=Path("bench.json"),
+        customer_id="CUST00000",
+        document_type=DocumentType.ONBOARDING_FORM,
+        region="APAC",
+        source_channel="portal",
+    )
+    results = []
+    for i in range(n):
+        c = i % distinct
+        payload = {
+            "document_type": "onboarding_form",
+            "customer_id": f"CUST{c:08d}",
+            "full_name": f"Customer {c}",
+            "national_id": f"ID{c:08d}",
+            "dob": f"19{70 + c % 25}-06-{1 + c % 28:02d}",
+            "mobile_number": f"+91-9{c:09d}",
+            "email": f"customer{c}@example.com",
+            "region": "APAC",
+        }
+        # Pad to the ~50 fields of a real onboarding payload
+        payload.update({f"attribute_{k:02d}": k * c for k in range(42)})
+        results.append(ExtractionResult(metadata=meta, payload=payload, confidence=0.95))
+    return results
+
+
+def benchmark(records: int, distinct: int, cache_size: int, batch_size: int = 10_000) -> None:
+    """
+    Compare per-document work without masking (JSON decode + validation)
+    against the same work with masking, and time mask_frame on a DataFrame.
+    """
+    import json
+
+    from .validation import route_validation
+
+    key = secrets.token_bytes(_MIN_KEY_BYTES)
+    raw = [json.dumps(r.payload) for r in _synthetic_results(records, distinct)]
+    template = _synthetic_results(1, 1)[0]
+
+    def decode(start: int, stop: int) -> List[ExtractionResult]:
+        return [ExtractionResult(template.metadata, json.loads(s), 0.95) for s in raw[start:stop]]
+
+    t0 = time.perf_counter()
+    for start in range(0, records, batch_size):
+        for r in decode(start, start + batch_size):
+            route_validation(r)
+    base = time.perf_counter() - t0
+
+    tokenizer = Tokenizer(key, cache_size)
+    t0 = time.perf_counter()
+    for start in range(0, records, batch_size):
+        for r in decode(start, start + batch_size):
+            route_validation(mask_result(r, tokenizer))
+    per_record = time.perf_counter() - t0
+    info = tokenizer.cache_info()
+
+    import pandas as pd
+
+    df = pd.DataFrame([json.loads(s) for s in raw])
+    tokenizer = Tokenizer(key, cache_size)
+    t0 = time.perf_counter()
+    mask_frame(df, DocumentType.ONBOARDING_FORM, tokenizer)
+    frame = time.perf_counter() - t0
+
+    def us(seconds: float) -> float:
+        return seconds / records * 1e6
+
+    print(f"[MASK] records={records} | distinct customers={distinct} | cache_size={cache_size}")
+    print(f"[MASK] decode + validate     {us(base):7.2f} us/record")
+    print(f"[MASK] + mask per record     {us(per_record):7.2f} us/record "
+          f"(+{(per_record - base) / base:.0%}, cache hits={info.hits} misses={info.misses})")
+    print(f"[MASK] mask_frame (columnar) {us(frame):7.2f} us/row")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PII tokenization throughput.")
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=50_000, help="Distinct customers among the records")
+    parser.add_argument("--cache-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    benchmark(args.records, args.distinct, args.cache_size)
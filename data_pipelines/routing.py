@@ -0,0 +1,485 @@
+"""
+routing.py
+
+Confidence-based routing of extracted documents.
+
+Every extraction used to go through the same full validation, whatever
+its Document AI confidence. With routing enabled, the validation stage
+first sends each document down one of three routes, using per-document-type
+thresholds from the `routing` config section:
+
+    confidence >= high_confidence[type]   -> "fast"      ERROR rules only
+    low_confidence[type] <= confidence    -> "standard"  full rule set
+    confidence <  low_confidence[type]    -> "review"    early exit to the review queue
+
+Review documents leave the automated pipeline at once (they are not
+validated or turned into features). They are written to a persistent
+local queue (SQLite, standing in for a managed queue) and processed
+by a separate worker pool (`python -m data_pipelines.routing review`),
+which records a full validation outcome per document for the human
+reviewers.
+
+Every route reports its throughput (documents, seconds and documents per
+second), both when a worker finishes and aggregated in a JSONL metrics
+file (`python -m data_pipelines.routing report`).
+
+Example:
+    BANK_DOC_ENV=test python -m data_pipelines.routing review --workers 2
+    BANK_DOC_ENV=test python -m data_pipelines.routing report
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from .config import get_section
+from .schemas import DocumentMetadata, DocumentType, ExtractionResult, ValidationResult
+from .validation import route_validation
+
+if TYPE_CHECKING:
+    from .validation_executor import ValidationExecutor
+
+
+FAST = "fast"
+STANDARD = "standard"
+REVIEW = "review"
+ROUTES = (FAST, STANDARD, REVIEW)
+
+# Thresholds used for document types missing from the config
+DEFAULT_HIGH_CONFIDENCE = 0.95
+DEFAULT_LOW_CONFIDENCE = 0.80
+
+
+@dataclass
+class RoutingConfig:
+    """
+    Settings for the `routing` config section.
+    """
+    enabled: bool = False
+    high_confidence: Dict[str, float] = field(default_factory=dict)   # per document type
+    low_confidence: Dict[str, float] = field(default_factory=dict)
+    queue_path: Path = Path("./review_queue/review_queue.sqlite")
+    metrics_path: Path = Path("./review_queue/routing_metrics.jsonl")
+    review_workers: int = 2
+    claim_batch: int = 50
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RoutingConfig":
+        section = get_section(config, "routing")
+        defaults = cls()
+        return cls(
+            enabled=bool(section.get("enabled", defaults.enabled)),
+            high_confidence={k: float(v) for k, v in (section.get("high_confidence") or {}).items()},
+            low_confidence={k: float(v) for k, v in (section.get("low_confidence") or {}).items()},
+            queue_path=Path(section.get("queue_path", defaults.queue_path)),
+            metrics_path=Path(section.get("metrics_path", defaults.metrics_path)),
+            review_workers=int(section.get("review_workers", defaults.review_workers)),
+            claim_batch=int(section.get("claim_batch", defaults.claim_batch)),
+        )
+
+    def thresholds(self, document_type: DocumentType) -> Tuple[float, float]:
+        """
+        (low, high) confidence thresholds of a document type.
+        """
+        return (
+            self.low_confidence.get(document_type.value, DEFAULT_LOW_CONFIDENCE),
+            self.high_confidence.get(document_type.value, DEFAULT_HIGH_CONFIDENCE),
+        )
+
+    def route_for(self, result: ExtractionResult) -> str:
+        low, high = self.thresholds(result.metadata.document_type)
+        if result.confidence >= high:
+            return FAST
+        if result.confidence < low:
+            return REVIEW
+        return STANDARD
+
+
+@dataclass
+class RouteMetrics:
+    """
+    Documents handled on one route and the time spent on them.
+    """
+    documents: int = 0
+    valid: int = 0
+    seconds: float = 0.0
+
+    @property
+    def per_second(self) -> float:
+        return self.documents / self.seconds if self.seconds > 0 else 0.0
+
+    def add(self, other: "RouteMetrics") -> None:
+        self.documents += other.documents
+        self.valid += other.valid
+        self.seconds += other.seconds
+
+
+def format_metrics(metrics: Dict[str, RouteMetrics]) -> str:
+    return " | ".join(
+        f"{route}: {m.documents} docs in {m.seconds:.3f}s ({m.per_second:,.0f}/s)"
+        for route, m in metrics.items()
+        if m.documents
+    ) or "no documents"
+
+
+def write_metrics(path: Path, source: str, metrics: Dict[str, RouteMetrics]) -> None:
+    """
+    Append one JSON line of per-route metrics. Each line is a single
+    small O_APPEND write, so concurrent workers do not interleave.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    line = json.dumps({
+        "time": time.time(),
+        "source": source,
+        "pid": os.getpid(),
+        "routes": {route: asdict(m) for route, m in metrics.items() if m.documents},
+    })
+    with path.open("a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def read_metrics(path: Path, since: float = 0.0) -> Dict[str, Dict[str, RouteMetrics]]:
+    """
+    {source: {route: totals}} over the metrics lines written after `since`.
+    """
+    totals: Dict[str, Dict[str, RouteMetrics]] = {}
+    if not path.exists():
+        return totals
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry["time"] < since:
+                continue
+            by_route = totals.setdefault(entry["source"], {})
+            for route, values in entry["routes"].items():
+                by_route.setdefault(route, RouteMetrics()).add(RouteMetrics(**values))
+    return totals
+
+
+class ReviewQueue:
+    """
+    Persistent FIFO of low-confidence extractions awaiting review.
+
+    Items go pending -> claimed (by one review worker) -> done. Claims
+    are taken in a write transaction, so several worker processes can
+    drain the queue concurrently; claims of a worker that died can be
+    put back with requeue_stale().
+
+    An item is keyed by (path, run_id), so a rerun of the same run does
+    not queue its documents again; see put().
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        # Autocommit; claims open their own write transaction
+        self._conn = sqlite3.connect(str(path), timeout=30.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS review_queue ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "status TEXT NOT NULL DEFAULT 'pending', "
+            "enqueued_at REAL NOT NULL, claimed_at REAL, done_at REAL, "
+            "document_type TEXT NOT NULL, path TEXT NOT NULL, customer_id TEXT, "
+            "region TEXT, source_channel TEXT, confidence REAL NOT NULL, "
+            "payload TEXT NOT NULL, outcome TEXT, "
+            "run_id TEXT NOT NULL DEFAULT '', pii_masked INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._migrate()
+        self._conn.execute("CREATE INDEX IF NOT EXISTS review_queue_status ON review_queue (status, id)")
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS review_queue_document ON review_queue (path, run_id)")
+
+    def _migrate(self) -> None:
+        """
+        Bring a queue created before items were keyed by (path, run_id) up
+        to date. Its rows get run_id '', and repeated puts of the same path
+        are collapsed to the oldest item.
+        """
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(review_queue)")}
+        if "run_id" in columns:
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute("ALTER TABLE review_queue ADD COLUMN run_id TEXT NOT NULL DEFAULT ''")
+            self._conn.execute("ALTER TABLE review_queue ADD COLUMN pii_masked INTEGER NOT NULL DEFAULT 0")
+            removed = self._conn.execute(
+                "DELETE FROM review_queue WHERE id NOT IN (SELECT min(id) FROM review_queue GROUP BY path)"
+            ).rowcount
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        print(f"[ROUTING] Migrated review queue {self.path} (dropped {removed} repeated items)")
+
+    def put(self, result: ExtractionResult, run_id: str = "") -> bool:
+        """
+        Queue a document for review. Putting the same path again for the
+        same run is a no-op unless the payload changed (a corrected
+        re-upload), in which case the item is refreshed and, if already
+        reviewed, goes back to pending. Items claimed by a worker are left
+        alone. Returns whether the queue changed.
+        """
+        meta = result.metadata
+        cur = self._conn.execute(
+            "INSERT INTO review_queue (enqueued_at, document_type, path, customer_id, region, "
+            "source_channel, confidence, payload, run_id, pii_masked) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (path, run_id) DO UPDATE SET "
+            "status = 'pending', enqueued_at = excluded.enqueued_at, claimed_at = NULL, done_at = NULL, "
+            "outcome = NULL, document_type = excluded.document_type, customer_id = excluded.customer_id, "
+            "region = excluded.region, source_channel = excluded.source_channel, "
+            "confidence = excluded.confidence, payload = excluded.payload, pii_masked = excluded.pii_masked "
+            "WHERE review_queue.payload != excluded.payload AND review_queue.status != 'claimed'",
+            (time.time(), meta.document_type.value, str(meta.path), meta.customer_id, meta.region,
+             meta.source_channel, result.confidence, json.dumps(result.payload, default=str), run_id,
+             int(result.pii_masked)),
+        )
+        return cur.rowcount > 0
+
+    def claim(self, limit: int) -> List[Tuple[int, ExtractionResult]]:
+        """
+        Take up to `limit` pending items, oldest first.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._conn.execute(
+                "SELECT id, document_type, path, customer_id, region, source_channel, confidence, payload, "
+                "pii_masked FROM review_queue WHERE status = 'pending' ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE review_queue SET status = 'claimed', claimed_at = ? WHERE id = ?",
+                [(time.time(), row[0]) for row in rows],
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+        claimed = []
+        for item_id, doc_type, path, customer_id, region, channel, confidence, payload, masked in rows:
+            meta = DocumentMetadata(Path(path), customer_id, DocumentType(doc_type), region, channel)
+            result = ExtractionResult(meta, json.loads(payload), confidence, pii_masked=bool(masked))
+            claimed.append((item_id, result))
+        return claimed
+
+    def complete(self, outcomes: List[Tuple[int, ValidationResult]]) -> None:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "UPDATE review_queue SET status = 'done', done_at = ?, outcome = ? "
+                "WHERE id = ? AND status = 'claimed'",
+                [(time.time(), json.dumps(vr.to_dict()), item_id) for item_id, vr in outcomes],
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def requeue_stale(self, older_than_s: float) -> int:
+        """
+        Put back claims older than `older_than_s` (their worker died).
+        """
+        cur = self._conn.execute(
+            "UPDATE review_queue SET status = 'pending', claimed_at = NULL "
+            "WHERE status = 'claimed' AND claimed_at < ?",
+            (time.time() - older_than_s,),
+        )
+        return cur.rowcount
+
+    def reviewed(self, run_id: Optional[str] = None, valid_only: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Payloads of reviewed documents, optionally of one run only.
+
+        Nothing in the pipeline reads these back: reviewed documents do not
+        reach feature engineering. Feeding them into a later run is left to
+        the reviewers' tooling, which can read them from here.
+        """
+        sql = "SELECT payload, outcome FROM review_queue WHERE status = 'done'"
+        params: Tuple[Any, ...] = ()
+        if run_id is not None:
+            sql += " AND run_id = ?"
+            params = (run_id,)
+        for payload, outcome in self._conn.execute(sql + " ORDER BY id", params):
+            if not valid_only or json.loads(outcome)["is_valid"]:
+                yield json.loads(payload)
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._conn.execute("SELECT status, count(*) FROM review_queue GROUP BY status"))
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "ReviewQueue":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class RoutedValidation:
+    """
+    Per-document validation with confidence routing.
+
+    Returns (result, ValidationResult) for fast and standard documents and
+    nothing for review documents, which go to the review queue instead.
+    Used as a runner streaming stage: the queue is opened lazily inside
+    each worker process, and close() reports the worker's route metrics.
+    Review documents are queued under `run_id`, so rerunning a run does
+    not queue them twice.
+    """
+
+    def __init__(self, routing: RoutingConfig, run_id: str = ""):
+        self.routing = routing
+        self.run_id = run_id
+        self.metrics = {route: RouteMetrics() for route in ROUTES}
+        self._queue: Optional[ReviewQueue] = None
+
+    def __call__(self, result: ExtractionResult) -> List[Tuple[ExtractionResult, ValidationResult]]:
+        started = time.perf_counter()
+        route = self.routing.route_for(result)
+        if route == REVIEW:
+            if self._queue is None:
+                self._queue = ReviewQueue(self.routing.queue_path)
+            self._queue.put(result, self.run_id)
+            out: List[Tuple[ExtractionResult, ValidationResult]] = []
+        else:
+            vr = route_validation(result, full=route == STANDARD)
+            out = [(result, vr)]
+
+        metrics = self.metrics[route]
+        metrics.documents += 1
+        metrics.valid += int(bool(out) and out[0][1].is_valid)
+        metrics.seconds += time.perf_counter() - started
+        print(f"[ROUTING] {result.metadata.path.name} -> {route} (confidence={result.confidence:.2f})")
+        return out
+
+    def validate_batch(
+        self,
+        results: List[ExtractionResult],
+        executor: "ValidationExecutor",
+    ) -> List[Tuple[int, ExtractionResult, ValidationResult]]:
+        """
+        Batch form of __call__: review documents are queued, and the fast
+        and standard routes are each validated as one executor batch.
+        Returns (index in `results`, result, validation) in input order.
+        """
+        by_route: Dict[str, List[int]] = {route: [] for route in ROUTES}
+        for i, result in enumerate(results):
+            route = self.routing.route_for(result)
+            by_route[route].append(i)
+            print(f"[ROUTING] {result.metadata.path.name} -> {route} (confidence={result.confidence:.2f})")
+
+        if by_route[REVIEW]:
+            started = time.perf_counter()
+            if self._queue is None:
+                self._queue = ReviewQueue(self.routing.queue_path)
+            for i in by_route[REVIEW]:
+                self._queue.put(results[i], self.run_id)
+            self.metrics[REVIEW].documents += len(by_route[REVIEW])
+            self.metrics[REVIEW].seconds += time.perf_counter() - started
+
+        validated: List[Tuple[int, ExtractionResult, ValidationResult]] = []
+        for route in (FAST, STANDARD):
+            rows = by_route[route]
+            if not rows:
+                continue
+            vrs, report = executor.validate([results[i] for i in rows], full=route == STANDARD)
+            if report.issues:
+                print(f"[VALIDATE] {route}: {report.summary()}")
+            metrics = self.metrics[route]
+            metrics.documents += len(rows)
+            metrics.valid += report.valid
+            metrics.seconds += report.seconds
+            validated.extend((i, results[i], vr) for i, vr in zip(rows, vrs))
+        validated.sort(key=lambda item: item[0])
+        return validated
+
+    def close(self) -> None:
+        if self._queue is not None:
+            self._queue.close()
+            self._queue = None
+        if any(m.documents for m in self.metrics.values()):
+            print(f"[ROUTING] worker {os.getpid()}: {format_metrics(self.metrics)}")
+            write_metrics(self.routing.metrics_path, "pipeline", self.metrics)
+            self.metrics = {route: RouteMetrics() for route in ROUTES}
+
+
+def _review_worker(queue_path: str, metrics_path: str, claim_batch: int) -> RouteMetrics:
+    """
+    Drain the review queue until it is empty; returns this worker's totals.
+    """
+    metrics = RouteMetrics()
+    with ReviewQueue(Path(queue_path)) as queue:
+        while True:
+            claimed = queue.claim(claim_batch)
+            if not claimed:
+                break
+            started = time.perf_counter()
+            # Stand-in for the human review: the full rule set on every item
+            outcomes = [(item_id, route_validation(result)) for item_id, result in claimed]
+            queue.complete(outcomes)
+            metrics.documents += len(outcomes)
+            metrics.valid += sum(vr.is_valid for _, vr in outcomes)
+            metrics.seconds += time.perf_counter() - started
+    if metrics.documents:
+        write_metrics(Path(metrics_path), "review", {REVIEW: metrics})
+    return metrics
+
+
+def run_review_workers(
+    cfg: RoutingConfig, workers: Optional[int] = None, stale_after_s: float = 3600.0
+) -> RouteMetrics:
+    """
+    Process every pending review item with a pool of review workers.
+    """
+    with ReviewQueue(cfg.queue_path) as queue:
+        requeued = queue.requeue_stale(stale_after_s)
+        pending = queue.counts().get("pending", 0)
+    print(f"[ROUTING] Review queue: {pending} pending" + (f" ({requeued} stale claims requeued)" if requeued else ""))
+
+    started = time.perf_counter()
+    total = RouteMetrics()
+    workers = workers or cfg.review_workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_review_worker, str(cfg.queue_path), str(cfg.metrics_path), cfg.claim_batch)
+            for _ in range(workers)
+        ]
+        for future in futures:
+            total.add(future.result())
+    wall = time.perf_counter() - started
+    print(f"[ROUTING] Reviewed {total.documents} documents ({total.valid} valid) with {workers} workers "
+          f"in {wall:.2f}s ({total.documents / wall if wall > 0 else 0:,.0f}/s)")
+    return total
+
+
+if __name__ == "__main__":
+    from .config import load_config
+
+    parser = argparse.ArgumentParser(description="Review queue workers and routing throughput report.")
+    parser.add_argument("command", choices=["review", "report"])
+    parser.add_argument("--env", default=None, help="dev / test / prod (default: $BANK_DOC_ENV or dev)")
+    parser.add_argument("--workers", type=int, help="Override routing.review_workers")
+    parser.add_argument("--hours", type=float, default=24.0, help="report: metrics window")
+    args = parser.parse_args()
+
+    cfg = RoutingConfig.from_config(load_config(args.env))
+    if args.command == "review":
+        run_review_workers(cfg, args.workers)
+    else:
+        totals = read_metrics(cfg.metrics_path, since=time.time() - args.hours * 3600)
+        for source, by_route in totals.items():
+            print(f"[ROUTING] {source}: {format_metrics(by_route)}")
+        with ReviewQueue(cfg.queue_path) as queue:
+            print(f"[ROUTING] Review queue: {queue.counts()}")
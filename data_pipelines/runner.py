@@ -0,0 +1,929 @@
+"""
+runner.py
+
+Config-driven pipeline runner.
+
+Builds a DAG of the existing stages:
+
+    discovery -> ingestion -> extraction -> validation
+              -> feature_engineering -> training -> scoring
+
+and executes it with a small scheduler:
+- Per-document ("streaming") stages that form a chain are pipelined
+  across worker processes connected by bounded multiprocessing queues,
+  so ingestion, extraction and validation overlap instead of running
+  one full pass after another.
+- Whole-dataset ("batch") stages run in the driver process.
+- After each stage (or pipelined segment) completes, its output is
+  checkpointed; re-running with the same run_id and resume=True skips
+  completed stages and restarts from the last checkpoint after a crash.
+
+The `pipeline` section of config/config_<env>.yaml controls paths,
+queue sizes and worker counts.
+
+Example (local):
+    BANK_DOC_ENV=dev python -m data_pipelines.runner --run-id demo --resume
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import pickle
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .audit_log import AuditLogConfig, AuditLogWriter
+from .config import get_section, load_config
+from .curated_store import CuratedStoreConfig, close_stores, materialize
+from .customer_index import CustomerIndex, CustomerIndexConfig
+from .dedup import DedupConfig, DedupIndex
+from .extraction import extract_document
+from .ingestion import discover_documents, ingest_file
+from .masking import MaskingConfig, Tokenizer, mask_result
+from .profiling import StageProfiler
+from .routing import RoutedValidation, RoutingConfig
+from .schemas import ExtractionResult, ValidationResult
+from .validation import validate_result
+from .validation_executor import ValidationExecutor, ValidationExecutorConfig
+
+
+# Marker passed through the queues to signal the end of a stream
+_SENTINEL = None
+
+# How often blocked queue operations wake up to check worker liveness
+_POLL_SECONDS = 0.2
+
+# Failure messages kept per worker for the error report
+_MAX_FAILURE_SAMPLES = 5
+
+
+@dataclass
+class Stage:
+    """
+    A node in the pipeline DAG.
+
+    Batch stages receive the outputs of their dependencies as positional
+    arguments (in `depends_on` order) and return a single value.
+
+    Streaming stages have exactly one dependency and are called once per
+    item of its output; they return an iterable of zero or more output
+    items (so they can drop or fan out records).
+    """
+    name: str
+    func: Callable[..., Any]
+    depends_on: List[str] = field(default_factory=list)
+    streaming: bool = False
+    workers: int = 1
+
+
+@dataclass
+class RunnerConfig:
+    """
+    Settings for the `pipeline` config section.
+    """
+    source_dir: Path = Path("./sample_data")
+    landing_dir: Path = Path("./landing_zone")
+    output_dir: Path = Path("./pipeline_output")
+    checkpoint_dir: Path = Path("./checkpoints")
+    default_region: str = "APAC"
+    queue_size: int = 256
+    workers: Dict[str, int] = field(default_factory=dict)
+    dedup: DedupConfig = field(default_factory=DedupConfig)
+    customer_index: CustomerIndexConfig = field(default_factory=CustomerIndexConfig)
+    routing: RoutingConfig = field(default_factory=RoutingConfig)
+    audit: AuditLogConfig = field(default_factory=AuditLogConfig)
+    curated: CuratedStoreConfig = field(default_factory=CuratedStoreConfig)
+    masking: MaskingConfig = field(default_factory=MaskingConfig)
+    validation_executor: ValidationExecutorConfig = field(default_factory=ValidationExecutorConfig)
+    monitoring: Dict[str, Any] = field(default_factory=dict)  # raw `monitoring` section
+    serving: Dict[str, Any] = field(default_factory=dict)     # raw `serving` section
+    feature_cache: Dict[str, Any] = field(default_factory=dict)  # raw `feature_cache` section
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RunnerConfig":
+        section = get_section(config, "pipeline")
+        defaults = cls()
+        return cls(
+            source_dir=Path(section.get("source_dir", defaults.source_dir)),
+            landing_dir=Path(section.get("landing_dir", defaults.landing_dir)),
+            output_dir=Path(section.get("output_dir", defaults.output_dir)),
+            checkpoint_dir=Path(section.get("checkpoint_dir", defaults.checkpoint_dir)),
+            default_region=str(section.get("default_region", defaults.default_region)),
+            queue_size=int(section.get("queue_size", defaults.queue_size)),
+            workers={k: int(v) for k, v in (section.get("workers") or {}).items()},
+            dedup=DedupConfig.from_config(config),
+            customer_index=CustomerIndexConfig.from_config(config),
+            routing=RoutingConfig.from_config(config),
+            audit=AuditLogConfig.from_config(config),
+            curated=CuratedStoreConfig.from_config(config),
+            masking=MaskingConfig.from_config(config),
+            validation_executor=ValidationExecutorConfig.from_config(config),
+            monitoring=get_section(config, "monitoring"),
+            serving=get_section(config, "serving"),
+            feature_cache=get_section(config, "feature_cache"),
+        )
+
+
+class CheckpointStore:
+    """
+    Stage checkpoints for one run, stored as pickles under
+    <checkpoint_dir>/<run_id>/<stage>.pkl.
+
+    Writes go to a temp file first and are renamed into place, so a crash
+    mid-write never leaves a truncated checkpoint behind.
+    """
+
+    def __init__(self, checkpoint_dir: Path, run_id: str):
+        self.run_dir = checkpoint_dir / run_id
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, stage: str) -> Path:
+        return self.run_dir / f"{stage}.pkl"
+
+    def has(self, stage: str) -> bool:
+        return self._path(stage).exists()
+
+    def save(self, stage: str, output: Any) -> None:
+        path = self._path(stage)
+        tmp = path.with_suffix(".pkl.tmp")
+        with tmp.open("wb") as f:
+            pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def load(self, stage: str) -> Any:
+        with self._path(stage).open("rb") as f:
+            return pickle.load(f)
+
+    def clear(self) -> None:
+        for path in self.run_dir.glob("*.pkl"):
+            path.unlink()
+
+
+def _topological_order(stages: Dict[str, Stage]) -> List[str]:
+    """
+    Kahn's algorithm; keeps declaration order among ready stages.
+    """
+    for stage in stages.values():
+        for dep in stage.depends_on:
+            if dep not in stages:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+    remaining = {name: set(stage.depends_on) for name, stage in stages.items()}
+    order: List[str] = []
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Pipeline has a dependency cycle among: {sorted(remaining)}")
+        for name in ready:
+            order.append(name)
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return order
+
+
+def _stream_worker(
+    func: Callable[[Any], Iterable[Any]],
+    inbox: "mp.Queue",
+    outbox: "mp.Queue",
+    errors: "mp.Queue",
+    stage_name: str,
+) -> None:
+    """
+    Worker process body for a streaming stage: consume items until the
+    sentinel arrives, pushing every produced item downstream.
+
+    An exception on one item does not stop the stream, but it is counted
+    and reported on `errors` when the worker finishes, so the driver can
+    fail the segment instead of checkpointing a partial output.
+
+    Stage callables with a `close()` method (e.g. ones holding an index
+    or connection) are closed once the stream ends.
+    """
+    failed = 0
+    samples: List[str] = []
+    while True:
+        item = inbox.get()
+        if item is _SENTINEL:
+            break
+        try:
+            for out in func(item):
+                outbox.put(out)
+        except Exception as exc:
+            failed += 1
+            if len(samples) < _MAX_FAILURE_SAMPLES:
+                samples.append(repr(exc))
+            print(f"[RUNNER] {stage_name}: failed on item: {exc!r}")
+
+    close = getattr(func, "close", None)
+    if close is not None:
+        close()
+    errors.put((stage_name, failed, samples))
+
+
+class _Aborted(Exception):
+    """Raised inside the driver threads when the segment is being torn down."""
+
+
+class PipelineRunner:
+    """
+    Executes a DAG of stages with pipelined streaming segments and
+    checkpoint-based resume.
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        checkpoints: CheckpointStore,
+        queue_size: int = 256,
+        profiler: Optional[StageProfiler] = None,
+    ):
+        self.stages = {s.name: s for s in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        self.order = _topological_order(self.stages)
+        self.checkpoints = checkpoints
+        self.queue_size = queue_size
+        self.profiler = profiler or StageProfiler()
+        self._validate_streaming()
+
+    def _validate_streaming(self) -> None:
+        for stage in self.stages.values():
+            if stage.streaming and len(stage.depends_on) != 1:
+                raise ValueError(f"Streaming stage '{stage.name}' must have exactly one dependency")
+
+        # Intermediate outputs of a pipelined chain are never materialized,
+        # so only the chain tail may feed other stages.
+        for segment in self._segments():
+            for inner in segment[:-1]:
+                consumers = [s.name for s in self.stages.values() if inner in s.depends_on]
+                if consumers != [segment[segment.index(inner) + 1]]:
+                    raise ValueError(
+                        f"Streaming stage '{inner}' feeds {consumers}; only the last stage "
+                        f"of a pipelined chain may have other consumers"
+                    )
+
+    def _segments(self) -> List[List[str]]:
+        """
+        Group the topological order into units of execution: single batch
+        stages, or maximal chains of streaming stages.
+        """
+        segments: List[List[str]] = []
+        for name in self.order:
+            stage = self.stages[name]
+            prev = segments[-1] if segments else None
+            if (
+                stage.streaming
+                and prev is not None
+                and self.stages[prev[-1]].streaming
+                and stage.depends_on == [prev[-1]]
+            ):
+                prev.append(name)
+            else:
+                segments.append([name])
+        return segments
+
+    def run(self, resume: bool = True) -> Dict[str, Any]:
+        """
+        Run all stages and return the outputs of the batch stages and
+        streaming chain tails, keyed by stage name.
+        """
+        if not resume:
+            self.checkpoints.clear()
+            self._notify(self.order, "on_reset")
+
+        outputs: Dict[str, Any] = {}
+        for segment in self._segments():
+            tail = segment[-1]
+            if resume and self.checkpoints.has(tail):
+                print(f"[RUNNER] Resuming: loaded checkpoint for {'+'.join(segment)}")
+                outputs[tail] = self.checkpoints.load(tail)
+                continue
+
+            self._notify(segment, "on_segment_start")
+            t0 = time.perf_counter()
+            with self.profiler.stage("+".join(segment)):
+                if self.stages[tail].streaming:
+                    result = self._run_streaming(segment, outputs)
+                else:
+                    stage = self.stages[tail]
+                    result = stage.func(*(outputs[d] for d in stage.depends_on))
+            self.checkpoints.save(tail, result)
+            self._notify(segment, "on_checkpoint")
+            outputs[tail] = result
+
+            print(f"[RUNNER] Completed {'+'.join(segment)} in {time.perf_counter() - t0:.2f}s")
+
+        self.profiler.print_summary()
+        return outputs
+
+    def _notify(self, names: List[str], hook: str) -> None:
+        """
+        Call an optional lifecycle hook on stage callables, in the driver:
+        - on_reset: the run is starting over (resume=False)
+        - on_segment_start: the stage is about to (re)run
+        - on_checkpoint: the stage output has been durably checkpointed
+        """
+        for name in names:
+            method = getattr(self.stages[name].func, hook, None)
+            if method is not None:
+                method()
+
+    def _run_streaming(self, segment: List[str], outputs: Dict[str, Any]) -> List[Any]:
+        """
+        Run a chain of streaming stages as a process pipeline:
+
+            feeder -> q0 -> [stage 0 workers] -> q1 -> ... -> qN -> driver
+
+        Queues are bounded so a fast producer blocks instead of buffering
+        the whole dataset in memory.
+        """
+        head = self.stages[segment[0]]
+        items = outputs[head.depends_on[0]]
+        stages = [self.stages[name] for name in segment]
+
+        queues = [mp.Queue(maxsize=self.queue_size) for _ in range(len(stages) + 1)]
+        errors: mp.Queue = mp.Queue()
+        workers: List[List[mp.Process]] = []
+        for i, stage in enumerate(stages):
+            procs = [
+                mp.Process(
+                    target=_stream_worker,
+                    args=(stage.func, queues[i], queues[i + 1], errors, stage.name),
+                    name=f"{stage.name}-{n}",
+                    daemon=True,
+                )
+                for n in range(max(1, stage.workers))
+            ]
+            for p in procs:
+                p.start()
+            workers.append(procs)
+        all_procs = [p for procs in workers for p in procs]
+
+        # Set as soon as any worker dies abnormally (OOM kill, segfault,
+        # os._exit): the threads below stop blocking on queues whose
+        # consumers are gone and the driver tears the segment down.
+        abort = threading.Event()
+
+        def check_workers() -> None:
+            if any(p.exitcode not in (None, 0) for p in all_procs):
+                abort.set()
+            if abort.is_set():
+                raise _Aborted()
+
+        def put(q: "mp.Queue", item: Any) -> None:
+            while True:
+                try:
+                    q.put(item, timeout=_POLL_SECONDS)
+                    return
+                except queue.Full:
+                    check_workers()
+
+        def feed() -> None:
+            try:
+                for item in items:
+                    put(queues[0], item)
+                for _ in workers[0]:
+                    put(queues[0], _SENTINEL)
+            except _Aborted:
+                pass
+
+        def close_stages() -> None:
+            # Once every worker of stage i has exited, stage i+1 has seen all
+            # of its input and can be told to stop.
+            try:
+                for i, procs in enumerate(workers):
+                    for p in procs:
+                        while p.exitcode is None:
+                            check_workers()
+                            p.join(_POLL_SECONDS)
+                    check_workers()
+                    downstream = len(workers[i + 1]) if i + 1 < len(workers) else 1
+                    for _ in range(downstream):
+                        put(queues[i + 1], _SENTINEL)
+            except _Aborted:
+                pass
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        closer = threading.Thread(target=close_stages, daemon=True)
+        feeder.start()
+        closer.start()
+
+        results: List[Any] = []
+        while not abort.is_set():
+            try:
+                item = queues[-1].get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                if any(p.exitcode not in (None, 0) for p in all_procs):
+                    abort.set()
+                continue
+            if item is _SENTINEL:
+                break
+            results.append(item)
+
+        if abort.is_set():
+            for p in all_procs:
+                if p.exitcode is None:
+                    p.terminate()
+        feeder.join()
+        closer.join()
+        for p in all_procs:
+            p.join()
+
+        crashed = [f"{p.name} (exitcode={p.exitcode})" for p in all_procs if p.exitcode != 0]
+        if crashed:
+            raise RuntimeError(f"Pipeline workers exited abnormally: {crashed}")
+
+        failures: Dict[str, int] = {}
+        samples: List[str] = []
+        for _ in all_procs:
+            stage_name, failed, worker_samples = errors.get(timeout=30)
+            if failed:
+                failures[stage_name] = failures.get(stage_name, 0) + failed
+                samples.extend(worker_samples)
+        if failures:
+            raise RuntimeError(
+                f"Items failed in {'+'.join(segment)}, segment not checkpointed: {failures}; "
+                f"first errors: {samples[:_MAX_FAILURE_SAMPLES]}"
+            )
+        return results
+
+
+# === Default stages ===
+
+def _ingest_stage(src: Path, landing_dir: Path, default_region: str) -> List[Any]:
+    meta = ingest_file(src, landing_dir, default_region=default_region)
+    return [meta] if meta is not None else []
+
+
+def _extract_stage(meta: Any) -> List[ExtractionResult]:
+    result = extract_document(meta)
+    return [result] if result is not None else []
+
+
+def _validate_stage(result: ExtractionResult) -> List[Tuple[ExtractionResult, ValidationResult]]:
+    return [(result, validate_result(result))]
+
+
+def _executor_validation_stage(
+    results: List[ExtractionResult],
+    executor: ValidationExecutorConfig,
+    routing: RoutingConfig,
+    run_id: str,
+) -> List[Tuple[ExtractionResult, ValidationResult]]:
+    """
+    Batch validation through the ValidationExecutor (partitioned,
+    fail-fast, one issue summary instead of a line per record), routed
+    by confidence if routing is enabled.
+    """
+    with ValidationExecutor(executor) as pool:
+        if routing.enabled:
+            routed = RoutedValidation(routing, run_id)
+            try:
+                return [(result, vr) for _, result, vr in routed.validate_batch(results, pool)]
+            finally:
+                routed.close()
+        validated, report = pool.validate(results)
+        print(f"[VALIDATE] {report.summary()}")
+        return list(zip(results, validated))
+
+
+class _DedupStage:
+    """
+    Streaming stage that drops duplicates against the DedupIndex (dedup.scope).
+
+    The index is opened lazily inside the worker process (connections and
+    Bloom filters are not shared across processes) and closed by
+    _stream_worker when the stream ends. Run with a single worker so the
+    in-memory Bloom filter sees every key.
+
+    Keys only become committed once the runner has checkpointed the
+    segment; keys of an interrupted attempt are discarded before it reruns.
+    """
+
+    def __init__(self, dedup: DedupConfig, run_id: str, check: str):
+        self.dedup = dedup
+        self.run_id = run_id
+        self.check = check  # "content" (DocumentMetadata) or "business" (ExtractionResult)
+        self._index: Optional[DedupIndex] = None
+
+    def _with_index(self, action: Callable[[DedupIndex], None]) -> None:
+        with self.dedup.open_index(self.run_id) as index:
+            action(index)
+
+    def on_reset(self) -> None:
+        self._with_index(DedupIndex.clear_run)
+
+    def on_segment_start(self) -> None:
+        self._with_index(DedupIndex.discard_pending)
+
+    def on_checkpoint(self) -> None:
+        self._with_index(DedupIndex.commit_run)
+
+    def __call__(self, item: Any) -> List[Any]:
+        if self._index is None:
+            self._index = self.dedup.open_index(self.run_id)
+        if self.check == "content":
+            is_new = self._index.is_new_document(item)
+        else:
+            is_new = self._index.is_new_extraction(item)
+        if not is_new:
+            print(f"[DEDUP] Duplicate {self.check}, skipping: {_item_name(item)}")
+        return [item] if is_new else []
+
+    def close(self) -> None:
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+
+class _CustomerKeyStage:
+    """
+    Streaming stage that stamps each document with its dense customer_key.
+
+    The index is opened lazily inside the worker process and closed by
+    _stream_worker when the stream ends. Keys are permanent and shared by
+    all runs, so a resumed or repeated run gets the same keys.
+    """
+
+    def __init__(self, customer_index: CustomerIndexConfig):
+        self.customer_index = customer_index
+        self._index: Optional[CustomerIndex] = None
+
+    def __call__(self, meta: Any) -> List[Any]:
+        if self._index is None:
+            self._index = self.customer_index.open_index()
+        return [self._index.stamp(meta)]
+
+    def close(self) -> None:
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+
+class _MaskingStage:
+    """
+    Streaming stage that tokenizes PII fields before validation.
+
+    The key is loaded and the token cache built lazily inside each worker
+    process, so neither is pickled into the worker arguments.
+    """
+
+    def __init__(self, masking: MaskingConfig):
+        self.masking = masking
+        self._tokenizer: Optional[Tokenizer] = None
+
+    def __call__(self, result: ExtractionResult) -> List[ExtractionResult]:
+        if self._tokenizer is None:
+            self._tokenizer = self.masking.tokenizer()
+        return [mask_result(result, self._tokenizer)]
+
+
+def _item_name(item: Any) -> str:
+    meta = getattr(item, "metadata", item)
+    return meta.path.name
+
+
+def _audit_stage(validated: List[Tuple[ExtractionResult, ValidationResult]], audit_dir: Path) -> Dict[str, Any]:
+    """
+    Append every validation outcome to the binary audit log. Not
+    idempotent: a stage rerun after a crash logs the batch again.
+    """
+    with AuditLogWriter(audit_dir) as log:
+        for result, vr in validated:
+            log.append_result(result, vr)
+    print(f"[RUNNER] Audited {len(validated)} validation results -> {audit_dir}")
+    return {"records": len(validated), "audit_dir": str(audit_dir)}
+
+
+def _curated_stage(
+    validated: List[Tuple[ExtractionResult, ValidationResult]],
+    curated: CuratedStoreConfig,
+) -> Dict[str, Any]:
+    """
+    Upsert the batch's canonical entities into the curated store.
+    Idempotent: a stage rerun rewrites the same rows.
+    """
+    return materialize(validated, curated)
+
+
+def _feature_stage(
+    validated: List[Tuple[ExtractionResult, ValidationResult]],
+    feature_cache: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    # ML dependencies are only needed from this stage onwards
+    from ml.feature_cache import FeatureCacheConfig, fingerprint_frames
+    from ml.feature_engineering import (
+        build_churn_features,
+        build_loan_risk_features,
+        datasets_from_payloads,
+    )
+
+    # Documents arrive in completion order, which changes from run to run;
+    # the builders keep each customer's first row, so fix the order by path
+    ordered = sorted(validated, key=lambda item: str(item[0].metadata.path))
+    payloads = [r.payload for r, vr in ordered if vr.is_valid]
+    print(f"[RUNNER] Building features from {len(payloads)} valid documents")
+    df_bank, df_loan, df_onboard = datasets_from_payloads(payloads)
+
+    # Tables whose inputs are missing are left out; training and scoring
+    # only handle the tables that were built.
+    # Memoized on the input frames' content and the feature code version
+    cache_cfg = FeatureCacheConfig.from_config({"feature_cache": feature_cache or {}})
+    cache = cache_cfg.open_cache() if cache_cfg.enabled else None
+    inputs = fingerprint_frames(df_bank, df_loan, df_onboard) if cache is not None else ""
+
+    def build(table: str, func: Callable[..., Any], *args: Any) -> Any:
+        if cache is None:
+            return func(*args)
+        return cache.get_or_build(table, func, inputs, *args)
+
+    features: Dict[str, Any] = {}
+    if not (df_bank.empty or df_onboard.empty):
+        features["churn"] = build("churn", build_churn_features, df_bank, df_loan, df_onboard)
+    if not (df_bank.empty or df_loan.empty):
+        features["loan_risk"] = build("loan_risk", build_loan_risk_features, df_loan, df_bank)
+    if cache is not None:
+        print(f"[RUNNER] Feature cache: {cache.hits} hits, {cache.misses} builds -> {cache_cfg.cache_dir}")
+
+    if not features:
+        print("[RUNNER] No feature tables built: not enough valid documents. Check that "
+              "pipeline.source_dir holds files named <customer_id>__<document_type>__<region>.<ext>")
+    return features
+
+
+def _training_stage(
+    features: Dict[str, Any],
+    validated: Optional[List[Tuple[ExtractionResult, ValidationResult]]] = None,
+    drift_reports: Optional[Dict[str, Any]] = None,
+    monitoring: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Train one model per feature table; returns {table: (model, compiler)}.
+
+    With monitoring enabled, the training tables (and the run's validation
+    issue rates) also become the drift baselines the next runs compare
+    against. `drift_reports` is unused: the dependency only makes this
+    run's monitoring stage read the previous baselines before they are replaced.
+    """
+    from ml.churn_model_stub import churn_matrix_compiler, train_churn_model
+    from ml.loan_risk_model_stub import loan_risk_matrix_compiler, train_loan_risk_model
+
+    trainers = {
+        "churn": (train_churn_model, churn_matrix_compiler),
+        "loan_risk": (train_loan_risk_model, loan_risk_matrix_compiler),
+    }
+    models: Dict[str, Any] = {}
+    for name, df in features.items():
+        train, make_compiler = trainers[name]
+        compiler = make_compiler()
+        model, _ = train(df, compiler=compiler)
+        models[name] = (model, compiler)
+    if monitoring is not None and monitoring.get("enabled"):
+        _write_baselines(features, validated or [], monitoring)
+    return models
+
+
+def _write_baselines(
+    features: Dict[str, Any],
+    validated: List[Tuple[ExtractionResult, ValidationResult]],
+    monitoring: Dict[str, Any],
+) -> None:
+    from ml.monitoring import Baseline, DriftMonitor, MonitoringConfig
+
+    cfg = MonitoringConfig.from_config({"monitoring": monitoring})
+    probe = DriftMonitor(Baseline(table="validation", rows=0), cfg)
+    probe.update_validation([vr for _, vr in validated])
+    issue_rates = probe.issue_rates()
+    for table, df in features.items():
+        path = cfg.baseline_dir / f"{table}.json"
+        Baseline.from_frame(table, df, cfg, issue_rates=issue_rates).save(path)
+        print(f"[MONITOR] Wrote training baseline for {table} -> {path}")
+
+
+def _scoring_stage(features: Dict[str, Any], models: Dict[str, Any], output_dir: Path) -> Dict[str, Path]:
+    from ml.churn_model_stub import score_churn
+    from ml.explainability import ExplanationEngine
+    from ml.loan_risk_model_stub import score_loan_risk
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    scored: Dict[str, Any] = {}
+    if "churn" in models:
+        model, compiler = models["churn"]
+        scored["churn"] = score_churn(model, features["churn"], compiler=compiler)
+    if "loan_risk" in models:
+        # Underwriters get the top risk factors next to each score
+        model, compiler = models["loan_risk"]
+        explainer = ExplanationEngine(model, feature_names=compiler.feature_names_)
+        scored["loan_risk"] = score_loan_risk(
+            model, features["loan_risk"], explainer=explainer, compiler=compiler
+        )
+
+    paths: Dict[str, Path] = {}
+    for name, df in scored.items():
+        path = output_dir / f"{name}_scores.csv"
+        df.to_csv(path, index=False)
+        paths[name] = path
+        print(f"[RUNNER] Wrote {len(df)} {name} scores -> {path}")
+    return paths
+
+
+def _monitoring_stage(
+    validated: List[Tuple[ExtractionResult, ValidationResult]],
+    features: Dict[str, Any],
+    monitoring: Dict[str, Any],
+    output_dir: Path,
+) -> Dict[str, Any]:
+    """
+    Compare this run's feature tables and validation issue rates with the
+    baselines written when the current models were trained. Tables without
+    a baseline (nothing trained yet) are skipped; training writes them.
+    """
+    from ml.monitoring import Baseline, DriftMonitor, MonitoringConfig, print_report
+
+    cfg = MonitoringConfig.from_config({"monitoring": monitoring})
+    validations = [vr for _, vr in validated]
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    reports: Dict[str, Any] = {}
+    for table, df in features.items():
+        path = cfg.baseline_dir / f"{table}.json"
+        if not path.exists():
+            print(f"[MONITOR] No training baseline for {table} at {path} yet; skipping drift report")
+            continue
+
+        monitor = DriftMonitor(Baseline.load(path), cfg)
+        monitor.update(df)
+        monitor.update_validation(validations)
+        report = monitor.report()
+        print_report(report)
+
+        report_path = output_dir / f"drift_{table}.json"
+        report_path.write_text(json.dumps(report.to_dict(), indent=2), encoding="utf-8")
+        reports[table] = report_path
+    return reports
+
+
+def _serving_stage(
+    features: Dict[str, Any],
+    scores: Dict[str, Path],
+    serving: Dict[str, Any],
+    month: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Fold this run's scores into the dashboard cubes of the serving store.
+    """
+    import pandas as pd
+
+    from ml.serving_store import ServingConfig, ServingStore
+
+    month = month or time.strftime("%Y-%m")
+    written: Dict[str, int] = {}
+    with ServingStore(ServingConfig.from_config({"serving": serving})) as store:
+        if "loan_risk" in scores:
+            written["loan_risk"] = store.materialize_loan_risk(
+                pd.read_csv(scores["loan_risk"]), features["loan_risk"], month
+            )
+        if "churn" in scores:
+            written["churn"] = store.materialize_churn(pd.read_csv(scores["churn"]), features["churn"], month)
+        print(f"[RUNNER] Serving cubes updated for {month}: {written} -> {store.cfg.db_path}")
+    return written
+
+
+def build_default_pipeline(cfg: RunnerConfig, run_id: str = "latest") -> List[Stage]:
+    """
+    Build the standard DAG over the existing pipeline stages.
+    """
+    cfg.landing_dir.mkdir(parents=True, exist_ok=True)
+
+    def workers(name: str) -> int:
+        return cfg.workers.get(name, 1)
+
+    stages = [
+        Stage("discovery", partial(discover_documents, cfg.source_dir)),
+        Stage(
+            "ingestion",
+            partial(_ingest_stage, landing_dir=cfg.landing_dir, default_region=cfg.default_region),
+            depends_on=["discovery"],
+            streaming=True,
+            workers=workers("ingestion"),
+        ),
+    ]
+
+    # Customer keys are assigned at ingestion time; extraction copies them
+    # into the payloads so feature joins can run on integers.
+    upstream = "ingestion"
+    if cfg.customer_index.enabled:
+        stages.append(Stage("customer_index", _CustomerKeyStage(cfg.customer_index), [upstream], streaming=True))
+        upstream = "customer_index"
+
+    # Duplicates are dropped before the stage they would make expensive:
+    # identical files before extraction, repeated business keys before validation.
+    if cfg.dedup.enabled:
+        stages.append(Stage("dedup_content", _DedupStage(cfg.dedup, run_id, "content"), [upstream], streaming=True))
+        upstream = "dedup_content"
+    stages.append(Stage("extraction", _extract_stage, [upstream], streaming=True, workers=workers("extraction")))
+    upstream = "extraction"
+    if cfg.dedup.enabled:
+        stages.append(
+            Stage("dedup_business_key", _DedupStage(cfg.dedup, run_id, "business"), [upstream], streaming=True)
+        )
+        upstream = "dedup_business_key"
+    if cfg.masking.enabled:
+        # Fail fast on a missing key instead of inside every worker
+        cfg.masking.tokenizer()
+        stages.append(
+            Stage("pii_masking", _MaskingStage(cfg.masking), [upstream], streaming=True, workers=workers("masking"))
+        )
+        upstream = "pii_masking"
+
+    # Routed validation drops low-confidence documents into the review queue.
+    # With the executor, validation is one batch stage at the end of the stream.
+    if cfg.validation_executor.enabled:
+        validation = Stage(
+            "validation",
+            partial(
+                _executor_validation_stage, executor=cfg.validation_executor, routing=cfg.routing, run_id=run_id
+            ),
+            [upstream],
+        )
+    else:
+        validate = RoutedValidation(cfg.routing, run_id) if cfg.routing.enabled else _validate_stage
+        validation = Stage("validation", validate, [upstream], streaming=True, workers=workers("validation"))
+    # With monitoring, training runs after the drift report and replaces the baselines
+    if cfg.monitoring.get("enabled"):
+        training = Stage(
+            "training",
+            partial(_training_stage, monitoring=cfg.monitoring),
+            ["feature_engineering", "validation", "monitoring"],
+        )
+    else:
+        training = Stage("training", _training_stage, ["feature_engineering"])
+    return stages + [
+        validation,
+        Stage("feature_engineering", partial(_feature_stage, feature_cache=cfg.feature_cache), ["validation"]),
+        training,
+        Stage(
+            "scoring",
+            partial(_scoring_stage, output_dir=cfg.output_dir),
+            depends_on=["feature_engineering", "training"],
+        ),
+    ] + ([
+        Stage(
+            "monitoring",
+            partial(_monitoring_stage, monitoring=cfg.monitoring, output_dir=cfg.output_dir),
+            depends_on=["validation", "feature_engineering"],
+        ),
+    ] if cfg.monitoring.get("enabled") else []) + ([
+        Stage("audit", partial(_audit_stage, audit_dir=cfg.audit.audit_dir), depends_on=["validation"]),
+    ] if cfg.audit.enabled else []) + ([
+        Stage("curated", partial(_curated_stage, curated=cfg.curated), depends_on=["validation"]),
+    ] if cfg.curated.enabled else []) + ([
+        Stage(
+            "serving",
+            partial(_serving_stage, serving=cfg.serving),
+            depends_on=["feature_engineering", "scoring"],
+        ),
+    ] if cfg.serving.get("enabled") else [])
+
+
+def run_pipeline(
+    env: Optional[str] = None,
+    run_id: str = "latest",
+    resume: bool = True,
+) -> Dict[str, Any]:
+    """
+    Load the environment config, build the default DAG and run it.
+    """
+    config = load_config(env)
+    cfg = RunnerConfig.from_config(config)
+
+    runner = PipelineRunner(
+        build_default_pipeline(cfg, run_id),
+        CheckpointStore(cfg.checkpoint_dir, run_id),
+        queue_size=cfg.queue_size,
+        profiler=StageProfiler.from_config(config),
+    )
+    print(f"[RUNNER] env={config.get('environment')} | run_id={run_id} | resume={resume}")
+    try:
+        return runner.run(resume=resume)
+    finally:
+        close_stores()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the document + ML pipeline DAG.")
+    parser.add_argument("--env", default=None, help="dev / test / prod (default: $BANK_DOC_ENV or dev)")
+    parser.add_argument("--run-id", default="latest", help="Checkpoint namespace for this run")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore and clear existing checkpoints")
+    args = parser.parse_args()
+
+    run_pipeline(env=args.env, run_id=args.run_id, resume=not args.no_resume)
@@ -38,6 +38,7 @@ class DocumentMetadata:
     document_type: DocumentType
     region: str
     source_channel: str  # e.g. "branch", "portal", "api"
+    customer_key: Optional[int] = None  # dense key from the customer index, if enabled
 
 
 @dataclass
@@ -51,6 +52,7 @@ class ExtractionResult:
     metadata: DocumentMetadata
     payload: Dict[str, Any]
     confidence: float
+    pii_masked: bool = False  # set by data_pipelines.masking once PII fields are tokenized
 
 
 @dataclass
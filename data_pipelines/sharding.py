@@ -0,0 +1,395 @@
+"""
+sharding.py
+
+Deterministic partitioning of document processing by customer_id.
+
+Every customer is hashed into one of N shards, so that:
+- ingestion, extraction and validation for a shard can run as an
+  independent worker (a process locally, a node in a cluster)
+- all documents of a customer land in the same shard, which keeps the
+  per-customer feature aggregation shard-local
+- a final merge step only has to concatenate shard feature tables
+
+Each shard goes through the same stages as the runner, reusing its
+stage objects: content dedup, extraction, business-key dedup, PII
+masking (with `dedup.enabled` / `security.enforce_pii_masking`) and
+validation. Dedup keys are scoped per shard and committed once _SUCCESS
+is written; a shard re-run clears its own keys first, since it rewrites
+all of its outputs.
+
+The hash is a stable digest (not Python's salted `hash()`), so the same
+customer maps to the same shard on every node and across runs.
+
+Shard layout under work_dir:
+
+    shard=0003/
+        _MANIFEST                   source paths of this shard (local cluster runs)
+        landing/                    landed documents of this shard
+        bank_statement.jsonl        validated payloads, one per line
+        loan_application.jsonl
+        onboarding_form.jsonl
+        churn_features.parquet      shard-local feature tables
+        loan_risk_features.parquet
+        _SUCCESS                    JSON summary, written last
+
+The merge step writes the full tables to merged_dir (outside work_dir,
+whose shard partitions ml.batch_scoring picks up):
+
+    churn_features.parquet          each renamed into place
+    loan_risk_features.parquet
+    _SUCCESS                        written last
+
+Discovery cost: a local cluster run walks source_dir once in the driver
+and hands every shard a manifest of its own paths. A single-shard run
+(one node) has no driver, so it walks source_dir itself but filters on
+the filename's customer_id during the walk; documents of other shards
+are never opened or parsed.
+
+Example (several local processes standing in for nodes):
+    python -m data_pipelines.sharding --local 4 --num-shards 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .dedup import DedupConfig
+from .extraction import extract_document
+from .ingestion import ingest_file, iter_document_metadata, iter_documents
+from .masking import MaskingConfig
+from .runner import _DedupStage, _MaskingStage
+from .schemas import DocumentType
+from .validation import route_validation
+
+
+SUCCESS_MARKER = "_SUCCESS"
+MANIFEST = "_MANIFEST"
+DEFAULT_MERGED_DIR = Path("./merged_features")
+
+
+def shard_for_customer(customer_id: str, num_shards: int) -> int:
+    """
+    Map a customer_id to a shard in [0, num_shards).
+    """
+    if num_shards < 1:
+        raise ValueError("num_shards must be >= 1")
+    digest = hashlib.blake2b(customer_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+
+def shard_dir(work_dir: Path, shard_id: int) -> Path:
+    return work_dir / f"shard={shard_id:04d}"
+
+
+def write_manifests(source_dir: Path, work_dir: Path, num_shards: int) -> List[Path]:
+    """
+    Walk source_dir once and write one manifest per shard listing the
+    source paths of that shard's documents (one path per line).
+    """
+    partitions: Dict[int, List[str]] = {i: [] for i in range(num_shards)}
+    for meta in iter_document_metadata(source_dir):
+        partitions[shard_for_customer(meta.customer_id, num_shards)].append(str(meta.path))
+
+    manifests: List[Path] = []
+    for shard_id, paths in partitions.items():
+        out_dir = shard_dir(work_dir, shard_id)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        manifest = out_dir / MANIFEST
+        tmp = manifest.with_suffix(".tmp")
+        tmp.write_text("".join(f"{p}\n" for p in paths), encoding="utf-8")
+        os.replace(tmp, manifest)
+        manifests.append(manifest)
+    print(f"[SHARD] Partitioned {sum(len(p) for p in partitions.values())} documents into {num_shards} manifests")
+    return manifests
+
+
+def _read_manifest(manifest: Path) -> Iterable[Path]:
+    with manifest.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield Path(line.rstrip("\n"))
+
+
+@dataclass
+class ShardResult:
+    """
+    Summary of one shard worker run (also stored in the _SUCCESS marker).
+    """
+    shard_id: int
+    num_shards: int
+    ingested: int = 0
+    extracted: int = 0
+    valid: int = 0
+    invalid: int = 0
+    duplicates: int = 0
+
+
+def _write_jsonl_atomic(path: Path, rows: List[Dict[str, Any]]) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row))
+            f.write("\n")
+    os.replace(tmp, path)
+
+
+def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    with path.open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run_shard(
+    source_dir: Path,
+    work_dir: Path,
+    shard_id: int,
+    num_shards: int,
+    default_region: str = "APAC",
+    manifest: Optional[Path] = None,
+    dedup: Optional[DedupConfig] = None,
+    masking: Optional[MaskingConfig] = None,
+    run_id: str = "shards",
+) -> ShardResult:
+    """
+    Ingest, dedup, extract, mask and validate the documents of one shard,
+    then build the shard-local feature tables.
+
+    The shard's documents are read from `manifest` when given (see
+    write_manifests), otherwise found by a shard-filtered walk of source_dir.
+
+    Safe to re-run: all outputs are rewritten and _SUCCESS is written last.
+    """
+    out_dir = shard_dir(work_dir, shard_id)
+    landing_dir = out_dir / "landing"
+    landing_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / SUCCESS_MARKER).unlink(missing_ok=True)
+
+    result = ShardResult(shard_id=shard_id, num_shards=num_shards)
+    valid_payloads: Dict[str, List[Dict[str, Any]]] = {t.value: [] for t in DocumentType}
+
+    if manifest is not None:
+        paths = _read_manifest(manifest)
+    else:
+        paths = iter_documents(source_dir, shard=(shard_id, num_shards))
+
+    # The runner's streaming stages, applied in the runner's order
+    shard_run_id = f"{run_id}/shard={shard_id:04d}"
+    dedup_content = dedup_business = mask = None
+    if dedup is not None and dedup.enabled:
+        dedup_content = _DedupStage(dedup, shard_run_id, "content")
+        dedup_business = _DedupStage(dedup, shard_run_id, "business")
+        dedup_content.on_reset()
+    if masking is not None and masking.enabled:
+        mask = _MaskingStage(masking)
+
+    try:
+        for path in paths:
+            meta = ingest_file(path, landing_dir, default_region=default_region)
+            if meta is None:
+                continue
+            result.ingested += 1
+            if dedup_content is not None and not dedup_content(meta):
+                result.duplicates += 1
+                continue
+
+            extracted = extract_document(meta)
+            if extracted is None:
+                continue
+            result.extracted += 1
+            if dedup_business is not None and not dedup_business(extracted):
+                result.duplicates += 1
+                continue
+            if mask is not None:
+                mask(extracted)
+
+            vr = route_validation(extracted)
+            if vr.is_valid:
+                result.valid += 1
+                valid_payloads[meta.document_type.value].append(extracted.payload)
+            else:
+                result.invalid += 1
+
+        for doc_type, rows in valid_payloads.items():
+            _write_jsonl_atomic(out_dir / f"{doc_type}.jsonl", rows)
+
+        _build_shard_features(out_dir)
+
+        (out_dir / SUCCESS_MARKER).write_text(json.dumps(asdict(result)), encoding="utf-8")
+    finally:
+        for stage in (dedup_content, dedup_business):
+            if stage is not None:
+                stage.close()
+    if dedup_content is not None:
+        dedup_content.on_checkpoint()
+    print(f"[SHARD] shard={shard_id}/{num_shards} | ingested={result.ingested} | "
+          f"duplicates={result.duplicates} | valid={result.valid} | invalid={result.invalid}")
+    return result
+
+
+def _build_shard_features(out_dir: Path) -> None:
+    """
+    Build churn / loan-risk features from the shard's validated payloads.
+
+    Every customer's documents live in a single shard, so the per-customer
+    aggregations here are complete and need no cross-shard exchange.
+    """
+    from ml.feature_engineering import (
+        build_churn_features,
+        build_loan_risk_features,
+        datasets_from_payloads,
+    )
+
+    payloads: List[Dict[str, Any]] = []
+    for doc_type in DocumentType:
+        payloads.extend(_read_jsonl(out_dir / f"{doc_type.value}.jsonl"))
+    df_bank, df_loan, df_onboard = datasets_from_payloads(payloads)
+
+    for name in ("churn_features", "loan_risk_features"):
+        (out_dir / f"{name}.parquet").unlink(missing_ok=True)
+
+    if not (df_bank.empty or df_onboard.empty):
+        build_churn_features(df_bank, df_loan, df_onboard).to_parquet(
+            out_dir / "churn_features.parquet", index=False
+        )
+    if not (df_bank.empty or df_loan.empty):
+        build_loan_risk_features(df_loan, df_bank).to_parquet(
+            out_dir / "loan_risk_features.parquet", index=False
+        )
+
+
+def _check_markers(work_dir: Path, num_shards: int) -> None:
+    """
+    Raise unless every shard has a _SUCCESS marker written for `num_shards`
+    shards (a marker from a run with another shard count covers a different
+    set of customers).
+    """
+    missing: List[int] = []
+    mismatched: Dict[int, Any] = {}
+    for i in range(num_shards):
+        marker = shard_dir(work_dir, i) / SUCCESS_MARKER
+        if not marker.exists():
+            missing.append(i)
+            continue
+        written_for = json.loads(marker.read_text(encoding="utf-8")).get("num_shards")
+        if written_for != num_shards:
+            mismatched[i] = written_for
+    if missing:
+        raise RuntimeError(f"Shards not completed: {missing}")
+    if mismatched:
+        raise RuntimeError(f"Shards completed for a different num_shards than {num_shards}: {mismatched}")
+
+
+def _write_parquet_atomic(df: Any, path: Path) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def merge_shard_outputs(work_dir: Path, num_shards: int, merged_dir: Path = DEFAULT_MERGED_DIR) -> Tuple[Any, Any]:
+    """
+    Combine the shard-local feature tables into the full churn and
+    loan-risk feature tables and write them to merged_dir, each file
+    renamed into place and _SUCCESS last.
+
+    Raises if any shard has not completed for exactly `num_shards` shards,
+    so a partial or mixed merge can never be mistaken for a full one.
+    """
+    import pandas as pd
+
+    _check_markers(work_dir, num_shards)
+
+    def concat(name: str, sort_cols: List[str]) -> pd.DataFrame:
+        parts = [
+            pd.read_parquet(path)
+            for i in range(num_shards)
+            if (path := shard_dir(work_dir, i) / f"{name}.parquet").exists()
+        ]
+        if not parts:
+            return pd.DataFrame()
+        df = pd.concat(parts, ignore_index=True)
+        return df.sort_values(sort_cols, kind="stable").reset_index(drop=True)
+
+    churn = concat("churn_features", ["customer_id"])
+    loan_risk = concat("loan_risk_features", ["application_id"])
+
+    merged_dir.mkdir(parents=True, exist_ok=True)
+    (merged_dir / SUCCESS_MARKER).unlink(missing_ok=True)
+    _write_parquet_atomic(churn, merged_dir / "churn_features.parquet")
+    _write_parquet_atomic(loan_risk, merged_dir / "loan_risk_features.parquet")
+    summary = {"num_shards": num_shards, "churn_rows": len(churn), "loan_risk_rows": len(loan_risk)}
+    (merged_dir / SUCCESS_MARKER).write_text(json.dumps(summary), encoding="utf-8")
+
+    print(f"[SHARD] Merged {num_shards} shards | churn rows={len(churn)} | "
+          f"loan risk rows={len(loan_risk)} -> {merged_dir}")
+    return churn, loan_risk
+
+
+def _run_shard_args(args: Tuple[Any, ...]) -> ShardResult:
+    return run_shard(*args)
+
+
+def run_local_cluster(
+    source_dir: Path,
+    work_dir: Path,
+    num_shards: int,
+    processes: Optional[int] = None,
+    default_region: str = "APAC",
+    dedup: Optional[DedupConfig] = None,
+    masking: Optional[MaskingConfig] = None,
+    merged_dir: Path = DEFAULT_MERGED_DIR,
+) -> Tuple[Any, Any]:
+    """
+    Run every shard in a local process pool (standing in for separate
+    nodes) and merge the results. source_dir is walked once, up front.
+    """
+    if masking is not None and masking.enabled:
+        # Fail fast on a missing key instead of inside every shard
+        masking.tokenizer()
+    manifests = write_manifests(source_dir, work_dir, num_shards)
+    jobs = [
+        (source_dir, work_dir, i, num_shards, default_region, manifests[i], dedup, masking)
+        for i in range(num_shards)
+    ]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = list(pool.map(_run_shard_args, jobs))
+
+    total_valid = sum(r.valid for r in results)
+    print(f"[SHARD] {num_shards} shards done | total valid documents={total_valid}")
+    return merge_shard_outputs(work_dir, num_shards, merged_dir)
+
+
+if __name__ == "__main__":
+    from .config import get_section, load_config
+
+    config = load_config()
+    sharding_cfg = get_section(config, "sharding")
+    dedup_cfg = DedupConfig.from_config(config)
+    masking_cfg = MaskingConfig.from_config(config)
+
+    parser = argparse.ArgumentParser(description="Run document processing for one shard or a local cluster.")
+    parser.add_argument("--source-dir", type=Path, default=Path(sharding_cfg.get("source_dir", "./sample_data")))
+    parser.add_argument("--work-dir", type=Path, default=Path(sharding_cfg.get("work_dir", "./shards")))
+    parser.add_argument("--merged-dir", type=Path,
+                        default=Path(sharding_cfg.get("merged_dir", DEFAULT_MERGED_DIR)))
+    parser.add_argument("--num-shards", type=int, default=int(sharding_cfg.get("num_shards", 4)))
+    parser.add_argument("--shard-id", type=int, help="Run a single shard (one node)")
+    parser.add_argument("--merge", action="store_true", help="Merge completed shard outputs")
+    parser.add_argument("--local", type=int, metavar="PROCESSES", help="Run all shards with N local processes")
+    args = parser.parse_args()
+
+    if args.shard_id is not None:
+        run_shard(args.source_dir, args.work_dir, args.shard_id, args.num_shards,
+                  dedup=dedup_cfg, masking=masking_cfg)
+    elif args.merge:
+        merge_shard_outputs(args.work_dir, args.num_shards, args.merged_dir)
+    else:
+        run_local_cluster(args.source_dir, args.work_dir, args.num_shards, processes=args.local,
+                          dedup=dedup_cfg, masking=masking_cfg, merged_dir=args.merged_dir)
@@ -10,54 +10,67 @@ This helps:
 
 from __future__ import annotations
 
-from typing import List
+from typing import TYPE_CHECKING, List, Optional
 
 from .schemas import ExtractionResult, ValidationResult
 
+if TYPE_CHECKING:
+    from .validation_executor import ValidationExecutor
 
-def validate_bank_statement(result: ExtractionResult) -> ValidationResult:
+
+def validate_bank_statement(result: ExtractionResult, full: bool = True, fail_fast: bool = False) -> ValidationResult:
     vr = ValidationResult(is_valid=True)
     p = result.payload
 
     if not p.get("customer_id"):
         vr.add_issue("customer_id", "Missing customer_id")
+        if fail_fast:
+            return vr
 
     if "closing_balance" in p and "opening_balance" in p:
         if p["closing_balance"] < 0:
             vr.add_issue("closing_balance", "Closing balance cannot be negative")
-    else:
+            if fail_fast:
+                return vr
+    elif full:
         vr.add_issue("closing_balance", "Missing balance fields", severity="WARNING")
 
-    if not p.get("currency"):
+    if full and not p.get("currency"):
         vr.add_issue("currency", "Currency not provided", severity="WARNING")
 
     return vr
 
 
-def validate_loan_application(result: ExtractionResult) -> ValidationResult:
+def validate_loan_application(result: ExtractionResult, full: bool = True, fail_fast: bool = False) -> ValidationResult:
     vr = ValidationResult(is_valid=True)
     p = result.payload
 
     if not p.get("application_id"):
         vr.add_issue("application_id", "Missing application_id")
+        if fail_fast:
+            return vr
 
     for field in ("requested_amount", "tenor_months", "income"):
         if field not in p:
             vr.add_issue(field, f"Missing {field}")
         elif p[field] is not None and p[field] < 0:
             vr.add_issue(field, f"{field} cannot be negative")
+        if fail_fast and not vr.is_valid:
+            return vr
 
     return vr
 
 
-def validate_onboarding_form(result: ExtractionResult) -> ValidationResult:
+def validate_onboarding_form(result: ExtractionResult, full: bool = True, fail_fast: bool = False) -> ValidationResult:
     vr = ValidationResult(is_valid=True)
     p = result.payload
 
     if not p.get("full_name"):
         vr.add_issue("full_name", "Missing full_name")
+        if fail_fast:
+            return vr
 
-    if not p.get("dob"):
+    if full and not p.get("dob"):
         vr.add_issue("dob", "Missing date of birth", severity="WARNING")
 
     if not p.get("region"):
@@ -66,37 +79,72 @@ def validate_onboarding_form(result: ExtractionResult) -> ValidationResult:
     return vr
 
 
-def route_validation(result: ExtractionResult) -> ValidationResult:
+def route_validation(result: ExtractionResult, full: bool = True, fail_fast: bool = False) -> ValidationResult:
     """
     Route to the correct validator based on document type.
+
+    With full=False only the ERROR rules run (the fast path for
+    high-confidence extractions, see data_pipelines.routing); the
+    WARNING-only completeness checks are skipped. With fail_fast=True a
+    record stops at its first ERROR (is_valid is the same either way,
+    only the later issues are not collected).
+
+    A payload the rules cannot evaluate (e.g. income: "n/a") yields an
+    invalid result with a "_document" ERROR instead of raising, so one
+    malformed document never takes down a batch.
     """
     doc_type = result.metadata.document_type
 
-    if doc_type.value == "bank_statement":
-        return validate_bank_statement(result)
-    if doc_type.value == "loan_application":
-        return validate_loan_application(result)
-    if doc_type.value == "onboarding_form":
-        return validate_onboarding_form(result)
+    try:
+        if doc_type.value == "bank_statement":
+            return validate_bank_statement(result, full, fail_fast)
+        if doc_type.value == "loan_application":
+            return validate_loan_application(result, full, fail_fast)
+        if doc_type.value == "onboarding_form":
+            return validate_onboarding_form(result, full, fail_fast)
+    except Exception as exc:
+        return failed_validation(exc)
 
     # Default: no specific rules, consider valid
     return ValidationResult(is_valid=True)
 
 
-def validate_batch(results: List[ExtractionResult]) -> List[ValidationResult]:
+def failed_validation(exc: BaseException) -> ValidationResult:
     """
-    Run validation for a batch of extraction results.
+    Invalid result recording a document that could not be processed.
+    """
+    vr = ValidationResult(is_valid=False)
+    vr.add_issue("_document", f"{type(exc).__name__}: {exc}")
+    return vr
+
+
+def validate_result(result: ExtractionResult) -> ValidationResult:
+    """
+    Validate a single extraction result and log its status.
     """
-    validations: List[ValidationResult] = []
+    vr = route_validation(result)
+    status = "OK" if vr.is_valid else "FAILED"
+    print(f"[VALIDATE] {result.metadata.path.name} -> {status} "
+          f"(issues={len(vr.issues)})")
+    return vr
 
-    for r in results:
-        vr = route_validation(r)
-        status = "OK" if vr.is_valid else "FAILED"
-        print(f"[VALIDATE] {r.metadata.path.name} -> {status} "
-              f"(issues={len(vr.issues)})")
-        validations.append(vr)
 
-    return validations
+def validate_batch(
+    results: List[ExtractionResult],
+    executor: Optional["ValidationExecutor"] = None,
+) -> List[ValidationResult]:
+    """
+    Run validation for a batch of extraction results.
+
+    With an executor (data_pipelines.validation_executor) the batch is
+    validated partitioned and fail-fast, and one issue summary is logged
+    instead of a line per record.
+    """
+    if executor is None:
+        return [validate_result(r) for r in results]
+    validated, report = executor.validate(results)
+    print(f"[VALIDATE] {report.summary()}")
+    return validated
 
 
 if __name__ == "__main__":
@@ -104,10 +152,25 @@ if __name__ == "__main__":
     from pathlib import Path
     from .ingestion import ingest_to_landing
     from .extraction import extract_from_metadata_items
+    from .config import load_config
+    from .profiling import StageProfiler
+    from .validation_executor import ValidationExecutor, ValidationExecutorConfig
 
     source_dir = Path("./sample_data")
     landing_dir = Path("./landing_zone")
 
-    metas = ingest_to_landing(source_dir, landing_dir)
-    extracted = extract_from_metadata_items(metas)
-    validate_batch(extracted)
+    # No-op unless `profiling.enabled` is set in the environment config
+    profiler = StageProfiler.from_config()
+    executor_cfg = ValidationExecutorConfig.from_config(load_config())
+    executor = ValidationExecutor(executor_cfg) if executor_cfg.enabled else None
+
+    with profiler.stage("ingestion"):
+        metas = ingest_to_landing(source_dir, landing_dir)
+    with profiler.stage("extraction"):
+        extracted = extract_from_metadata_items(metas)
+    with profiler.stage("validation"):
+        validate_batch(extracted, executor)
+    if executor is not None:
+        executor.close()
+
+    profiler.print_summary()
@@ -0,0 +1,314 @@
+"""
+batch_scoring.py
+
+Partitioned batch scoring with bounded memory, resume and change detection.
+
+The hourly batch (`api.batch_scoring_schedule`) re-scores the whole
+customer and application base. Instead of loading every feature row and
+returning one big DataFrame, this job:
+
+- reads feature partitions (the per-shard `<table>_features.parquet`
+  files written by data_pipelines.sharding) in row batches
+- scores partitions in a process pool; each worker loads the models once
+- writes one scored partition per feature partition, to a temp file
+  renamed into place, so readers never see a half-written partition
+- records every finished partition in a state file (_STATE.json), so an
+  interrupted run resumes where it stopped and an unchanged partition
+  (same file size / mtime, same models) is skipped entirely
+- hashes each entity's feature row and keeps the previous score of rows
+  whose hash did not change; only new or changed entities are scored
+
+Memory per worker is bounded by the batch size plus the previous scores
+of the one partition it is working on.
+
+Layout under output_dir:
+
+    churn/shard=0003.parquet          customer_id, churn_score, feature_hash
+    loan_risk/shard=0003.parquet      application_id, customer_id, risk_score,
+                                      top_factor_1..3, feature_hash
+    _STATE.json                       model fingerprint + finished partitions
+
+Models come from the runner's training checkpoint ({table: (model,
+compiler)}), e.g. checkpoints/latest/training.pkl.
+
+Example:
+    python -m ml.batch_scoring --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_pipelines.config import get_section
+
+
+STATE_FILE = "_STATE.json"
+
+# Entity key of every feature table's rows
+ENTITY_KEYS = {"churn": "customer_id", "loan_risk": "application_id"}
+
+
+@dataclass
+class BatchScoringConfig:
+    """
+    Settings for the `batch_scoring` config section.
+    """
+    feature_dir: Path = Path("./shards")
+    output_dir: Path = Path("./batch_scores")
+    model_path: Path = Path("./checkpoints/latest/training.pkl")
+    workers: int = 2
+    batch_rows: int = 50_000
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "BatchScoringConfig":
+        section = get_section(config, "batch_scoring")
+        return cls(
+            feature_dir=Path(section.get("feature_dir", cls.feature_dir)),
+            output_dir=Path(section.get("output_dir", cls.output_dir)),
+            model_path=Path(section.get("model_path", cls.model_path)),
+            workers=int(section.get("workers", cls.workers)),
+            batch_rows=int(section.get("batch_rows", cls.batch_rows)),
+        )
+
+
+@dataclass
+class PartitionResult:
+    """
+    Outcome of scoring one feature partition (also kept in _STATE.json).
+    """
+    table: str
+    source: str
+    output: str
+    signature: List[int]        # [size, mtime_ns] of the source partition
+    rows: int = 0
+    rescored: int = 0
+    seconds: float = 0.0
+
+
+# Per-worker models, loaded once by the pool initializer
+_MODELS: Dict[str, Tuple[Any, Any]] = {}
+_EXPLAINERS: Dict[str, Any] = {}
+
+
+def _init_worker(model_path: str) -> None:
+    from .explainability import ExplanationEngine
+
+    with open(model_path, "rb") as f:
+        _MODELS.update(pickle.load(f))
+    if "loan_risk" in _MODELS:
+        model, compiler = _MODELS["loan_risk"]
+        _EXPLAINERS["loan_risk"] = ExplanationEngine(model, feature_names=compiler.feature_names_)
+
+
+def _score(table: str, features: pd.DataFrame) -> pd.DataFrame:
+    from .churn_model_stub import score_churn
+    from .loan_risk_model_stub import score_loan_risk
+
+    model, compiler = _MODELS[table]
+    if table == "churn":
+        return score_churn(model, features, compiler=compiler)
+    return score_loan_risk(model, features, explainer=_EXPLAINERS[table], compiler=compiler)
+
+
+def _row_hashes(features: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    Stable 64-bit hash of each row's model inputs (stored as int64).
+    """
+    return pd.util.hash_pandas_object(features[columns], index=False).to_numpy().view(np.int64)
+
+
+def _signature(path: Path) -> List[int]:
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def score_partition(
+    table: str,
+    source: Path,
+    output: Path,
+    batch_rows: int,
+    reuse: bool = True,
+) -> PartitionResult:
+    """
+    Score one feature partition into `output`, reusing the previous
+    scores of entities whose feature hash is unchanged.
+
+    Requires the worker models (_init_worker) to be loaded.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    started = time.perf_counter()
+    key = ENTITY_KEYS[table]
+    columns = [spec.name for spec in _MODELS[table][1].columns_]
+    result = PartitionResult(table, str(source), str(output), _signature(source))
+
+    previous: Optional[pd.DataFrame] = None
+    previous_index = pd.Index([])
+    previous_hashes = np.empty(0, dtype=np.int64)
+    if reuse and output.exists():
+        previous = pd.read_parquet(output)
+        previous_index = pd.Index(previous[key])
+        previous_hashes = previous["feature_hash"].to_numpy()
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(output.name + ".tmp")
+    writer: Optional[pq.ParquetWriter] = None
+    try:
+        for record_batch in pq.ParquetFile(source).iter_batches(batch_size=batch_rows):
+            features = record_batch.to_pandas()
+            hashes = _row_hashes(features, columns)
+
+            parts: List[pd.DataFrame] = []
+            changed = np.ones(len(features), dtype=bool)
+            if previous is not None:
+                pos = previous_index.get_indexer(features[key])
+                same = pos >= 0
+                same[same] = previous_hashes[pos[same]] == hashes[same]
+                changed = ~same
+                if same.any():
+                    parts.append(previous.iloc[pos[same]])
+            if changed.any():
+                scored = _score(table, features[changed].reset_index(drop=True))
+                scored["feature_hash"] = hashes[changed]
+                parts.append(scored)
+            if not parts:
+                continue
+            out = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+            arrow = pa.Table.from_pandas(out, preserve_index=False, schema=writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, arrow.schema)
+            writer.write_table(arrow)
+            result.rows += len(out)
+            result.rescored += int(changed.sum())
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        tmp.unlink(missing_ok=True)
+        raise
+
+    if writer is None:
+        # Empty partition: no scores, and no stale scores from an older run
+        output.unlink(missing_ok=True)
+    else:
+        writer.close()
+        os.replace(tmp, output)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def _score_partition_args(args: Tuple[str, Path, Path, int, bool]) -> PartitionResult:
+    return score_partition(*args)
+
+
+def _model_fingerprint(model_path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with model_path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_state(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {"model": None, "partitions": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _save_state(path: Path, state: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def run_batch_scoring(cfg: BatchScoringConfig, full: bool = False) -> List[PartitionResult]:
+    """
+    Score every feature partition under cfg.feature_dir that changed
+    since the last run. With `full`, ignore the state and all previous
+    scores. Returns the partitions scored in this run.
+    """
+    if not cfg.model_path.exists():
+        raise FileNotFoundError(f"Model bundle not found: {cfg.model_path} (run the pipeline's training stage first)")
+    cfg.output_dir.mkdir(parents=True, exist_ok=True)
+    state_path = cfg.output_dir / STATE_FILE
+    state = _load_state(state_path)
+
+    fingerprint = _model_fingerprint(cfg.model_path)
+    # New models invalidate every stored score, not just changed rows
+    reuse = not full and state.get("model") == fingerprint
+    if not reuse:
+        state = {"model": fingerprint, "partitions": {}}
+        _save_state(state_path, state)
+
+    with cfg.model_path.open("rb") as f:
+        tables = [t for t in pickle.load(f) if t in ENTITY_KEYS]
+
+    jobs: List[Tuple[str, Path, Path, int, bool]] = []
+    skipped = 0
+    for table in tables:
+        for source in sorted(cfg.feature_dir.glob(f"*/{table}_features.parquet")):
+            output = cfg.output_dir / table / f"{source.parent.name}.parquet"
+            done = state["partitions"].get(f"{table}/{source.parent.name}")
+            if done and done["signature"] == _signature(source) and (output.exists() or not done["rows"]):
+                skipped += 1
+                continue
+            jobs.append((table, source, output, cfg.batch_rows, reuse))
+
+    print(f"[BATCH] {len(jobs)} partitions to score, {skipped} unchanged (model {fingerprint[:8]})")
+    results: List[PartitionResult] = []
+    if not jobs:
+        return results
+
+    with ProcessPoolExecutor(
+        max_workers=cfg.workers,
+        initializer=_init_worker,
+        initargs=(str(cfg.model_path),),
+    ) as pool:
+        pending = {pool.submit(_score_partition_args, job) for job in jobs}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_EXCEPTION)
+            for future in finished:
+                if future.exception() is not None:
+                    # Finished partitions are already in the state; a rerun resumes from there
+                    for other in pending:
+                        other.cancel()
+                    raise future.exception()  # type: ignore[misc]
+                result = future.result()
+                results.append(result)
+                state["partitions"][f"{result.table}/{Path(result.source).parent.name}"] = asdict(result)
+                _save_state(state_path, state)
+                print(f"[BATCH] {result.table}/{Path(result.output).name}: rows={result.rows} "
+                      f"rescored={result.rescored} in {result.seconds:.2f}s")
+
+    rows = sum(r.rows for r in results)
+    rescored = sum(r.rescored for r in results)
+    print(f"[BATCH] Done | partitions={len(results)} | rows={rows} | rescored={rescored}")
+    return results
+
+
+if __name__ == "__main__":
+    from data_pipelines.config import load_config
+
+    parser = argparse.ArgumentParser(description="Score feature partitions in a process pool.")
+    parser.add_argument("--env", default=None, help="dev / test / prod (default: $BANK_DOC_ENV or dev)")
+    parser.add_argument("--workers", type=int, help="Override batch_scoring.workers")
+    parser.add_argument("--full", action="store_true", help="Ignore previous scores and rescore everything")
+    args = parser.parse_args()
+
+    cfg = BatchScoringConfig.from_config(load_config(args.env))
+    if args.workers:
+        cfg.workers = args.workers
+    run_batch_scoring(cfg, full=args.full)
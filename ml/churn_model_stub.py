@@ -7,24 +7,35 @@ This is NOT meant to be a production-ready model, but to:
 - Show where churn modeling fits in the architecture
 - Demonstrate typical ML steps (train/val split, metrics)
 - Connect with feature_engineering outputs
+
+sklearn, and pandas through feature_matrix, are imported where they are
+used, so importing this module stays cheap for processes that never train.
 """
 
 from __future__ import annotations
 
-from typing import Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from sklearn.linear_model import LogisticRegression
+
+    from .feature_matrix import FeatureMatrixCompiler
+
 
-import numpy as np
-import pandas as pd
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import roc_auc_score, classification_report
-from sklearn.model_selection import train_test_split
+def churn_matrix_compiler(target_col: str = "churn_flag") -> FeatureMatrixCompiler:
+    """
+    Unfitted compiler for build_churn_features tables (ids and target excluded).
+    """
+    from .feature_matrix import FeatureMatrixCompiler
 
-from .feature_engineering import load_sample_datasets, build_churn_features
+    return FeatureMatrixCompiler(exclude=["customer_id", "customer_key", target_col])
 
 
 def train_churn_model(
     features: pd.DataFrame,
     target_col: str = "churn_flag",
+    compiler: Optional[FeatureMatrixCompiler] = None,
 ) -> Tuple[LogisticRegression, float]:
     """
     Train a simple logistic regression churn model.
@@ -35,6 +46,10 @@ def train_churn_model(
         Feature table returned by build_churn_features.
     target_col : str
         Column name for the churn flag.
+    compiler : FeatureMatrixCompiler, optional
+        Fitted here on `features`; the model is then trained on the compiled
+        matrix (categoricals one-hot encoded) and must be scored with the
+        same compiler. Without it only numeric / bool columns are used.
 
     Returns
     -------
@@ -42,7 +57,16 @@ def train_churn_model(
     auc : float
         ROC-AUC on validation set.
     """
-    X = features.drop(columns=[target_col, "customer_id"])
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import roc_auc_score, classification_report
+    from sklearn.model_selection import train_test_split
+
+    if compiler is not None:
+        X = compiler.fit_transform(features)
+    else:
+        X = features.drop(columns=[target_col, "customer_id", "customer_key"], errors="ignore")
+        # Categorical columns (region, segment, ...) need a compiler to be encoded
+        X = X.select_dtypes(include=["number", "bool"])
     y = features[target_col].astype(int)
 
     X_train, X_val, y_train, y_val = train_test_split(
@@ -69,15 +93,21 @@ def train_churn_model(
 def score_churn(
     model: LogisticRegression,
     features: pd.DataFrame,
+    compiler: Optional[FeatureMatrixCompiler] = None,
 ) -> pd.DataFrame:
     """
-    Score a feature table using the trained churn model.
+    Score a feature table using the trained churn model (and the compiler
+    it was trained with, if any).
 
     Returns a DataFrame with:
     - customer_id
     - churn_score (probability)
     """
-    X = features.drop(columns=["churn_flag", "customer_id"])
+    if compiler is not None:
+        X = compiler.transform(features)
+    else:
+        X = features.drop(columns=["churn_flag", "customer_id", "customer_key"], errors="ignore")
+        X = X.select_dtypes(include=["number", "bool"])
     churn_score = model.predict_proba(X)[:, 1]
 
     scored = features[["customer_id"]].copy()
@@ -87,11 +117,21 @@ def score_churn(
 
 if __name__ == "__main__":
     # Example usage: train and score on the synthetic feature view.
-    bank_df, loan_df, onboard_df = load_sample_datasets()
-    churn_features = build_churn_features(bank_df, loan_df, onboard_df)
+    from data_pipelines.profiling import StageProfiler
+
+    from .feature_cache import open_cache, sample_feature_tables
+
+    profiler = StageProfiler.from_config()
 
-    model, auc = train_churn_model(churn_features)
-    scored_df = score_churn(model, churn_features)
+    with profiler.stage("build_churn_features"):
+        # Served from the feature cache while sample_data and the feature code are unchanged
+        churn_features = sample_feature_tables(open_cache(), tables=["churn"])["churn"]
+    with profiler.stage("train_churn_model"):
+        compiler = churn_matrix_compiler()
+        model, auc = train_churn_model(churn_features, compiler=compiler)
+    with profiler.stage("score_churn"):
+        scored_df = score_churn(model, churn_features, compiler=compiler)
+    profiler.print_summary()
 
     print("\n[CHURN MODEL] Sample scores:")
     print(scored_df.head())
@@ -0,0 +1,309 @@
+"""
+explainability.py
+
+Batched per-feature explanations for the churn and loan risk models.
+
+Underwriters need to see *why* an application got its risk score, and
+explaining row by row is far too slow for nightly batches. Both methods
+here explain a whole batch with a handful of array operations:
+
+- LogisticRegression (churn): exact linear contributions in log-odds,
+  coef_j * (x_j - reference_j), with base = intercept + coef . reference.
+  base + sum(contributions) == decision_function(x).
+- RandomForestClassifier (loan risk): path-based tree contributions
+  (Saabas). Every node stores the change in class-1 probability versus
+  its parent, attributed to the parent's split feature. For a batch,
+  forest.decision_path() gives a sparse (rows x all nodes) indicator, and
+  one sparse product with the stacked (nodes x features) delta matrix
+  yields every row's contributions for every tree at once.
+  base + sum(contributions) == predict_proba(x)[:, 1].
+
+Forest explanations are cached per row (keyed on a hash of the feature
+values), so re-scoring unchanged applications does not recompute them.
+Linear contributions are cheaper to recompute than to hash, so the cache
+is off for LogisticRegression by default.
+
+Benchmark (explanations/sec, vectorized vs naive per row):
+    python -m ml.explainability --rows 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+
+def linear_contributions(
+    model: LogisticRegression,
+    X: np.ndarray,
+    reference: Optional[np.ndarray] = None,
+) -> Tuple[float, np.ndarray]:
+    """
+    Exact per-feature log-odds contributions of a binary logistic regression.
+
+    Parameters
+    ----------
+    model : LogisticRegression
+        Fitted binary model.
+    X : np.ndarray
+        (n_rows, n_features) float matrix in the model's feature order.
+    reference : np.ndarray, optional
+        Baseline feature values (e.g. training means); zeros by default.
+
+    Returns
+    -------
+    base : float
+        Log-odds at the reference point.
+    contributions : np.ndarray
+        (n_rows, n_features) contributions in log-odds.
+    """
+    coef = model.coef_[0]
+    if reference is None:
+        reference = np.zeros_like(coef)
+    base = float(model.intercept_[0] + coef @ reference)
+    return base, (X - reference) * coef
+
+
+class TreeContributions:
+    """
+    Precomputed Saabas delta matrix for a fitted RandomForestClassifier.
+    """
+
+    def __init__(self, model: RandomForestClassifier, positive_class: int = 1):
+        from scipy import sparse
+
+        self.n_features = model.n_features_in_
+        self.n_trees = len(model.estimators_)
+        class_index = int(np.flatnonzero(model.classes_ == positive_class)[0])
+
+        rows: List[np.ndarray] = []
+        cols: List[np.ndarray] = []
+        vals: List[np.ndarray] = []
+        bias = 0.0
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            value = tree.value[:, 0, :]
+            prob = value[:, class_index] / value.sum(axis=1)
+            bias += prob[0]
+
+            # parent / split feature of every non-root node
+            children = np.concatenate([tree.children_left, tree.children_right])
+            parents = np.concatenate([np.arange(tree.node_count)] * 2)
+            mask = children >= 0
+            children, parents = children[mask], parents[mask]
+
+            rows.append(children + offset)
+            cols.append(tree.feature[parents])
+            vals.append(prob[children] - prob[parents])
+            offset += tree.node_count
+
+        self.bias = bias / self.n_trees
+        self.deltas = sparse.csr_matrix(
+            (np.concatenate(vals) / self.n_trees, (np.concatenate(rows), np.concatenate(cols))),
+            shape=(offset, self.n_features),
+        )
+
+    def explain(self, model: RandomForestClassifier, X: pd.DataFrame) -> np.ndarray:
+        """
+        (n_rows, n_features) probability contributions for a batch.
+        """
+        indicator, _ = model.decision_path(X)
+        return np.asarray((indicator @ self.deltas).todense())
+
+
+class ExplanationEngine:
+    """
+    Batched, cached explanations for one fitted model.
+
+    Usage:
+
+        engine = ExplanationEngine(model)
+        contributions = engine.explain(features)          # DataFrame, one column per feature
+        reasons = engine.top_reasons(features, k=3)       # top_factor_1..3 per row
+
+    Models trained on a compiled matrix (ml.feature_matrix) have no
+    feature_names_in_; pass `feature_names=compiler.feature_names_` and
+    explain the same matrices the model scores.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        reference: Optional[np.ndarray] = None,
+        cache_size: Optional[int] = None,
+        feature_names: Optional[Sequence[str]] = None,
+    ):
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.linear_model import LogisticRegression
+
+        if not isinstance(model, (LogisticRegression, RandomForestClassifier)):
+            raise TypeError(f"Unsupported model type: {type(model).__name__}")
+        self.model = model
+        self.feature_names: List[str] = list(
+            feature_names if feature_names is not None else model.feature_names_in_
+        )
+        self.reference = reference
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._trees = TreeContributions(model) if isinstance(model, RandomForestClassifier) else None
+        if cache_size is None:
+            cache_size = 100_000 if self._trees is not None else 0
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+
+        if self._trees is not None:
+            self.base = self._trees.bias
+        else:
+            self.base, _ = linear_contributions(model, np.zeros((0, len(self.feature_names))), reference)
+
+    def _matrix(self, features: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        if isinstance(features, np.ndarray):
+            return features
+        return np.ascontiguousarray(features[self.feature_names].to_numpy(dtype=np.float64))
+
+    def _compute(self, X: np.ndarray) -> np.ndarray:
+        if self._trees is not None:
+            if hasattr(self.model, "feature_names_in_"):
+                return self._trees.explain(self.model, pd.DataFrame(X, columns=self.feature_names))
+            return self._trees.explain(self.model, X)
+        return linear_contributions(self.model, X, self.reference)[1]
+
+    def explain_matrix(self, X: np.ndarray) -> np.ndarray:
+        """
+        Contributions for a float matrix, computing only rows not in the cache.
+        """
+        if not self.cache_size:
+            return self._compute(X)
+
+        keys = [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in X]
+        out = np.empty_like(X)
+        missing: List[int] = []
+        for i, key in enumerate(keys):
+            cached = self._cache.get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                self._cache.move_to_end(key)
+                out[i] = cached
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            computed = self._compute(X[missing])
+            out[missing] = computed
+            for i, row in zip(missing, computed):
+                self._cache[keys[i]] = row
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return out
+
+    def explain(self, features: Union[pd.DataFrame, np.ndarray], index: Optional[pd.Index] = None) -> pd.DataFrame:
+        """
+        Per-feature contributions for every row of a feature table (or
+        compiled feature matrix; `index` labels its rows).
+        """
+        contributions = self.explain_matrix(self._matrix(features))
+        return pd.DataFrame(contributions, columns=self.feature_names, index=_row_index(features, index))
+
+    def top_reasons(
+        self,
+        features: Union[pd.DataFrame, np.ndarray],
+        k: int = 3,
+        index: Optional[pd.Index] = None,
+    ) -> pd.DataFrame:
+        """
+        The k features that pushed each row's score up the most, as
+        top_factor_1..k columns (feature names), for underwriter display.
+        """
+        contributions = self.explain_matrix(self._matrix(features))
+        k = min(k, contributions.shape[1])
+        top = np.argsort(-contributions, axis=1, kind="stable")[:, :k]
+        names = np.asarray(self.feature_names, dtype=object)[top]
+        return pd.DataFrame(
+            {f"top_factor_{j + 1}": names[:, j] for j in range(k)},
+            index=_row_index(features, index),
+        )
+
+
+def _row_index(features: Union[pd.DataFrame, np.ndarray], index: Optional[pd.Index]) -> Optional[pd.Index]:
+    if index is not None:
+        return index
+    return features.index if isinstance(features, pd.DataFrame) else None
+
+
+def _naive_tree_contributions(model: RandomForestClassifier, x: np.ndarray) -> np.ndarray:
+    """
+    Reference implementation: walk every tree for one row in Python.
+    """
+    contributions = np.zeros(model.n_features_in_)
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        prob = tree.value[:, 0, 1] / tree.value[:, 0, :].sum(axis=1)
+        node = 0
+        while tree.children_left[node] >= 0:
+            feature = tree.feature[node]
+            child = (
+                tree.children_left[node]
+                if x[feature] <= tree.threshold[node]
+                else tree.children_right[node]
+            )
+            contributions[feature] += prob[child] - prob[node]
+            node = child
+    return contributions / len(model.estimators_)
+
+
+def benchmark(rows: int, n_features: int = 12, n_trees: int = 100, naive_rows: int = 200) -> None:
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    rng = np.random.default_rng(42)
+    X = rng.normal(size=(rows, n_features))
+    y = (X[:, 0] + 0.5 * X[:, 1] - X[:, 2] + rng.normal(scale=0.5, size=rows) > 0).astype(int)
+    features = pd.DataFrame(X, columns=[f"f{i}" for i in range(n_features)])
+
+    forest = RandomForestClassifier(n_estimators=n_trees, max_depth=10, random_state=42, n_jobs=-1)
+    forest.fit(features, y)
+    linear = LogisticRegression(max_iter=500).fit(features, y)
+
+    for name, model in (("forest", forest), ("logistic", linear)):
+        engine = ExplanationEngine(model, cache_size=rows if name == "forest" else 0)
+        t0 = time.perf_counter()
+        contributions = engine.explain(features)
+        cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        engine.explain(features)
+        warm = time.perf_counter() - t0
+
+        if name == "forest":
+            expected = forest.predict_proba(features)[:, 1]
+        else:
+            expected = linear.decision_function(features)
+        error = np.abs(engine.base + contributions.sum(axis=1).to_numpy() - expected).max()
+        print(f"[EXPLAIN] {name:<8} rows={rows} | first pass={rows / cold:,.0f}/s | "
+              f"repeat={rows / warm:,.0f}/s | max additivity error={error:.2e}")
+
+    t0 = time.perf_counter()
+    for x in X[:naive_rows]:
+        _naive_tree_contributions(forest, x)
+    naive = time.perf_counter() - t0
+    print(f"[EXPLAIN] forest   naive per-row walk={naive_rows / naive:,.0f}/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched model explanations.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--trees", type=int, default=100)
+    args = parser.parse_args()
+
+    benchmark(args.rows, n_trees=args.trees)
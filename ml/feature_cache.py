@@ -0,0 +1,368 @@
+"""
+feature_cache.py
+
+Memoized feature tables, keyed on input fingerprints.
+
+build_churn_features / build_loan_risk_features used to run from scratch
+for every consumer (both model stubs, the runner's feature stage,
+training and scoring experiments), even when neither the inputs nor the
+feature code had changed. FeatureCache stores each built table as a
+Parquet file under a key made of:
+
+- the table name and any build options
+- the input fingerprint: (path, size, mtime_ns) of every input file or
+  partition (fingerprint_files), or a content hash of in-memory input
+  frames (fingerprint_frames)
+- the code version of the feature function: a hash of its module's
+  source, so editing feature_engineering.py (helpers included) changes
+  every key
+
+A hit reads the Parquet file back; a miss builds the table and writes it
+atomically (temp file + rename). Entries are evicted least recently used
+first (reads refresh the file's mtime) once the cache grows past
+`max_bytes`; invalidate() drops entries explicitly.
+
+Layout under cache_dir:
+
+    churn-<key>.parquet
+    loan_risk-<key>.parquet
+
+Example:
+    python -m ml.feature_cache bench --customers 500000
+    python -m ml.feature_cache info
+    python -m ml.feature_cache invalidate --table churn
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_pipelines.config import get_section
+
+
+@dataclass
+class FeatureCacheConfig:
+    """
+    Settings for the `feature_cache` config section.
+    """
+    enabled: bool = False
+    cache_dir: Path = Path("./feature_cache")
+    max_bytes: int = 2_000_000_000
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "FeatureCacheConfig":
+        section = get_section(config, "feature_cache")
+        return cls(
+            enabled=bool(section.get("enabled", cls.enabled)),
+            cache_dir=Path(section.get("cache_dir", cls.cache_dir)),
+            max_bytes=int(section.get("max_bytes", cls.max_bytes)),
+        )
+
+    def open_cache(self) -> "FeatureCache":
+        return FeatureCache(self.cache_dir, self.max_bytes)
+
+
+@lru_cache(maxsize=None)
+def code_version(func: Callable[..., Any]) -> str:
+    """
+    Hash of the source of the module defining `func` (plus its name).
+    """
+    source = Path(inspect.getsourcefile(func) or "").read_bytes()
+    return hashlib.sha256(source + func.__qualname__.encode()).hexdigest()[:16]
+
+
+def fingerprint_files(paths: Iterable[Path]) -> str:
+    """
+    Fingerprint of input files or partitions by path, size and mtime (the
+    same change signal ml.batch_scoring uses); directories are expanded.
+    """
+    entries: List[Tuple[str, int, int]] = []
+    for path in paths:
+        files = sorted(p for p in Path(path).rglob("*") if p.is_file()) if Path(path).is_dir() else [Path(path)]
+        for f in files:
+            stat = f.stat()
+            entries.append((str(f.resolve()), stat.st_size, stat.st_mtime_ns))
+    return hashlib.sha256(json.dumps(entries).encode()).hexdigest()
+
+
+def fingerprint_frames(*frames: pd.DataFrame) -> str:
+    """
+    Content fingerprint of in-memory input frames (columns, dtypes, rows).
+
+    Rows are hashed in order: the feature builders keep the first row of
+    each customer, so the same rows in another order can build different
+    features. Callers that receive documents in completion order put them
+    in a canonical order first (see the runner's feature stage).
+    """
+    digest = hashlib.sha256()
+    for df in frames:
+        digest.update(json.dumps([list(map(str, df.columns)), list(map(str, df.dtypes))]).encode())
+        try:
+            rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        except TypeError:
+            # Object columns holding lists/dicts (json_normalize output)
+            hashable = df.apply(lambda col: col.astype(str) if col.dtype == object else col)
+            rows = pd.util.hash_pandas_object(hashable, index=False).to_numpy()
+        digest.update(rows.tobytes())
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    Parquet cache of feature tables with size-based LRU eviction.
+
+    Usage:
+
+        cache = FeatureCache(Path("./feature_cache"))
+        churn = cache.get_or_build(
+            "churn", build_churn_features, fingerprint_files(inputs), df_bank, df_loan, df_onboard
+        )
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 2_000_000_000):
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, table: str, build: Callable[..., Any], inputs: str, **options: Any) -> str:
+        payload = json.dumps([table, code_version(build), inputs, sorted(options.items())], default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+    def _path(self, table: str, key: str) -> Path:
+        return self.cache_dir / f"{table}-{key}.parquet"
+
+    def get(self, table: str, key: str) -> Optional[pd.DataFrame]:
+        import pyarrow.parquet as pq
+
+        path = self._path(table, key)
+        try:
+            arrow = pq.read_table(path)
+        except FileNotFoundError:
+            return None
+        df = arrow.to_pandas()
+        # Parquet reads object columns of bools back as bool and their
+        # missing values as None; callers (e.g. fitted FeatureMatrixCompilers)
+        # must see exactly the frame that was built
+        for column in (arrow.schema.pandas_metadata or {}).get("columns", []):
+            name = column["name"]
+            if column["numpy_type"] == "object" and name in df.columns:
+                values = df[name].astype(object)
+                df[name] = values.where(values.notna(), np.nan)
+        # mtime doubles as the last-used time for eviction
+        os.utime(path)
+        return df
+
+    def put(self, table: str, key: str, df: pd.DataFrame) -> Path:
+        path = self._path(table, key)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def get_or_build(
+        self,
+        table: str,
+        build: Callable[..., pd.DataFrame],
+        inputs: str,
+        *args: Any,
+        **options: Any,
+    ) -> pd.DataFrame:
+        """
+        Cached build(*args, **options) for the input fingerprint `inputs`.
+        """
+        key = self.key(table, build, inputs, **options)
+        df = self.get(table, key)
+        if df is not None:
+            self.hits += 1
+            return df
+        self.misses += 1
+        df = build(*args, **options).reset_index(drop=True)
+        self.put(table, key, df)
+        return df
+
+    def entries(self) -> List[Tuple[Path, int, float]]:
+        """
+        (path, size, last used) of every entry, least recently used first.
+        """
+        found = []
+        for path in self.cache_dir.glob("*.parquet"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue    # evicted by another process meanwhile
+            found.append((path, stat.st_size, stat.st_mtime))
+        return sorted(found, key=lambda entry: entry[2])
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self) -> List[Path]:
+        """
+        Drop least recently used entries until the cache fits max_bytes.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        # Keep the newest entry even when it alone exceeds the budget
+        for path, size, _ in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed.append(path)
+        return removed
+
+    def invalidate(self, table: Optional[str] = None) -> int:
+        """
+        Drop every entry (or every entry of one table); returns the count.
+        """
+        pattern = f"{table}-*.parquet" if table else "*.parquet"
+        removed = 0
+        for path in self.cache_dir.glob(pattern):
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+
+def open_cache(config: Optional[Dict[str, Any]] = None) -> Optional[FeatureCache]:
+    """
+    FeatureCache from the `feature_cache` config section, or None when disabled.
+    """
+    if config is None:
+        from data_pipelines.config import load_config
+
+        config = load_config()
+    cfg = FeatureCacheConfig.from_config(config)
+    return cfg.open_cache() if cfg.enabled else None
+
+
+def sample_feature_tables(
+    cache: Optional[FeatureCache] = None,
+    tables: Iterable[str] = ("churn", "loan_risk"),
+) -> Dict[str, pd.DataFrame]:
+    """
+    Feature tables built from sample_data/*.json, served from `cache`
+    while the sample files and the feature code are unchanged. The
+    sample files are only read when some table has to be rebuilt.
+    """
+    from .feature_engineering import (
+        SAMPLE_DATA_DIR,
+        build_churn_features,
+        build_loan_risk_features,
+        load_sample_datasets,
+    )
+
+    # table -> (feature function, its arguments picked from (bank, loan, onboarding))
+    builders: Dict[str, Tuple[Callable[..., pd.DataFrame], Tuple[int, ...]]] = {
+        "churn": (build_churn_features, (0, 1, 2)),
+        "loan_risk": (build_loan_risk_features, (1, 0)),
+    }
+    inputs = fingerprint_files(sorted(SAMPLE_DATA_DIR.glob("*.json"))) if cache is not None else ""
+    datasets: Optional[Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]] = None
+    result: Dict[str, pd.DataFrame] = {}
+    for table in tables:
+        build, picks = builders[table]
+        key = cache.key(table, build, inputs) if cache is not None else ""
+        df = cache.get(table, key) if cache is not None else None
+        if df is None:
+            datasets = datasets or load_sample_datasets()
+            df = build(*(datasets[i] for i in picks)).reset_index(drop=True)
+            if cache is not None:
+                cache.misses += 1
+                cache.put(table, key, df)
+        elif cache is not None:
+            cache.hits += 1
+        result[table] = df
+    return result
+
+
+def benchmark(customers: int, cache_dir: Path) -> None:
+    from data_pipelines.customer_index import _synthetic_documents
+
+    from .feature_engineering import build_churn_features, build_loan_risk_features
+
+    # Inputs as files, like the curated partitions a consumer would read
+    input_dir = cache_dir / "inputs"
+    input_dir.mkdir(parents=True, exist_ok=True)
+    names = ("bank", "loan", "onboarding")
+    for name, df in zip(names, _synthetic_documents(customers)):
+        df.to_parquet(input_dir / f"{name}.parquet", index=False)
+    cache = FeatureCache(cache_dir / "tables")
+    cache.invalidate()
+
+    def load() -> List[pd.DataFrame]:
+        return [pd.read_parquet(input_dir / f"{name}.parquet") for name in names]
+
+    def build() -> Dict[str, pd.DataFrame]:
+        bank, loan, onboard = load()
+        return {"churn": build_churn_features(bank, loan, onboard), "loan_risk": build_loan_risk_features(loan, bank)}
+
+    def run(cached: bool) -> Tuple[float, Dict[str, pd.DataFrame]]:
+        t0 = time.perf_counter()
+        if not cached:
+            tables = build()
+            return time.perf_counter() - t0, tables
+        inputs = fingerprint_files([input_dir])
+        builders = {"churn": build_churn_features, "loan_risk": build_loan_risk_features}
+        keys = {name: cache.key(name, func, inputs) for name, func in builders.items()}
+        tables = {name: cache.get(name, key) for name, key in keys.items()}
+        if any(df is None for df in tables.values()):
+            tables = build()
+            for name, df in tables.items():
+                cache.put(name, keys[name], df.reset_index(drop=True))
+        return time.perf_counter() - t0, tables
+
+    uncached_s, built = run(cached=False)
+    cold_s, _ = run(cached=True)
+    warm_s, hit = run(cached=True)
+    for name, df in built.items():
+        pd.testing.assert_frame_equal(hit[name], df.reset_index(drop=True))
+
+    t0 = time.perf_counter()
+    fingerprint_frames(*load())
+    frames_s = time.perf_counter() - t0
+
+    print(f"[FEATURE CACHE] customers={customers:,} | entries={len(cache.entries())} "
+          f"| {cache.size_bytes() / 1e6:.1f} MB -> {cache.cache_dir}")
+    print(f"[FEATURE CACHE] load + build {uncached_s:6.2f}s | cold (+ write) {cold_s:6.2f}s "
+          f"| warm (fingerprint files + read) {warm_s:6.2f}s; outputs identical")
+    print(f"[FEATURE CACHE] content fingerprint of the loaded inputs (runner path) {frames_s:6.2f}s")
+
+
+if __name__ == "__main__":
+    from data_pipelines.config import load_config
+
+    parser = argparse.ArgumentParser(description="Feature table cache: benchmark, inspect, invalidate.")
+    parser.add_argument("command", choices=["bench", "info", "invalidate"])
+    parser.add_argument("--env", default=None, help="dev / test / prod (default: $BANK_DOC_ENV or dev)")
+    parser.add_argument("--table", help="invalidate: only this table (churn / loan_risk)")
+    parser.add_argument("--customers", type=int, default=500_000, help="bench: synthetic customers")
+    args = parser.parse_args()
+
+    cfg = FeatureCacheConfig.from_config(load_config(args.env))
+    if args.command == "bench":
+        benchmark(args.customers, cfg.cache_dir.parent / "feature_cache_benchmark")
+    elif args.command == "info":
+        cache = cfg.open_cache()
+        for path, size, used in cache.entries():
+            print(f"[FEATURE CACHE] {path.name:<48} {size / 1e6:8.1f} MB  last used "
+                  f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(used))}")
+        print(f"[FEATURE CACHE] {cache.size_bytes() / 1e6:.1f} / {cfg.max_bytes / 1e6:.0f} MB")
+    else:
+        removed = cfg.open_cache().invalidate(args.table)
+        print(f"[FEATURE CACHE] Removed {removed} entries from {cfg.cache_dir}")
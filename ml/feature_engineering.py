@@ -16,14 +16,18 @@ zone (e.g. Synapse / Delta tables) rather than JSON files.
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Tuple
+from typing import Any, Dict, Iterable, List, Tuple
 
+import numpy as np
 import pandas as pd
 
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 SAMPLE_DATA_DIR = BASE_DIR / "sample_data"
 
+# Dense integer customer key assigned at ingestion (data_pipelines.customer_index)
+CUSTOMER_KEY = "customer_key"
+
 
 def _load_json_records(path: Path) -> pd.DataFrame:
     """
@@ -60,6 +64,187 @@ def load_sample_datasets() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     return df_bank, df_loan, df_onboard
 
 
+def datasets_from_payloads(
+    payloads: Iterable[Dict[str, Any]],
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Build the same (bank, loan, onboarding) DataFrames as load_sample_datasets
+    from validated extraction payloads, grouped by their 'document_type' field.
+
+    This is how the pipeline runner feeds validated documents into
+    feature engineering instead of reading the sample files.
+    """
+    grouped: Dict[str, List[Dict[str, Any]]] = {
+        "bank_statement": [],
+        "loan_application": [],
+        "onboarding_form": [],
+    }
+    for payload in payloads:
+        rows = grouped.get(payload.get("document_type", ""))
+        if rows is not None:
+            rows.append(payload)
+
+    df_bank = pd.json_normalize(grouped["bank_statement"])
+    df_loan = pd.json_normalize(grouped["loan_application"])
+    df_onboard = pd.json_normalize(grouped["onboarding_form"])
+
+    frames = (df_bank, df_loan, df_onboard)
+    for df in frames:
+        # Keys are dense, so int32 is enough (json_normalize gives int64)
+        if CUSTOMER_KEY in df.columns and df[CUSTOMER_KEY].notna().all():
+            df[CUSTOMER_KEY] = df[CUSTOMER_KEY].astype(np.int32)
+    return frames
+
+
+def _has_customer_keys(*frames: pd.DataFrame) -> bool:
+    """
+    True when every non-empty frame carries a complete customer_key column.
+    """
+    return all(
+        df.empty or (CUSTOMER_KEY in df.columns and df[CUSTOMER_KEY].notna().all())
+        for df in frames
+    )
+
+
+def _first_per_key(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    drop_duplicates(subset=[customer_id]) on the integer key: first row of
+    every customer, in the original row order.
+    """
+    keys = df[CUSTOMER_KEY].to_numpy()
+    _, first = np.unique(keys, return_index=True)
+    return df[columns].take(np.sort(first)).reset_index(drop=True)
+
+
+def _align_on_key(left_keys: np.ndarray, right: pd.DataFrame, valid: Any = None) -> pd.DataFrame:
+    """
+    Rows of `right` (unique customer_key) aligned to `left_keys`, with
+    missing rows as NaN: the right-hand columns of a left merge on the key.
+
+    Dense keys allow a direct key -> row lookup array; when the frames only
+    cover a small part of the key range, a sorted search is used instead.
+    `valid` optionally masks out matches (e.g. composite join conditions).
+    """
+    right_keys = right[CUSTOMER_KEY].to_numpy()
+    key_range = int(max(left_keys.max(initial=-1), right_keys.max(initial=-1))) + 1
+    if key_range <= 4 * (len(left_keys) + len(right_keys)):
+        lookup = np.full(key_range, -1, dtype=np.intp)
+        lookup[right_keys] = np.arange(len(right_keys))
+        positions = lookup[left_keys]
+    elif len(right_keys):
+        order = np.argsort(right_keys)
+        candidate = order[np.searchsorted(right_keys, left_keys, sorter=order).clip(max=len(order) - 1)]
+        positions = np.where(right_keys[candidate] == left_keys, candidate, -1)
+    else:
+        positions = np.full(len(left_keys), -1, dtype=np.intp)
+    if valid is not None:
+        positions = np.where(valid(positions), positions, -1)
+    # Reindexing a RangeIndex by position is arithmetic, not a hash lookup
+    return right.drop(columns=[CUSTOMER_KEY]).reset_index(drop=True).reindex(positions).reset_index(drop=True)
+
+
+_CHURN_BANK_COLS = [
+    "customer_id",
+    "region",
+    "segment",
+    "income_estimate",
+    "relationship_tenure_months",
+    "digital_channel_index",
+    "risk_segment",
+]
+
+_CHURN_ONBOARD_COLS = [
+    "customer_id",
+    "annual_income",
+    "pep_flag",
+    "risk_rating_initial",
+    "segment",
+    "account_opening_channel",
+]
+
+_LOAN_AGG_COLS = {
+    "has_loans_with_bank": ("application_id", lambda x: (len(x) > 0)),
+    "total_loans_amount": ("requested_amount", "sum"),
+    "avg_internal_risk_score": ("risk_score_internal", "mean"),
+    "any_early_delinquency": ("early_delinquency_flag", "max"),
+}
+
+
+def _same_value(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # merge() treats missing join values as equal to each other
+    return (a == b) | (pd.isna(a) & pd.isna(b))
+
+
+def _merge_churn_sources(
+    df_bank: pd.DataFrame,
+    df_loan: pd.DataFrame,
+    df_onboard: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    Customer-level join of the three sources on string customer_id.
+    """
+    # Take a subset of relevant columns from each table
+    bank_features = df_bank[_CHURN_BANK_COLS].drop_duplicates(subset=["customer_id"])
+
+    if df_loan.empty:
+        # Customers without loan applications still get churn features
+        loan_agg = pd.DataFrame(columns=["customer_id", *_LOAN_AGG_COLS])
+    else:
+        loan_agg = df_loan.groupby("customer_id", as_index=False).agg(**_LOAN_AGG_COLS)
+
+    onboard_features = df_onboard[_CHURN_ONBOARD_COLS].drop_duplicates(subset=["customer_id"])
+
+    # Merge everything on customer_id
+    df = bank_features.merge(loan_agg, on="customer_id", how="left")
+    df = df.merge(
+        onboard_features,
+        on=["customer_id", "segment"],  # join on segment as well to show awareness
+        how="left",
+        suffixes=("_bank", "_onboard"),
+    )
+    return df
+
+
+def _merge_churn_sources_by_key(
+    df_bank: pd.DataFrame,
+    df_loan: pd.DataFrame,
+    df_onboard: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    Same join as _merge_churn_sources, on the int32 customer_key: the bank
+    rows define the output order and the other sources are gathered into
+    it by key, so customer_id strings are never hashed or compared.
+    """
+    bank_features = _first_per_key(df_bank, [*_CHURN_BANK_COLS, CUSTOMER_KEY])
+    keys = bank_features[CUSTOMER_KEY].to_numpy()
+
+    if df_loan.empty:
+        loan_part = pd.DataFrame(np.nan, index=range(len(keys)), columns=list(_LOAN_AGG_COLS), dtype=object)
+    else:
+        # Built-in aggregations only; the per-group lambda of _LOAN_AGG_COLS
+        # costs more than all the joins together
+        loan_agg = df_loan.groupby(CUSTOMER_KEY, as_index=False).agg(
+            has_loans_with_bank=("application_id", "size"),
+            **{name: agg for name, agg in _LOAN_AGG_COLS.items() if name != "has_loans_with_bank"},
+        )
+        loan_agg["has_loans_with_bank"] = loan_agg["has_loans_with_bank"] > 0
+        loan_part = _align_on_key(keys, loan_agg)
+
+    onboard_cols = [c for c in _CHURN_ONBOARD_COLS if c != "customer_id"]
+    onboard_features = _first_per_key(df_onboard, [*onboard_cols, CUSTOMER_KEY])
+    onboard_segment = onboard_features["segment"].to_numpy()
+    bank_segment = bank_features["segment"].to_numpy()
+    # Composite join: the onboarding row only matches on the same segment
+    onboard_part = _align_on_key(
+        keys,
+        onboard_features,
+        valid=lambda pos: (pos >= 0) & _same_value(onboard_segment[pos], bank_segment),
+    ).drop(columns=["segment"])
+
+    bank_features.insert(1, CUSTOMER_KEY, bank_features.pop(CUSTOMER_KEY))
+    return pd.concat([bank_features, loan_part, onboard_part], axis=1)
+
+
 def build_churn_features(
     df_bank: pd.DataFrame,
     df_loan: pd.DataFrame,
@@ -74,8 +259,13 @@ def build_churn_features(
     - Engagement & transaction activity
     - Complaints, service interactions, etc.
 
+    When all inputs carry customer_key (data_pipelines.customer_index),
+    the sources are joined on it instead of customer_id; the output is
+    the same plus a customer_key column.
+
     Output schema (example):
     - customer_id
+    - customer_key (if the inputs carry it)
     - region
     - segment
     - income_estimate
@@ -84,44 +274,13 @@ def build_churn_features(
     - total_loans_amount
     - digital_channel_index
     - risk_segment_encoded
+    - account_opening_channel
     - target (synthetic churn_flag for demo)
     """
-    # Take a subset of relevant columns from each table
-    bank_cols = [
-        "customer_id",
-        "region",
-        "segment",
-        "income_estimate",
-        "relationship_tenure_months",
-        "digital_channel_index",
-        "risk_segment",
-    ]
-    bank_features = df_bank[bank_cols].drop_duplicates(subset=["customer_id"])
-
-    loan_agg = df_loan.groupby("customer_id", as_index=False).agg(
-        has_loans_with_bank=("application_id", lambda x: (len(x) > 0)),
-        total_loans_amount=("requested_amount", "sum"),
-        avg_internal_risk_score=("risk_score_internal", "mean"),
-        any_early_delinquency=("early_delinquency_flag", "max"),
-    )
-
-    onboard_cols = [
-        "customer_id",
-        "annual_income",
-        "pep_flag",
-        "risk_rating_initial",
-        "segment",
-    ]
-    onboard_features = df_onboard[onboard_cols].drop_duplicates(subset=["customer_id"])
-
-    # Merge everything on customer_id
-    df = bank_features.merge(loan_agg, on="customer_id", how="left")
-    df = df.merge(
-        onboard_features,
-        on=["customer_id", "segment"],  # join on segment as well to show awareness
-        how="left",
-        suffixes=("_bank", "_onboard"),
-    )
+    if _has_customer_keys(df_bank, df_loan, df_onboard):
+        df = _merge_churn_sources_by_key(df_bank, df_loan, df_onboard)
+    else:
+        df = _merge_churn_sources(df_bank, df_loan, df_onboard)
 
     # Fill NaNs for boolean-like features
     df["has_loans_with_bank"] = df["has_loans_with_bank"].fillna(False)
@@ -155,9 +314,12 @@ def build_loan_risk_features(
     """
     Construct a loan-level feature view for a loan risk support model.
 
+    Joined on customer_key when both inputs carry it (see build_churn_features).
+
     Output schema (example):
     - application_id
     - customer_id
+    - customer_key (if the inputs carry it)
     - requested_amount
     - tenor_months
     - income
@@ -186,6 +348,9 @@ def build_loan_risk_features(
         "region",
         "segment",
     ]
+    keyed = _has_customer_keys(df_loan, df_bank)
+    if keyed:
+        loan_core_cols.insert(2, CUSTOMER_KEY)
     df_loan_core = df_loan[loan_core_cols].copy()
 
     # Optionally enrich with derived ratios
@@ -204,18 +369,30 @@ def build_loan_risk_features(
         "income_estimate",
         "digital_channel_index",
     ]
-    df_bank_cust = df_bank[bank_customer_cols].drop_duplicates(subset=["customer_id"])
-
-    df_features = df_loan_core.merge(df_bank_cust, on="customer_id", how="left")
+    if keyed:
+        df_bank_cust = _first_per_key(df_bank, [*bank_customer_cols[1:], CUSTOMER_KEY])
+        bank_part = _align_on_key(df_loan_core[CUSTOMER_KEY].to_numpy(), df_bank_cust)
+        df_features = pd.concat([df_loan_core.reset_index(drop=True), bank_part], axis=1)
+    else:
+        df_bank_cust = df_bank[bank_customer_cols].drop_duplicates(subset=["customer_id"])
+        df_features = df_loan_core.merge(df_bank_cust, on="customer_id", how="left")
 
     return df_features
 
 
 if __name__ == "__main__":
     # Simple manual test: load and build both feature sets.
-    bank_df, loan_df, onboard_df = load_sample_datasets()
-    churn_features = build_churn_features(bank_df, loan_df, onboard_df)
-    loan_risk_features = build_loan_risk_features(loan_df, bank_df)
+    from data_pipelines.profiling import StageProfiler
+
+    profiler = StageProfiler.from_config()
+
+    with profiler.stage("load_sample_datasets"):
+        bank_df, loan_df, onboard_df = load_sample_datasets()
+    with profiler.stage("build_churn_features"):
+        churn_features = build_churn_features(bank_df, loan_df, onboard_df)
+    with profiler.stage("build_loan_risk_features"):
+        loan_risk_features = build_loan_risk_features(loan_df, bank_df)
+    profiler.print_summary()
 
     print("[FEATURES] Churn feature view:")
     print(churn_features.head())
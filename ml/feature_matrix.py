@@ -0,0 +1,299 @@
+"""
+feature_matrix.py
+
+Fitted feature-matrix compiler for the churn and loan risk models.
+
+The stubs used to turn a feature table into model input with
+`features.drop(columns=[...]).select_dtypes(...)` on every call: a new
+DataFrame per step, another float conversion inside sklearn, and string
+columns (region, segment, product_type, risk_segment, ...) silently
+dropped instead of encoded.
+
+FeatureMatrixCompiler.fit() records, once at train time:
+- the column order and kind of every input column (numeric / bool / categorical)
+- numeric fill values for missing data (training means)
+- one-hot categories per categorical column (most frequent first,
+  capped at max_categories; unseen values encode as all zeros)
+
+transform() then writes every column straight into one preallocated,
+C-contiguous float32/float64 matrix: no intermediate DataFrames, each
+categorical column hashed once, and an optional `out=` buffer so batch
+scoring can reuse the same allocation for every batch.
+
+Benchmark (time and tracemalloc peak vs the drop/get_dummies path):
+    python -m ml.feature_matrix --rows 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+NUMERIC = "numeric"
+BOOL = "bool"
+CATEGORICAL = "categorical"
+
+_ROW_BLOCK = 4096
+
+
+@dataclass
+class ColumnSpec:
+    """
+    How one input column is written into the matrix.
+    """
+    name: str
+    kind: str
+    offset: int                          # first output column
+    fill: float = 0.0                    # numeric: value for missing entries
+    categories: Tuple[str, ...] = ()     # categorical: one output column each
+    _index: Optional[pd.Index] = field(default=None, repr=False, compare=False)
+
+    @property
+    def width(self) -> int:
+        return len(self.categories) if self.kind == CATEGORICAL else 1
+
+    def index(self) -> pd.Index:
+        if self._index is None:
+            self._index = pd.Index(self.categories)
+        return self._index
+
+
+class FeatureMatrixCompiler:
+    """
+    Compile feature tables into dense model matrices with a fixed layout.
+
+    Usage:
+
+        compiler = FeatureMatrixCompiler(exclude=["customer_id", "churn_flag"])
+        X_train = compiler.fit(train_features).transform(train_features)
+        X = compiler.transform(todays_features)            # same layout, no DataFrame copies
+        names = compiler.feature_names_                    # e.g. "region=APAC"
+    """
+
+    def __init__(
+        self,
+        exclude: Sequence[str] = (),
+        dtype: Any = np.float64,
+        max_categories: int = 50,
+    ):
+        self.exclude = tuple(exclude)
+        self.dtype = np.dtype(dtype)
+        self.max_categories = max_categories
+        self.columns_: List[ColumnSpec] = []
+        self.feature_names_: List[str] = []
+        self.width_ = 0
+
+    def fit(self, features: pd.DataFrame) -> "FeatureMatrixCompiler":
+        """
+        Record column order, kinds, fill values and categories.
+        """
+        self.columns_ = []
+        self.feature_names_ = []
+        offset = 0
+        for name in features.columns:
+            if name in self.exclude:
+                continue
+            series = features[name]
+            if pd.api.types.is_bool_dtype(series):
+                spec = ColumnSpec(name, BOOL, offset)
+            elif pd.api.types.is_numeric_dtype(series):
+                mean = series.mean()
+                spec = ColumnSpec(name, NUMERIC, offset, fill=0.0 if pd.isna(mean) else float(mean))
+            else:
+                counts = series.dropna().astype(str).value_counts()
+                categories = tuple(counts.index[: self.max_categories])
+                spec = ColumnSpec(name, CATEGORICAL, offset, categories=categories)
+
+            self.columns_.append(spec)
+            if spec.kind == CATEGORICAL:
+                self.feature_names_.extend(f"{name}={c}" for c in spec.categories)
+            else:
+                self.feature_names_.append(name)
+            offset += spec.width
+        self.width_ = offset
+        return self
+
+    def transform(self, features: pd.DataFrame, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        (n_rows, width_) matrix in the fitted layout.
+
+        Parameters
+        ----------
+        features : pd.DataFrame
+            Feature table with (at least) the fitted columns; extra columns
+            such as ids and targets are ignored.
+        out : np.ndarray, optional
+            Preallocated C-contiguous buffer of at least len(features) rows
+            and the compiler's dtype; the leading rows are filled and returned.
+
+        Returns
+        -------
+        X : np.ndarray
+        """
+        if not self.columns_:
+            raise ValueError("FeatureMatrixCompiler is not fitted; call fit() first.")
+        missing = [spec.name for spec in self.columns_ if spec.name not in features.columns]
+        if missing:
+            raise ValueError(f"Feature columns {missing} not found in features.")
+
+        n = len(features)
+        if out is None:
+            out = np.empty((n, self.width_), dtype=self.dtype)
+        else:
+            if out.dtype != self.dtype or out.shape[1] != self.width_ or out.shape[0] < n:
+                raise ValueError(f"out buffer must be ({n}+, {self.width_}) {self.dtype}")
+            out = out[:n]
+
+        # One source array per column: numeric values, or category codes
+        sources = []
+        for spec in self.columns_:
+            if spec.kind == CATEGORICAL:
+                # Hash each row once (factorize), then map the few distinct
+                # values to fitted categories; NaN and unseen values -> -1.
+                local, uniques = pd.factorize(features[spec.name])
+                lookup = spec.index().get_indexer(np.asarray(uniques, dtype=object).astype(str))
+                sources.append(np.append(lookup, -1)[local])
+            else:
+                values = features[spec.name].to_numpy()
+                if spec.kind == NUMERIC and values.dtype.kind == "f":
+                    nan = np.isnan(values)
+                    if nan.any():
+                        values = np.where(nan, spec.fill, values)
+                sources.append(values)
+
+        # Fill the matrix in row blocks that stay in cache; writing whole
+        # strided columns of a large C-order matrix is several times slower.
+        for start in range(0, n, _ROW_BLOCK):
+            stop = min(start + _ROW_BLOCK, n)
+            rows = out[start:stop]
+            for spec, source in zip(self.columns_, sources):
+                if spec.kind == CATEGORICAL:
+                    block = rows[:, spec.offset:spec.offset + spec.width]
+                    block[:] = 0
+                    codes = source[start:stop]
+                    hit = np.flatnonzero(codes >= 0)
+                    block[hit, codes[hit]] = 1
+                else:
+                    rows[:, spec.offset] = source[start:stop]
+        return out
+
+    def fit_transform(self, features: pd.DataFrame) -> np.ndarray:
+        return self.fit(features).transform(features)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        JSON-serializable fitted layout (see from_dict).
+        """
+        return {
+            "exclude": list(self.exclude),
+            "dtype": self.dtype.name,
+            "max_categories": self.max_categories,
+            "columns": [
+                {"name": c.name, "kind": c.kind, "offset": c.offset, "fill": c.fill, "categories": list(c.categories)}
+                for c in self.columns_
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FeatureMatrixCompiler":
+        compiler = cls(data["exclude"], data["dtype"], data["max_categories"])
+        compiler.columns_ = [
+            ColumnSpec(c["name"], c["kind"], c["offset"], c["fill"], tuple(c["categories"]))
+            for c in data["columns"]
+        ]
+        for spec in compiler.columns_:
+            if spec.kind == CATEGORICAL:
+                compiler.feature_names_.extend(f"{spec.name}={c}" for c in spec.categories)
+            else:
+                compiler.feature_names_.append(spec.name)
+        compiler.width_ = sum(spec.width for spec in compiler.columns_)
+        return compiler
+
+
+def _drop_path(features: pd.DataFrame, exclude: Sequence[str]) -> np.ndarray:
+    """
+    The old stub path: drop ids/target, keep numeric columns, let sklearn convert.
+    """
+    X = features.drop(columns=list(exclude)).select_dtypes(include=["number", "bool"])
+    return np.asarray(X, dtype=np.float64)
+
+
+def _dummies_path(features: pd.DataFrame, exclude: Sequence[str], names: List[str]) -> np.ndarray:
+    """
+    The usual pandas way to get the same encoded matrix.
+    """
+    X = pd.get_dummies(features.drop(columns=list(exclude)), prefix_sep="=")
+    return np.ascontiguousarray(X.reindex(columns=names, fill_value=0).to_numpy(dtype=np.float64))
+
+
+def _synthetic_loan_features(rows: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "application_id": np.char.add("APP", np.arange(rows).astype(str)),
+        "customer_id": np.char.add("CUST", (np.arange(rows) % (rows // 2 + 1)).astype(str)),
+        "product_type": rng.choice(["PERSONAL_LOAN", "HOME_LOAN", "AUTO_LOAN"], rows),
+        "requested_amount": rng.integers(50_000, 2_000_000, rows),
+        "tenor_months": rng.choice([12, 24, 36, 60, 120], rows),
+        "income": rng.integers(200_000, 5_000_000, rows),
+        "liabilities": rng.integers(0, 1_000_000, rows),
+        "dti_ratio": rng.uniform(0, 0.8, rows),
+        "credit_score": rng.integers(300, 900, rows),
+        "existing_loans_total_amount": rng.integers(0, 3_000_000, rows),
+        "risk_score_internal": rng.uniform(0, 1, rows),
+        "early_delinquency_flag": rng.uniform(size=rows) < 0.2,
+        "region": rng.choice(["APAC", "EMEA", "AMER"], rows),
+        "segment": rng.choice(["MASS", "AFFLUENT", "HNI"], rows),
+        "loan_to_income_ratio": rng.uniform(0, 5, rows),
+        "loan_to_existing_loans_ratio": rng.uniform(0, 5, rows),
+        "relationship_tenure_months": rng.integers(1, 240, rows),
+        "risk_segment": rng.choice(["LOW", "MEDIUM", "HIGH"], rows),
+        "income_estimate": rng.integers(200_000, 5_000_000, rows),
+        "digital_channel_index": rng.uniform(0, 1, rows),
+    })
+
+
+def benchmark(rows: int, repeats: int = 5) -> None:
+    import tracemalloc
+
+    exclude = ["application_id", "customer_id", "early_delinquency_flag"]
+    features = _synthetic_loan_features(rows)
+    compiler = FeatureMatrixCompiler(exclude=exclude).fit(features)
+    buffer = np.empty((rows, compiler.width_), dtype=compiler.dtype)
+
+    cases = {
+        "drop + select_dtypes (numeric only)": lambda: _drop_path(features, exclude),
+        "drop + get_dummies (encoded)": lambda: _dummies_path(features, exclude, compiler.feature_names_),
+        "compiler.transform": lambda: compiler.transform(features),
+        "compiler.transform(out=buffer)": lambda: compiler.transform(features, out=buffer),
+    }
+    matrix_mb = rows * compiler.width_ * 8 / 1e6
+    print(f"[FEATURES] rows={rows:,} | encoded width={compiler.width_} | output matrix={matrix_mb:.1f} MB")
+    for name, fn in cases.items():
+        fn()
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        elapsed = (time.perf_counter() - t0) / repeats
+
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"[FEATURES] {name:<38} {elapsed * 1000:8.1f} ms | peak allocated {peak / 1e6:8.1f} MB")
+
+    expected = _dummies_path(features, exclude, compiler.feature_names_)
+    assert np.allclose(compiler.transform(features), expected)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark feature matrix compilation.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    benchmark(args.rows)
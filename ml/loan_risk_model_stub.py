@@ -10,23 +10,38 @@ This model is meant to **support** underwriters by:
 In production:
 - Target labels would come from loan performance data (delinquencies, defaults)
 - Model would be governed by risk/compliance stakeholders
+
+sklearn, and pandas through feature_matrix, are imported where they are
+used, so importing this module stays cheap for processes that never train.
 """
 
 from __future__ import annotations
 
-from typing import Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+
+    from .explainability import ExplanationEngine
+    from .feature_matrix import FeatureMatrixCompiler
 
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import roc_auc_score, classification_report
-from sklearn.model_selection import train_test_split
 
-from .feature_engineering import load_sample_datasets, build_loan_risk_features
+def loan_risk_matrix_compiler(target_col: str = "early_delinquency_flag") -> FeatureMatrixCompiler:
+    """
+    Unfitted compiler for build_loan_risk_features tables (ids and target
+    excluded). float32, the dtype the forest predicts in, so sklearn does
+    not copy the matrix again.
+    """
+    from .feature_matrix import FeatureMatrixCompiler
+
+    return FeatureMatrixCompiler(exclude=["application_id", "customer_id", "customer_key", target_col], dtype="float32")
 
 
 def train_loan_risk_model(
     features: pd.DataFrame,
     target_col: str = "early_delinquency_flag",
+    compiler: Optional[FeatureMatrixCompiler] = None,
 ) -> Tuple[RandomForestClassifier, float]:
     """
     Train a simple RandomForest-based loan risk support model.
@@ -37,6 +52,11 @@ def train_loan_risk_model(
         Feature table returned by build_loan_risk_features.
     target_col : str
         Column representing early delinquency indicator.
+    compiler : FeatureMatrixCompiler, optional
+        Fitted here on `features`; the model is then trained on the compiled
+        matrix (product_type, region, segment, risk_segment one-hot encoded)
+        and must be scored with the same compiler. Without it only numeric /
+        bool columns are used.
 
     Returns
     -------
@@ -44,10 +64,19 @@ def train_loan_risk_model(
     auc : float
         ROC-AUC on validation set.
     """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import roc_auc_score, classification_report
+    from sklearn.model_selection import train_test_split
+
     if target_col not in features.columns:
         raise ValueError(f"Target column '{target_col}' not found in features.")
 
-    X = features.drop(columns=[target_col, "application_id", "customer_id"])
+    if compiler is not None:
+        X = compiler.fit_transform(features)
+    else:
+        X = features.drop(columns=[target_col, "application_id", "customer_id", "customer_key"], errors="ignore")
+        # Categorical columns (region, segment, ...) need a compiler to be encoded
+        X = X.select_dtypes(include=["number", "bool"])
     y = features[target_col].astype(int)
 
     X_train, X_val, y_train, y_val = train_test_split(
@@ -75,30 +104,55 @@ def train_loan_risk_model(
 def score_loan_risk(
     model: RandomForestClassifier,
     features: pd.DataFrame,
+    explainer: Optional["ExplanationEngine"] = None,
+    top_k: int = 3,
+    compiler: Optional[FeatureMatrixCompiler] = None,
 ) -> pd.DataFrame:
     """
-    Score loan applications using the trained loan risk model.
+    Score loan applications using the trained loan risk model (and the
+    compiler it was trained with, if any).
 
     Returns a DataFrame with:
     - application_id
     - customer_id
     - risk_score (probability of early delinquency)
+    - top_factor_1..top_k (only with an explainer): features that raised
+      the risk score the most, for underwriters
     """
-    X = features.drop(columns=["early_delinquency_flag", "application_id", "customer_id"])
+    if compiler is not None:
+        X = compiler.transform(features)
+    else:
+        X = features.drop(columns=["early_delinquency_flag", "application_id", "customer_id", "customer_key"], errors="ignore")
+        X = X.select_dtypes(include=["number", "bool"])
     risk_score = model.predict_proba(X)[:, 1]
 
     scored = features[["application_id", "customer_id"]].copy()
     scored["risk_score"] = risk_score
+    if explainer is not None:
+        scored = scored.join(explainer.top_reasons(X, k=top_k, index=features.index))
     return scored
 
 
 if __name__ == "__main__":
     # Example usage: train and score on synthetic features.
-    bank_df, loan_df, onboard_df = load_sample_datasets()
-    loan_features = build_loan_risk_features(loan_df, bank_df)
+    from data_pipelines.profiling import StageProfiler
+
+    from .feature_cache import open_cache, sample_feature_tables
+
+    profiler = StageProfiler.from_config()
+
+    with profiler.stage("build_loan_risk_features"):
+        # Served from the feature cache while sample_data and the feature code are unchanged
+        loan_features = sample_feature_tables(open_cache(), tables=["loan_risk"])["loan_risk"]
+    with profiler.stage("train_loan_risk_model"):
+        compiler = loan_risk_matrix_compiler()
+        model, auc = train_loan_risk_model(loan_features, compiler=compiler)
+    with profiler.stage("score_loan_risk"):
+        from .explainability import ExplanationEngine
 
-    model, auc = train_loan_risk_model(loan_features)
-    scored = score_loan_risk(model, loan_features)
+        explainer = ExplanationEngine(model, feature_names=compiler.feature_names_)
+        scored = score_loan_risk(model, loan_features, explainer=explainer, compiler=compiler)
+    profiler.print_summary()
 
     print("\n[LOAN RISK MODEL] Sample scores:")
     print(scored.head())
@@ -0,0 +1,412 @@
+"""
+monitoring.py
+
+Streaming drift and data-quality monitoring against a training baseline.
+
+The baseline is computed once from the training feature tables and
+stored as JSON. After that, scoring batches are folded into fixed-size
+sketches in a single pass, without access to historical data:
+
+- numeric features: counts over the baseline's percentile bin edges
+  (a fixed-edge quantile histogram), plus missing counts
+- categorical features: a count-min sketch, so memory does not grow with
+  the number of distinct values (branch codes, campaigns, ...)
+- validation: document and issue counts per (field, severity) from
+  ValidationResult objects
+
+From the sketches we compute, per feature:
+- PSI over baseline bins merged to >= 10% expected mass each
+- KS approximated at the percentile edges (exact up to bin resolution)
+- for categoricals, PSI over the baseline categories plus "other"
+
+Memory is O(features x bins) regardless of batch size, and each batch is
+processed with vectorized numpy calls (searchsorted + bincount per column,
+one hash per distinct category per batch), which keeps up with hourly
+batches of millions of rows.
+
+Example:
+    python -m ml.monitoring --rows 5000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_pipelines.config import get_section
+from data_pipelines.schemas import ValidationResult
+
+
+# Columns that identify rows rather than describe them
+DEFAULT_EXCLUDE = ("customer_id", "customer_key", "application_id")
+
+_EPS = 1e-4
+_OTHER = "__other__"
+
+
+@dataclass
+class MonitoringConfig:
+    """
+    Settings for the `monitoring` config section.
+    """
+    enabled: bool = False
+    baseline_dir: Path = Path("./monitoring/baselines")
+    quantile_bins: int = 100
+    min_psi_bin_mass: float = 0.1
+    max_categories: int = 50
+    cms_width: int = 2048
+    cms_depth: int = 4
+    psi_warn: float = 0.1
+    psi_drift: float = 0.25
+    ks_drift: float = 0.1
+    issue_rate_drift: float = 0.05
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "MonitoringConfig":
+        section = get_section(config, "monitoring")
+        defaults = cls()
+        values = {
+            name: type(getattr(defaults, name))(section[name])
+            for name in asdict(defaults)
+            if name in section and name != "baseline_dir"
+        }
+        if "baseline_dir" in section:
+            values["baseline_dir"] = Path(section["baseline_dir"])
+        return cls(**values)
+
+
+def _psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    e = np.clip(expected, _EPS, None)
+    a = np.clip(actual, _EPS, None)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def _psi_groups(proportions: np.ndarray, min_mass: float) -> List[int]:
+    """
+    Start indices of consecutive bin groups holding >= min_mass expected
+    mass each (the last group absorbs any remainder).
+    """
+    starts = [0]
+    mass = 0.0
+    for i, p in enumerate(proportions):
+        mass += p
+        if mass >= min_mass and i + 1 < len(proportions):
+            starts.append(i + 1)
+            mass = 0.0
+    if len(starts) > 1 and proportions[starts[-1]:].sum() < min_mass:
+        starts.pop()
+    return starts
+
+
+class CountMinSketch:
+    """
+    Count-min sketch over string keys; counts are over-estimates bounded
+    by total/width with probability 1 - 2^-depth.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    def _indices(self, key: str) -> np.ndarray:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8 * self.depth).digest()
+        return np.frombuffer(digest, dtype=np.uint64) % np.uint64(self.width)
+
+    def add_counts(self, counts: pd.Series) -> None:
+        rows = np.arange(self.depth)
+        for key, count in counts.items():
+            self.table[rows, self._indices(str(key))] += int(count)
+        self.total += int(counts.sum())
+
+    def estimate(self, key: str) -> int:
+        return int(self.table[np.arange(self.depth), self._indices(key)].min())
+
+
+@dataclass
+class NumericBaseline:
+    edges: List[float]
+    proportions: List[float]
+    psi_groups: List[int]
+    missing_rate: float
+
+
+@dataclass
+class CategoricalBaseline:
+    proportions: Dict[str, float]  # top categories; the rest is "other"
+    missing_rate: float
+
+
+@dataclass
+class Baseline:
+    """
+    Training-time reference distributions for one feature table.
+    """
+    table: str
+    rows: int
+    numeric: Dict[str, NumericBaseline] = field(default_factory=dict)
+    categorical: Dict[str, CategoricalBaseline] = field(default_factory=dict)
+    issue_rates: Dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_frame(
+        cls,
+        table: str,
+        df: pd.DataFrame,
+        cfg: Optional[MonitoringConfig] = None,
+        exclude: Sequence[str] = DEFAULT_EXCLUDE,
+        issue_rates: Optional[Dict[str, float]] = None,
+    ) -> "Baseline":
+        cfg = cfg or MonitoringConfig()
+        baseline = cls(table=table, rows=len(df), issue_rates=dict(issue_rates or {}))
+        numeric, categorical = _split_columns(df, exclude)
+
+        for col in numeric:
+            values = df[col].to_numpy(dtype=np.float64)
+            present = values[~np.isnan(values)]
+            if present.size == 0:
+                continue
+            qs = np.quantile(present, np.linspace(0, 1, cfg.quantile_bins + 1)[1:-1])
+            edges = np.unique(qs)
+            counts = np.bincount(np.searchsorted(edges, present, side="right"), minlength=edges.size + 1)
+            proportions = counts / counts.sum()
+            baseline.numeric[col] = NumericBaseline(
+                edges=edges.tolist(),
+                proportions=proportions.tolist(),
+                psi_groups=_psi_groups(proportions, cfg.min_psi_bin_mass),
+                missing_rate=1 - present.size / max(len(values), 1),
+            )
+
+        for col in categorical:
+            series = df[col]
+            counts = series.dropna().astype(str).value_counts()
+            total = max(int(counts.sum()), 1)
+            top = counts.head(cfg.max_categories)
+            baseline.categorical[col] = CategoricalBaseline(
+                proportions={str(k): v / total for k, v in top.items()},
+                missing_rate=float(series.isna().mean()) if len(series) else 0.0,
+            )
+        return baseline
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(asdict(self), indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "Baseline":
+        raw = json.loads(path.read_text(encoding="utf-8"))
+        return cls(
+            table=raw["table"],
+            rows=raw["rows"],
+            numeric={k: NumericBaseline(**v) for k, v in raw["numeric"].items()},
+            categorical={k: CategoricalBaseline(**v) for k, v in raw["categorical"].items()},
+            issue_rates=raw.get("issue_rates", {}),
+        )
+
+
+def _split_columns(df: pd.DataFrame, exclude: Sequence[str]) -> Tuple[List[str], List[str]]:
+    columns = [c for c in df.columns if c not in exclude]
+    numeric = [c for c in columns if pd.api.types.is_numeric_dtype(df[c]) or pd.api.types.is_bool_dtype(df[c])]
+    categorical = [c for c in columns if c not in numeric]
+    return numeric, categorical
+
+
+@dataclass
+class FeatureDrift:
+    feature: str
+    kind: str  # "numeric" / "categorical"
+    psi: float
+    ks: Optional[float]
+    missing_rate: float
+    status: str  # "OK" / "WARN" / "DRIFT"
+
+
+@dataclass
+class DriftReport:
+    table: str
+    rows: int
+    features: List[FeatureDrift]
+    issue_rates: Dict[str, float]
+    issue_rate_alerts: List[str]
+
+    @property
+    def drifted(self) -> List[str]:
+        return [f.feature for f in self.features if f.status == "DRIFT"]
+
+    @property
+    def should_retrain(self) -> bool:
+        return bool(self.drifted)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "drifted": self.drifted, "should_retrain": self.should_retrain}
+
+
+class DriftMonitor:
+    """
+    Constant-memory streaming sketches for one feature table, compared
+    against its Baseline.
+
+    Usage:
+
+        monitor = DriftMonitor(Baseline.load(path), cfg)
+        for batch in hourly_batches:
+            monitor.update(batch)
+        monitor.update_validation(validation_results)
+        report = monitor.report()
+    """
+
+    def __init__(self, baseline: Baseline, cfg: Optional[MonitoringConfig] = None):
+        self.baseline = baseline
+        self.cfg = cfg or MonitoringConfig()
+        self.rows = 0
+        self._edges = {c: np.asarray(b.edges) for c, b in baseline.numeric.items()}
+        self._hist = {c: np.zeros(len(b.proportions), dtype=np.int64) for c, b in baseline.numeric.items()}
+        self._missing = {c: 0 for c in [*baseline.numeric, *baseline.categorical]}
+        self._sketches = {
+            c: CountMinSketch(self.cfg.cms_width, self.cfg.cms_depth) for c in baseline.categorical
+        }
+        self.documents = 0
+        self.invalid_documents = 0
+        self.issue_counts: Dict[str, int] = {}
+
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        Fold one batch of feature rows into the sketches.
+        """
+        self.rows += len(df)
+        for col, edges in self._edges.items():
+            if col not in df.columns:
+                self._missing[col] += len(df)
+                continue
+            values = df[col].to_numpy(dtype=np.float64)
+            nan = np.isnan(values)
+            self._missing[col] += int(nan.sum())
+            bins = np.searchsorted(edges, values[~nan], side="right")
+            self._hist[col] += np.bincount(bins, minlength=edges.size + 1)
+
+        for col, sketch in self._sketches.items():
+            if col not in df.columns:
+                self._missing[col] += len(df)
+                continue
+            series = df[col]
+            self._missing[col] += int(series.isna().sum())
+            sketch.add_counts(series.dropna().astype(str).value_counts())
+
+    def update_validation(self, results: Iterable[ValidationResult]) -> None:
+        """
+        Count documents, invalid documents and issues per "field:severity".
+        """
+        for vr in results:
+            self.documents += 1
+            if not vr.is_valid:
+                self.invalid_documents += 1
+            for issue in vr.issues:
+                key = f"{issue.field}:{issue.severity}"
+                self.issue_counts[key] = self.issue_counts.get(key, 0) + 1
+
+    def issue_rates(self) -> Dict[str, float]:
+        docs = max(self.documents, 1)
+        rates = {"invalid_documents": self.invalid_documents / docs}
+        rates.update({k: v / docs for k, v in sorted(self.issue_counts.items())})
+        return rates
+
+    def _status(self, psi: float, ks: Optional[float]) -> str:
+        if psi >= self.cfg.psi_drift or (ks is not None and ks >= self.cfg.ks_drift):
+            return "DRIFT"
+        if psi >= self.cfg.psi_warn:
+            return "WARN"
+        return "OK"
+
+    def report(self) -> DriftReport:
+        features: List[FeatureDrift] = []
+        rows = max(self.rows, 1)
+
+        for col, base in self.baseline.numeric.items():
+            counts = self._hist[col]
+            present = counts.sum()
+            if present == 0:
+                continue
+            expected = np.asarray(base.proportions)
+            actual = counts / present
+            groups = base.psi_groups
+            psi = _psi(np.add.reduceat(expected, groups), np.add.reduceat(actual, groups))
+            ks = float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
+            features.append(FeatureDrift(col, "numeric", psi, ks, self._missing[col] / rows, self._status(psi, ks)))
+
+        for col, base in self.baseline.categorical.items():
+            sketch = self._sketches[col]
+            if sketch.total == 0:
+                continue
+            names = list(base.proportions)
+            expected = np.asarray([base.proportions[n] for n in names])
+            actual = np.asarray([sketch.estimate(n) for n in names], dtype=np.float64) / sketch.total
+            actual = np.minimum(actual, 1.0)
+            expected = np.append(expected, max(0.0, 1 - expected.sum()))
+            actual = np.append(actual, max(0.0, 1 - actual.sum()))
+            psi = _psi(expected, actual)
+            features.append(FeatureDrift(col, "categorical", psi, None, self._missing[col] / rows, self._status(psi, None)))
+
+        rates = self.issue_rates() if self.documents else {}
+        alerts = [
+            key for key, rate in rates.items()
+            if rate - self.baseline.issue_rates.get(key, 0.0) >= self.cfg.issue_rate_drift
+        ]
+        return DriftReport(self.baseline.table, self.rows, features, rates, alerts)
+
+
+def print_report(report: DriftReport) -> None:
+    print(f"[MONITOR] table={report.table} | rows={report.rows} | drifted={report.drifted or 'none'}")
+    for f in sorted(report.features, key=lambda f: f.psi, reverse=True):
+        if f.status != "OK":
+            ks = f"{f.ks:.3f}" if f.ks is not None else "-"
+            print(f"[MONITOR]   {f.status:<5} {f.feature:<32} psi={f.psi:.3f} ks={ks}")
+    for key in report.issue_rate_alerts:
+        print(f"[MONITOR]   issue rate up: {key}={report.issue_rates[key]:.3f}")
+
+
+def benchmark(rows: int, batch_size: int = 500_000) -> None:
+    rng = np.random.default_rng(7)
+
+    def frame(n: int, shift: float) -> pd.DataFrame:
+        return pd.DataFrame({
+            "income_estimate": rng.lognormal(11 + shift, 0.4, n),
+            "relationship_tenure_months": rng.integers(1, 240, n),
+            "digital_channel_index": rng.beta(2 + shift * 4, 2, n),
+            "total_loans_amount": np.where(rng.random(n) < 0.3, rng.gamma(2, 1e5, n), 0.0),
+            "has_loans_with_bank": rng.random(n) < 0.3,
+            "region": rng.choice(["APAC", "EMEA", "AMER"], n, p=[0.5 - shift, 0.3, 0.2 + shift]),
+            "branch_code": rng.integers(0, 5000, n).astype(str),
+        })
+
+    cfg = MonitoringConfig()
+    baseline = Baseline.from_frame("churn", frame(200_000, 0.0), cfg)
+    monitor = DriftMonitor(baseline, cfg)
+
+    batches = [frame(min(batch_size, rows), 0.1)]
+    t0 = time.perf_counter()
+    done = 0
+    while done < rows:
+        batch = batches[0] if rows - done >= len(batches[0]) else batches[0].iloc[: rows - done]
+        monitor.update(batch)
+        done += len(batch)
+    elapsed = time.perf_counter() - t0
+
+    print_report(monitor.report())
+    print(f"[MONITOR] {rows:,} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark streaming drift monitoring.")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    benchmark(args.rows)
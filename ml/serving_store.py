@@ -0,0 +1,301 @@
+"""
+serving_store.py
+
+Pre-aggregated serving tables ("hot storage") for dashboard queries.
+
+Scored rows are folded into small aggregate cubes in a local SQLite
+store, so LoanRisk / ChurnInsights style queries read a few hundred cube
+rows through an index instead of rescanning every scored row:
+
+- loan_risk_cube:  month x risk_band x region x segment
+                   -> applications, sum(risk_score), sum(requested_amount), high_risk
+- churn_cube:      month x score_decile x channel
+                   -> customers, sum(churn_score), predicted churners
+
+`month` is the scoring month (monthly snapshots). Churn deciles are
+fixed score bands (0.0-0.1, ..., 0.9-1.0), so cube rows stay comparable
+between runs.
+
+Cubes are maintained incrementally. Every scored entity is also kept in
+a per-month fact table; when an entity is re-scored, its previous
+contribution is subtracted from the cube and the new one added, in one
+transaction. Re-materializing the same scores leaves the cubes unchanged,
+and a partial batch only touches the cube rows of the entities it contains.
+
+Example:
+    python -m ml.serving_store --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_pipelines.config import get_section
+
+
+@dataclass
+class ServingConfig:
+    """
+    Settings for the `serving` config section.
+    """
+    enabled: bool = False
+    db_path: Path = Path("./serving/serving.sqlite")
+    medium_risk_threshold: float = 0.2
+    high_risk_threshold: float = 0.5
+    churn_threshold: float = 0.5
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ServingConfig":
+        section = get_section(config, "serving")
+        return cls(
+            enabled=bool(section.get("enabled", cls.enabled)),
+            db_path=Path(section.get("db_path", cls.db_path)),
+            medium_risk_threshold=float(section.get("medium_risk_threshold", cls.medium_risk_threshold)),
+            high_risk_threshold=float(section.get("high_risk_threshold", cls.high_risk_threshold)),
+            churn_threshold=float(section.get("churn_threshold", cls.churn_threshold)),
+        )
+
+
+@dataclass
+class _Cube:
+    """
+    One fact table + aggregate cube pair.
+    """
+    name: str
+    key: str                    # entity key column in the fact table
+    dims: Tuple[str, ...]       # cube dimensions (month first)
+    measures: Tuple[str, ...]   # summed measures; the first one is the row count
+    indexes: Tuple[Tuple[str, ...], ...]
+
+    @property
+    def facts(self) -> str:
+        return f"{self.name}_facts"
+
+
+LOAN_RISK_CUBE = _Cube(
+    name="loan_risk_cube",
+    key="application_id",
+    dims=("month", "risk_band", "region", "segment"),
+    measures=("applications", "sum_risk_score", "sum_requested_amount", "high_risk"),
+    indexes=(("region", "month"), ("risk_band", "month")),
+)
+
+CHURN_CUBE = _Cube(
+    name="churn_cube",
+    key="customer_id",
+    dims=("month", "score_decile", "channel"),
+    measures=("customers", "sum_churn_score", "predicted_churners"),
+    indexes=(("channel", "month"),),
+)
+
+
+class ServingStore:
+    """
+    SQLite-backed aggregate cubes for dashboard queries.
+    """
+
+    CUBES = (LOAN_RISK_CUBE, CHURN_CUBE)
+
+    def __init__(self, cfg: Optional[ServingConfig] = None):
+        self.cfg = cfg or ServingConfig()
+        self.cfg.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.cfg.db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for cube in self.CUBES:
+            self._create(cube)
+
+    def _create(self, cube: _Cube) -> None:
+        dims = ", ".join(f"{d} TEXT NOT NULL" for d in cube.dims)
+        measures = ", ".join(f"{m} REAL NOT NULL DEFAULT 0" for m in cube.measures)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {cube.name} (
+                {dims}, {measures},
+                PRIMARY KEY ({", ".join(cube.dims)})
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS {cube.facts} (
+                month TEXT NOT NULL, {cube.key} TEXT NOT NULL,
+                {", ".join(f"{d} TEXT NOT NULL" for d in cube.dims[1:])},
+                {", ".join(f"{m} REAL NOT NULL" for m in cube.measures)},
+                PRIMARY KEY (month, {cube.key})
+            ) WITHOUT ROWID;
+        """)
+        for cols in cube.indexes:
+            name = f"ix_{cube.name}_{'_'.join(cols)}"
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {cube.name} ({', '.join(cols)})")
+        self.conn.commit()
+
+    def _apply(self, cube: _Cube, rows: pd.DataFrame) -> int:
+        """
+        Upsert entity rows (key, dims, measures) into the fact table and
+        apply the delta to the cube. Returns the number of entities written.
+        """
+        if rows.empty:
+            return 0
+        rows = rows.drop_duplicates(subset=["month", cube.key], keep="last")
+        fact_cols = ["month", cube.key, *cube.dims[1:], *cube.measures]
+        dims = ", ".join(cube.dims)
+        sums = ", ".join(f"sum({m})" for m in cube.measures)
+        neg_sums = ", ".join(f"-sum(f.{m})" for m in cube.measures)
+        add = ", ".join(f"{m} = {m} + excluded.{m}" for m in cube.measures)
+        conflict = f"ON CONFLICT ({dims}) DO UPDATE SET {add}"
+
+        with self.conn:
+            self.conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS staged_{cube.name} AS SELECT * FROM {cube.facts} WHERE 0")
+            self.conn.execute(f"DELETE FROM staged_{cube.name}")
+            self.conn.executemany(
+                f"INSERT INTO staged_{cube.name} ({', '.join(fact_cols)}) VALUES ({', '.join('?' * len(fact_cols))})",
+                rows[fact_cols].itertuples(index=False, name=None),
+            )
+            # 1. retract the previous contribution of re-scored entities
+            self.conn.execute(f"""
+                INSERT INTO {cube.name} ({dims}, {", ".join(cube.measures)})
+                SELECT {", ".join(f"f.{d}" for d in cube.dims)}, {neg_sums}
+                FROM {cube.facts} f JOIN staged_{cube.name} s USING (month, {cube.key})
+                GROUP BY {", ".join(f"f.{d}" for d in cube.dims)}
+                {conflict}
+            """)
+            # 2. add the new contribution
+            self.conn.execute(f"""
+                INSERT INTO {cube.name} ({dims}, {", ".join(cube.measures)})
+                SELECT {dims}, {sums} FROM staged_{cube.name} GROUP BY {dims}
+                {conflict}
+            """)
+            # 3. remember the new facts
+            self.conn.execute(f"INSERT OR REPLACE INTO {cube.facts} SELECT * FROM staged_{cube.name}")
+            self.conn.execute(f"DELETE FROM {cube.name} WHERE {cube.measures[0]} <= 0")
+        return len(rows)
+
+    def materialize_loan_risk(self, scored: pd.DataFrame, features: pd.DataFrame, month: str) -> int:
+        """
+        Fold score_loan_risk output (joined with its feature rows for
+        region / segment / requested_amount) into loan_risk_cube.
+        """
+        df = scored[["application_id", "risk_score"]].merge(
+            features[["application_id", "region", "segment", "requested_amount"]],
+            on="application_id", how="left",
+        )
+        score = df["risk_score"].to_numpy(dtype=np.float64)
+        rows = pd.DataFrame({
+            "month": month,
+            "application_id": df["application_id"].astype(str),
+            "risk_band": np.select(
+                [score >= self.cfg.high_risk_threshold, score >= self.cfg.medium_risk_threshold],
+                ["HIGH", "MEDIUM"], "LOW",
+            ),
+            "region": df["region"].fillna("UNKNOWN").astype(str),
+            "segment": df["segment"].fillna("UNKNOWN").astype(str),
+            "applications": 1.0,
+            "sum_risk_score": score,
+            "sum_requested_amount": df["requested_amount"].fillna(0.0).to_numpy(dtype=np.float64),
+            "high_risk": (score >= self.cfg.high_risk_threshold).astype(np.float64),
+        })
+        return self._apply(LOAN_RISK_CUBE, rows)
+
+    def materialize_churn(self, scored: pd.DataFrame, features: pd.DataFrame, month: str) -> int:
+        """
+        Fold score_churn output (joined with the customers' opening
+        channel) into churn_cube.
+        """
+        channels = features[["customer_id", "account_opening_channel"]].drop_duplicates("customer_id")
+        df = scored[["customer_id", "churn_score"]].merge(channels, on="customer_id", how="left")
+        score = df["churn_score"].to_numpy(dtype=np.float64)
+        rows = pd.DataFrame({
+            "month": month,
+            "customer_id": df["customer_id"].astype(str),
+            "score_decile": np.clip((score * 10).astype(int), 0, 9).astype(str),
+            "channel": df["account_opening_channel"].fillna("UNKNOWN").astype(str),
+            "customers": 1.0,
+            "sum_churn_score": score,
+            "predicted_churners": (score >= self.cfg.churn_threshold).astype(np.float64),
+        })
+        return self._apply(CHURN_CUBE, rows)
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self.conn, params=list(params))
+
+    def loan_risk_by_region(self, month: str, region: Optional[str] = None) -> pd.DataFrame:
+        """
+        LoanRisk view: applications, mean risk and high-risk share per band.
+        """
+        where = "month = ?" + (" AND region = ?" if region else "")
+        params: List[Any] = [month] + ([region] if region else [])
+        return self.query(f"""
+            SELECT region, risk_band, sum(applications) AS applications,
+                   sum(sum_risk_score) / sum(applications) AS avg_risk_score,
+                   sum(high_risk) / sum(applications) AS high_risk_share
+            FROM loan_risk_cube WHERE {where}
+            GROUP BY region, risk_band ORDER BY region, risk_band
+        """, params)
+
+    def churn_deciles_by_channel(self, month: str) -> pd.DataFrame:
+        """
+        ChurnInsights view: customers and predicted churners per score decile and channel.
+        """
+        return self.query("""
+            SELECT channel, score_decile, customers, predicted_churners,
+                   sum_churn_score / customers AS avg_churn_score
+            FROM churn_cube WHERE month = ? ORDER BY channel, score_decile
+        """, [month])
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "ServingStore":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def benchmark(rows: int, db_path: Path) -> None:
+    rng = np.random.default_rng(3)
+    ids = np.char.add("APP", np.arange(rows).astype(str))
+    features = pd.DataFrame({
+        "application_id": ids,
+        "region": rng.choice(["APAC", "EMEA", "AMER"], rows),
+        "segment": rng.choice(["MASS", "AFFLUENT", "HNI"], rows),
+        "requested_amount": rng.gamma(2, 2e5, rows),
+    })
+    scored = pd.DataFrame({"application_id": ids, "risk_score": rng.beta(2, 5, rows)})
+
+    db_path.unlink(missing_ok=True)
+    with ServingStore(ServingConfig(db_path=db_path)) as store:
+        t0 = time.perf_counter()
+        store.materialize_loan_risk(scored, features, "2025-01")
+        full = time.perf_counter() - t0
+
+        changed = scored.sample(frac=0.01, random_state=1).assign(risk_score=lambda d: d["risk_score"] * 1.5)
+        t0 = time.perf_counter()
+        store.materialize_loan_risk(changed, features, "2025-01")
+        delta = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        store.loan_risk_by_region("2025-01", region="EMEA")
+        cube_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    df = scored.merge(features, on="application_id")
+    df = df[df["region"] == "EMEA"]
+    df.groupby(pd.cut(df["risk_score"], [0, 0.2, 0.5, 1], right=False))["risk_score"].agg(["count", "mean"])
+    scan_ms = (time.perf_counter() - t0) * 1000
+
+    print(f"[SERVING] rows={rows:,} | full load={full:.2f}s | 1% re-score delta={delta:.2f}s")
+    print(f"[SERVING] region query: cube={cube_ms:.2f} ms | rescan of scored rows={scan_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the serving cubes.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--db-path", type=Path, default=Path("./serving/benchmark.sqlite"))
+    args = parser.parse_args()
+
+    benchmark(args.rows, args.db_path)
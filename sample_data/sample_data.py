@@ -7,6 +7,10 @@ It creates 3 JSON files in this folder:
 - loan_application_example.json    -> 10 records, 50 features each
 - onboarding_form_example.json     -> 10 records, 50 features each
 
+It also writes one file per document into `documents/`, named with the
+ingestion convention <customer_id>__<document_type>__<region>.json, as
+input for the pipeline runner and the sharding workers.
+
 Run from repository root:
 
     python sample_data/generate_sample_data.py
@@ -250,6 +254,31 @@ def generate_onboarding_records(n: int = 10):
     return records
 
 
+def write_document_drop(out_dir: Path = BASE_DIR / "documents", n: int = 20, seed: int = 42):
+    """
+    Write one JSON file per generated record, following the ingestion
+    naming convention, so the drop folder can be ingested as-is.
+
+    Bank statement records have no segment of their own; they take the
+    customer's onboarding segment, which the churn features join on.
+    """
+    random.seed(seed)
+    bank_data = generate_bank_statement_records(n)
+    loan_data = generate_loan_application_records(n)
+    onboard_data = generate_onboarding_records(n)
+
+    segments = {r["customer_id"]: r["segment"] for r in onboard_data}
+    for record in bank_data:
+        record["segment"] = segments[record["customer_id"]]
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for record in bank_data + loan_data + onboard_data:
+        name = f"{record['customer_id']}__{record['document_type']}__{record['region']}.json"
+        (out_dir / name).write_text(json.dumps(record, indent=4), encoding="utf-8")
+
+    print(f"[WRITE] {out_dir} ({len(bank_data) + len(loan_data) + len(onboard_data)} documents)")
+
+
 def main():
     bank_file = BASE_DIR / "bank_statement_example.json"
     loan_file = BASE_DIR / "loan_application_example.json"
@@ -267,6 +296,8 @@ def main():
     print(f"[WRITE] {loan_file} ({len(loan_data)} records)")
     print(f"[WRITE] {onboard_file} ({len(onboard_data)} records)")
 
+    write_document_drop()
+
 
 if __name__ == "__main__":
     main()